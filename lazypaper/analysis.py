@@ -0,0 +1,146 @@
+# analysis.py - Análisis de imagen: pirámide de miniaturas, paleta, fondo uniforme
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+import numpy as np
+
+import resampling
+
+Color = Tuple[int, int, int]
+
+# Bits por canal al cuantizar: 6 bits absorben el ruido de compresión
+QUANT_BITS = 6
+ANALYSIS_SIDE = 100
+ALPHA_THRESHOLD = 10
+# Lados de la pirámide de miniaturas, de menor a mayor
+PYRAMID_SIDES = (100, 300, 600)
+
+
+class ColorStats(NamedTuple):
+    palette: List[Tuple[Color, float]]  # Colores del sujeto (píxeles opacos) con su peso 0-1
+    border_palette: List[Tuple[Color, float]]  # Colores del borde con su peso 0-1
+    border_uniformity: float  # Fracción del borde ocupada por su color principal
+    mean_color: Color  # Color promedio de los píxeles opacos
+
+
+class ImageAnalysis(NamedTuple):
+    """Resultado del análisis de carga; las etapas posteriores lo reutilizan"""
+    size: Tuple[int, int]
+    mode: str
+    has_transparency: bool
+    uniform_background: bool
+    colors: ColorStats
+    pyramid: Tuple[Image.Image, ...]  # Miniaturas según PYRAMID_SIDES
+
+    def level(self, side: int) -> Image.Image:
+        """Menor miniatura de la pirámide que cubre side (o la mayor disponible)"""
+        for img in self.pyramid:
+            if max(img.size) >= side:
+                return img
+        return self.pyramid[-1]
+
+    def describe(self) -> str:
+        w, h = self.size
+        return (f"Dimensiones: {w}x{h}\nModo: {self.mode}\n"
+                f"Transparencia: {'Sí' if self.has_transparency else 'No'}\n"
+                f"Fondo uniforme: {'Probable' if self.uniform_background else 'No detectado'}"
+                f" ({self.colors.border_uniformity:.0%})\n"
+                f"Paleta: {format_palette(self.colors.palette, 3)}")
+
+
+def quantize(pixels: np.ndarray, bits: int = QUANT_BITS) -> np.ndarray:
+    """Empaquetar píxeles RGB (N, 3) uint8 en enteros de 3*bits bits"""
+    shift = 8 - bits
+    q = (pixels[:, :3] >> shift).astype(np.int32)
+    return (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+
+def palette(pixels: np.ndarray, k: int = 5, bits: int = QUANT_BITS) -> List[Tuple[Color, float]]:
+    """Top-k colores de pixels (N, 3) con su peso.
+
+    Cada color es la media real de los píxeles de su celda cuantizada, no el
+    centro de la celda, así un fondo blanco puro devuelve (255, 255, 255).
+    """
+    n = len(pixels)
+    if n == 0:
+        return []
+    codes = quantize(pixels, bits)
+    bins, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+    top = np.argsort(counts, kind='stable')[::-1][:k]
+    sums = np.stack([np.bincount(inverse, weights=pixels[:, c], minlength=len(bins))
+                     for c in range(3)], axis=1)
+    result = []
+    for i in top:
+        color = tuple(int(v) for v in np.rint(sums[i] / counts[i]))
+        result.append((color, counts[i] / n))
+    return result
+
+def border_pixels(arr: np.ndarray) -> np.ndarray:
+    """Píxeles del marco exterior de arr (H, W, C) sin repetir las esquinas"""
+    h, w = arr.shape[:2]
+    if h < 3 or w < 3:
+        return arr.reshape(-1, arr.shape[2])
+    return np.concatenate([arr[0], arr[-1], arr[1:-1, 0], arr[1:-1, -1]])
+
+def color_stats(image: Image.Image, k: int = 5, side: int = ANALYSIS_SIDE) -> ColorStats:
+    """Paleta, paleta del borde y uniformidad del borde en una sola pasada sobre una miniatura"""
+    small = image if max(image.size) <= side else _thumbnail(image, side)
+    if small.mode not in ('RGB', 'RGBA'):
+        small = small.convert('RGBA' if 'A' in small.getbands() or 'transparency' in small.info else 'RGB')
+    arr = np.asarray(small)
+
+    border = border_pixels(arr)
+    if arr.shape[2] == 4:
+        # Con transparencia solo cuentan los píxeles opacos (también en el borde)
+        pixels = arr[arr[:, :, 3] > ALPHA_THRESHOLD][:, :3]
+        border = border[border[:, 3] > ALPHA_THRESHOLD][:, :3]
+    else:
+        pixels = arr.reshape(-1, 3)
+
+    border_pal = palette(border, k)
+    mean = tuple(int(v) for v in pixels.mean(axis=0)) if len(pixels) else (255, 255, 255)
+    return ColorStats(palette(pixels, k), border_pal,
+                      border_pal[0][1] if border_pal else 0.0, mean)
+
+def dominant_color(stats: ColorStats, border_share: float = 0.3) -> Color:
+    """Color del borde si predomina (> border_share); si no, el promedio del sujeto"""
+    if not stats.palette:
+        return (255, 255, 255)  # Imagen totalmente transparente
+    if stats.border_palette and stats.border_uniformity > border_share:
+        return stats.border_palette[0][0]
+    return stats.mean_color
+
+def is_uniform_background(stats: ColorStats, threshold: float = 0.8) -> bool:
+    return stats.border_uniformity > threshold
+
+def format_palette(colors: List[Tuple[Color, float]], limit: Optional[int] = None) -> str:
+    return " ".join(f"#{r:02x}{g:02x}{b:02x} {w:.0%}" for (r, g, b), w in colors[:limit])
+
+def build_pyramid(image: Image.Image, sides: Tuple[int, ...] = PYRAMID_SIDES) -> Tuple[Image.Image, ...]:
+    """Miniaturas encadenadas: solo la mayor se calcula desde la imagen completa"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    levels = []
+    source = image
+    for side in sorted(sides, reverse=True):
+        if max(source.size) > side:
+            source = _thumbnail(source, side)
+        levels.append(source)
+    return tuple(reversed(levels))
+
+def analyze(image: Image.Image, size: Optional[Tuple[int, int]] = None,
+            mode: Optional[str] = None) -> ImageAnalysis:
+    """Análisis de carga en una pasada: la imagen completa solo se lee al crear la pirámide.
+
+    image puede ser ya una versión reducida; size y mode describen entonces el original.
+    """
+    size = size or image.size
+    pyramid = build_pyramid(image)
+    largest = pyramid[-1]
+    has_alpha = largest.mode == 'RGBA'
+    has_transparency = has_alpha and largest.getchannel('A').getextrema()[0] < 255
+    colors = color_stats(pyramid[0])
+    return ImageAnalysis(size, mode or image.mode, has_transparency, is_uniform_background(colors),
+                         colors, pyramid)
+
+def _thumbnail(image: Image.Image, side: int) -> Image.Image:
+    return resampling.contain(image, side, resampling.ANALYSIS)
@@ -0,0 +1,116 @@
+# background.py - Síntesis del fondo desenfocado
+from typing import Callable, Optional, Tuple
+
+from PIL import Image, ImageFilter
+
+import resampling
+
+# Radio de referencia: se define para una salida de 1080 px en el lado corto
+REFERENCE_SIDE = 1080
+DEFAULT_BLUR_RADIUS = 20
+# Radio con el que se trabaja en la resolución reducida de la pirámide
+WORKING_RADIUS = 3.0
+
+
+def effective_radius(radius: float, target_size: Tuple[int, int]) -> float:
+    """Radio en píxeles de salida: el mismo aspecto de blur en cualquier resolución"""
+    return radius * min(target_size) / REFERENCE_SIDE
+
+def cover_size(image_size: Tuple[int, int], target_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Tamaño al que escalar la imagen para cubrir todo el destino manteniendo proporciones"""
+    target_w, target_h = target_size
+    img_ratio = image_size[0] / image_size[1]
+    if img_ratio > target_w / target_h:
+        return int(img_ratio * target_h), target_h
+    return target_w, int(target_w / img_ratio)
+
+def as_rgb(image: Image.Image) -> Image.Image:
+    """image en RGB; si ya lo está se usa tal cual (convert haría una copia completa)"""
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+def blur_full(image: Image.Image, target_size: Tuple[int, int], radius: float,
+              progress: Optional[Callable[[float], None]] = None,
+              quality: str = resampling.DEFAULT_QUALITY) -> Image.Image:
+    """Blur a resolución completa (coste proporcional al área de salida)"""
+    target_w, target_h = target_size
+    new_width, new_height = cover_size(image.size, target_size)
+    bg = resampling.resize(as_rgb(image), (new_width, new_height), resampling.BACKGROUND, quality)
+    if progress is not None:
+        progress(0.4)
+    bg = bg.filter(ImageFilter.GaussianBlur(radius=radius))
+    result = Image.new('RGB', (target_w, target_h), (0,0,0))
+    result.paste(bg, ((target_w - new_width)//2, (target_h - new_height)//2))
+    return result
+
+def blur_pyramid(image: Image.Image, target_size: Tuple[int, int], radius: float,
+                 progress: Optional[Callable[[float], None]] = None) -> Image.Image:
+    """Blur en una resolución de trabajo reducida y escalado final al destino.
+
+    Se reduce la imagen en un factor ~radius/WORKING_RADIUS, se desenfoca con
+    un radio pequeño y se escala directamente a la región visible del destino.
+    Como el resultado es borroso, la calidad es equivalente y el coste ya no
+    depende del área de salida por el radio.
+    """
+    work, box = pyramid_work(image, target_size, radius, progress)
+    return blur_region(work, box, target_size, 0, target_size[1])
+
+def pyramid_work(image: Image.Image, target_size: Tuple[int, int], radius: float,
+                 progress: Optional[Callable[[float], None]] = None):
+    """Imagen de trabajo desenfocada y la caja (en sus coordenadas) que cubre el destino"""
+    target_w, target_h = target_size
+    cover_w, cover_h = cover_size(image.size, target_size)
+    factor = max(1.0, radius / WORKING_RADIUS)
+    # No reducir por debajo de unas decenas de píxeles
+    factor = min(factor, max(1.0, min(cover_w, cover_h) / 32))
+    work_w = max(1, round(cover_w / factor))
+    work_h = max(1, round(cover_h / factor))
+    work = as_rgb(image).resize((work_w, work_h), Image.BOX, reducing_gap=2.0)
+    if progress is not None:
+        progress(0.5)
+    work = work.filter(ImageFilter.GaussianBlur(radius=radius * work_w / cover_w))
+    if progress is not None:
+        progress(0.7)
+
+    # Región visible (centrada) del fondo en coordenadas de trabajo
+    scale_x, scale_y = work_w / cover_w, work_h / cover_h
+    left = (cover_w - target_w) / 2 * scale_x
+    top = (cover_h - target_h) / 2 * scale_y
+    box = (left, top, left + target_w * scale_x, top + target_h * scale_y)
+    return work, box
+
+def blur_region(work: Image.Image, box, target_size: Tuple[int, int], top: int, bottom: int) -> Image.Image:
+    """Filas [top, bottom) del fondo final, escaladas solo a partir de su parte de box"""
+    target_w, target_h = target_size
+    scale_y = (box[3] - box[1]) / target_h
+    region = (box[0], box[1] + top * scale_y, box[2], box[1] + bottom * scale_y)
+    return work.resize((target_w, bottom - top), Image.BICUBIC, box=region)
+
+def create_blur_background(image: Image.Image, target_size: Tuple[int, int],
+                           radius: float = DEFAULT_BLUR_RADIUS, mode: str = 'pyramid',
+                           progress: Optional[Callable[[float], None]] = None,
+                           quality: str = resampling.DEFAULT_QUALITY) -> Image.Image:
+    """Fondo desenfocado que cubre target_size. radius está referido a 1080 px de lado corto.
+
+    progress(fracción) se llama entre pasos (puede lanzar para cancelar).
+    quality elige el filtro del escalado en modo 'full' (ver resampling.py).
+    """
+    radius = effective_radius(radius, target_size)
+    if mode == 'full' or radius <= WORKING_RADIUS:
+        return blur_full(image, target_size, radius, progress, quality)
+    return blur_pyramid(image, target_size, radius, progress)
+
+def create_blur_strips(image: Image.Image, target_size: Tuple[int, int],
+                       radius: float = DEFAULT_BLUR_RADIUS, mode: str = 'pyramid',
+                       progress: Optional[Callable[[float], None]] = None,
+                       quality: str = resampling.DEFAULT_QUALITY) -> Callable[[int, int], Image.Image]:
+    """Como create_blur_background pero por franjas: devuelve region(top, bottom).
+
+    En modo pirámide solo se guarda la imagen de trabajo (pequeña) y cada franja
+    se escala por separado; en modo 'full' se calcula el fondo completo.
+    """
+    effective = effective_radius(radius, target_size)
+    if mode == 'full' or effective <= WORKING_RADIUS:
+        full = blur_full(image, target_size, effective, progress, quality)
+        return lambda top, bottom: full.crop((0, top, target_size[0], bottom))
+    work, box = pyramid_work(image, target_size, effective, progress)
+    return lambda top, bottom: blur_region(work, box, target_size, top, bottom)
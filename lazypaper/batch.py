@@ -0,0 +1,384 @@
+# batch.py - Generación por lotes sin interfaz gráfica
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from logic import LazyPaperLogic, DEFAULT_OPTIONS, DEFAULT_NAME_TEMPLATE, RESOLUTIONS, target_filename
+from mask_cache import MaskCache
+import segmentation
+import encoder
+import compositing
+import resampling
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.tif')
+OUTPUT_FORMATS = encoder.EXTENSIONS
+
+# Instancia de la lógica por proceso (se crea en el inicializador del worker)
+_worker_logic: Optional[LazyPaperLogic] = None
+
+
+# ---------- Argumentos ----------
+def collect_inputs(patterns: Iterable[str]) -> List[str]:
+    """Expandir directorios y globs a una lista ordenada de imágenes sin duplicados"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.abspath(path))
+    return sorted(set(found))
+
+def parse_resolution(value: str) -> Optional[Tuple[int, int]]:
+    """Aceptar un preset de LazyPaperLogic.resolutions, una resolución WxH o 'all' (None: todos los presets)"""
+    if value.lower() == 'all':
+        return None
+    if RESOLUTIONS.get(value):
+        return RESOLUTIONS[value]
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+        if width > 0 and height > 0:
+            return width, height
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"Resolución inválida: {value}")
+
+def parse_color(value):
+    """'auto', 'white', 'black', '#RRGGBB' o una lista [r, g, b]"""
+    if isinstance(value, (list, tuple)):
+        return tuple(int(c) for c in value)
+    value = str(value).strip().lower()
+    if value in ('auto', 'white', 'black'):
+        return {'white': (255, 255, 255), 'black': (0, 0, 0)}.get(value, 'auto')
+    hex_color = value.lstrip('#')
+    try:
+        return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Color inválido: {value}")
+
+def build_options(args) -> Dict:
+    """Construir el mismo diccionario de opciones que arma la GUI"""
+    options = dict(DEFAULT_OPTIONS)
+    if args.options:
+        raw = args.options
+        if os.path.isfile(raw):
+            with open(raw, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        options.update(json.loads(raw))
+    if args.remove_bg:
+        options['remove_bg'] = True
+    if args.outline:
+        options['add_outline'] = True
+    if args.blur:
+        options['blur_bg'] = True
+    if args.blur_radius is not None:
+        options['blur_radius'] = args.blur_radius
+    if args.outline_width is not None:
+        options['outline_width'] = args.outline_width
+    if args.outline_color is not None:
+        options['outline_color'] = args.outline_color
+    if args.fit_subject:
+        options['fit_subject'] = True
+    if args.refine_mask:
+        options['mask_refine'] = 'guided'
+    if args.precision:
+        options['composite_precision'] = args.precision
+    if args.quality:
+        options['resample_quality'] = args.quality
+    if args.position:
+        options['position'] = args.position
+    if args.offset_x is not None:
+        options['offset_x'] = args.offset_x
+    if args.offset_y is not None:
+        options['offset_y'] = args.offset_y
+    if args.bg_color is not None:
+        options['bg_color'] = args.bg_color
+    options['bg_color'] = parse_color(options['bg_color'])
+    options['outline_color'] = parse_color(options['outline_color'])
+    if options['outline_color'] == 'auto':
+        raise ValueError("El color del contorno no puede ser 'auto'")
+    return options
+
+def build_encoding(args) -> Dict:
+    """Preset de compresión y ajustes extra de Image.save (ver encoder.py)"""
+    overrides = {}
+    if args.encode_options:
+        raw = args.encode_options
+        if os.path.isfile(raw):
+            with open(raw, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        overrides = json.loads(raw)
+    fmt = encoder.format_for('x' + OUTPUT_FORMATS[args.format])
+    if not encoder.available(fmt):
+        raise ValueError(f"Pillow no tiene soporte para {fmt}")
+    return {'preset': args.compression, 'overrides': overrides}
+
+def output_stems(inputs: List[str]) -> Dict[str, str]:
+    """{stem} de cada entrada sin colisiones en el directorio de salida.
+
+    Los nombres repetidos (a/x.jpg, b/x.png) usan la ruta relativa al directorio
+    común ('a_x', 'b_x'); si aun así coinciden se añade la extensión y, en último
+    caso, un índice.
+    """
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in inputs}
+    counts = Counter(stems.values())
+    repeated = [path for path in inputs if counts[stems[path]] > 1]
+    if repeated:
+        root = os.path.commonpath([os.path.dirname(path) for path in repeated])
+        for path in repeated:
+            stems[path] = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '_')
+    counts = Counter(stems.values())
+    for path in repeated:
+        if counts[stems[path]] > 1:
+            stems[path] += '_' + os.path.splitext(path)[1].lstrip('.').lower()
+    seen = Counter()
+    for path in sorted(inputs):
+        seen[stems[path]] += 1
+        if seen[stems[path]] > 1:
+            stems[path] += f"_{seen[stems[path]]}"
+    return stems
+
+def resolution_name(target_size: Tuple[int, int]) -> str:
+    """Preset con ese tamaño o 'Personalizado' (para {preset} y {name})"""
+    return next((name for name, size in RESOLUTIONS.items() if size == tuple(target_size)), 'Personalizado')
+
+def output_path(input_path: str, output_dir: str, target_size: Tuple[int, int], fmt: str,
+                template: str = DEFAULT_NAME_TEMPLATE, stem: Optional[str] = None) -> str:
+    name = target_filename(template, input_path, resolution_name(target_size), target_size, fmt, stem)
+    return os.path.join(output_dir, name)
+
+
+# ---------- Workers ----------
+def _init_worker(warm_segmentation: bool = False, mask_cache: Optional[Dict] = None):
+    """Inicializador de cada proceso: un hilo por proceso y una lógica reutilizable"""
+    global _worker_logic
+    # Evitar sobre-suscripción de hilos cuando hay un proceso por núcleo
+    # (rembg también lo usa para configurar los hilos de onnxruntime)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+    _worker_logic = LazyPaperLogic()
+    if mask_cache is not None:
+        _worker_logic.mask_cache = MaskCache(**mask_cache)
+    # Cargar el modelo una sola vez por worker, antes de la primera imagen
+    if warm_segmentation and _worker_logic.REMBG_AVAILABLE:
+        try:
+            segmentation.get_session(_worker_logic.rembg_model, _worker_logic.rembg_providers)
+        except Exception as e:
+            print(f"No se pudo precargar el modelo: {e}")
+
+def _render_one(input_path: str, out_path: str, target_size: Optional[Tuple[int, int]], options: Dict,
+                fmt: str = 'png', template: str = DEFAULT_NAME_TEMPLATE, encoding: Optional[Dict] = None,
+                stem: Optional[str] = None):
+    """Renderizar una imagen dentro del worker.
+
+    Devuelve (entrada, salida, segundos, error, tiempos) donde tiempos separa
+    la carga del modelo de la inferencia de segmentación de esta imagen y
+    cuenta los aciertos/fallos de la cache de máscaras, además del tiempo y los
+    bytes de codificación. Con target_size None se exportan todos los presets
+    a out_path (un directorio) con template y stem.
+    """
+    encoding = encoding or {}
+    preset, overrides = encoding.get('preset', encoder.DEFAULT_PRESET), encoding.get('overrides')
+    start = time.perf_counter()
+    logic = _worker_logic or LazyPaperLogic()
+    before = _counters(logic)
+    try:
+        with Image.open(input_path) as img:
+            img.load()
+            if img.mode not in ['RGB', 'RGBA']:
+                img = img.convert('RGB')
+        logic.set_image(img, input_path)
+
+        render_options = dict(options)
+        if render_options['bg_color'] == 'auto':
+            render_options['bg_color'] = logic.get_dominant_color(img)
+
+        if target_size is None:
+            # Un solo recorte para todos los presets; el paralelismo ya está en los procesos
+            results = logic.render_targets(logic.preset_targets(), render_options, out_path,
+                                           template, fmt, workers=1, preset=preset, overrides=overrides,
+                                           stem=stem)
+            errors = [f"{r.name}: {r.error}" for r in results if r.error]
+            return (input_path, out_path, time.perf_counter() - start, "; ".join(errors) or None,
+                    _timings(logic, before, [r.encoded for r in results if r.encoded]))
+
+        # Las salidas muy grandes se componen y codifican por franjas
+        encoded = logic.render_to_file(target_size, render_options, out_path, preset, overrides)
+        if encoded is None:
+            return (input_path, None, time.perf_counter() - start,
+                    "No se pudo generar el wallpaper", _timings(logic, before))
+        return input_path, out_path, time.perf_counter() - start, None, _timings(logic, before, [encoded])
+    except Exception as e:
+        return input_path, None, time.perf_counter() - start, str(e), _timings(logic, before)
+    finally:
+        # No retener imágenes entre tareas
+        logic.original_image = None
+        logic.processed_image = None
+        logic.cache.clear()
+
+def _counters(logic: LazyPaperLogic) -> Tuple:
+    return segmentation.totals() + (logic.mask_cache.hits, logic.mask_cache.misses)
+
+def _timings(logic: LazyPaperLogic, before: Tuple, encoded: Iterable = ()) -> Dict[str, float]:
+    after = _counters(logic)
+    delta = [a - b for a, b in zip(after, before)]
+    encoded = list(encoded)
+    return {'model_load': delta[0], 'inference': delta[1], 'mask_hits': delta[2], 'mask_misses': delta[3],
+            'encode': sum(e.seconds for e in encoded), 'bytes': sum(e.nbytes for e in encoded)}
+
+def run_batch(inputs: List[str], output_dir: str, target_size: Optional[Tuple[int, int]], options: Dict,
+              fmt: str = 'png', workers: Optional[int] = None, overwrite: bool = False,
+              mask_cache: Optional[Dict] = None, template: str = DEFAULT_NAME_TEMPLATE,
+              encoding: Optional[Dict] = None) -> Iterator[Tuple]:
+    """Renderizar todas las entradas en un ProcessPoolExecutor, emitiendo resultados al terminar cada una.
+
+    Con target_size None cada entrada se exporta a todos los presets. Los
+    nombres salen de template en ambos casos (ver output_stems).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stems = output_stems(inputs)
+    jobs = []
+    for path in inputs:
+        stem = stems[path]
+        if target_size is None:
+            out_path = output_dir
+            existing = all(os.path.exists(os.path.join(output_dir, target_filename(template, path, name, size, fmt, stem)))
+                           for name, size in RESOLUTIONS.items() if size)
+        else:
+            out_path = output_path(path, output_dir, target_size, fmt, template, stem)
+            existing = os.path.exists(out_path)
+        if not overwrite and existing:
+            yield path, out_path, 0.0, None, {}
+            continue
+        jobs.append((path, out_path, stem))
+    if not jobs:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker,
+                             initargs=(bool(options.get('remove_bg')), mask_cache)) as pool:
+        futures = [pool.submit(_render_one, path, out_path, target_size, options, fmt, template, encoding, stem)
+                   for path, out_path, stem in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# ---------- CLI ----------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="lazypaper-batch",
+        description="Genera wallpapers para carpetas completas de imágenes sin interfaz gráfica")
+    parser.add_argument('inputs', nargs='*', help="Directorios, archivos o globs de entrada")
+    parser.add_argument('-o', '--output', default='wallpapers', help="Directorio de salida")
+    parser.add_argument('-r', '--resolution', type=parse_resolution, default=(1920, 1080),
+                        help="Preset de resolución (p. ej. 'Desktop 4K (3840x2160)'), WxH o 'all' (todos los presets)")
+    parser.add_argument('--name-template', default=DEFAULT_NAME_TEMPLATE,
+                        help="Nombre de salida: {stem}, {preset}, {name}, {width}, {height}")
+    parser.add_argument('-f', '--format', choices=sorted(OUTPUT_FORMATS), default='png')
+    parser.add_argument('--compression', choices=list(encoder.PRESETS), default=encoder.DEFAULT_PRESET,
+                        help="Compromiso velocidad/tamaño al codificar (por defecto balanced)")
+    parser.add_argument('--encode-options',
+                        help="Ajustes extra de Image.save en JSON, p. ej. '{\"quality\": 85, \"progressive\": true}'")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Procesos en paralelo (por defecto: número de núcleos)")
+    parser.add_argument('--options', help="Opciones en JSON (texto o ruta a archivo), como las arma la GUI")
+    parser.add_argument('--remove-bg', action='store_true', help="Eliminar fondo (rembg)")
+    parser.add_argument('--outline', action='store_true', help="Agregar contorno blanco")
+    parser.add_argument('--outline-width', type=int, help="Ancho del contorno en píxeles (por defecto 6)")
+    parser.add_argument('--outline-color', help="Color del contorno: white, black o #RRGGBB")
+    parser.add_argument('--fit-subject', action='store_true',
+                        help="Escalar y posicionar según la caja del sujeto recortado")
+    parser.add_argument('--blur', action='store_true', help="Fondo con blur")
+    parser.add_argument('--blur-radius', type=float,
+                        help="Radio del blur referido a 1080 px de lado corto (por defecto 20)")
+    parser.add_argument('--refine-mask', action='store_true',
+                        help="Refinar bordes de la máscara reescalada (filtro guiado)")
+    parser.add_argument('--precision', choices=list(compositing.PRECISIONS),
+                        help="Escalar, contornear y componer el sujeto en alfa premultiplicado con esta precisión")
+    parser.add_argument('--quality', choices=list(resampling.QUALITIES),
+                        help=f"Filtros de escalado: fast, balanced o best (por defecto {resampling.DEFAULT_QUALITY})")
+    parser.add_argument('--position', choices=['left', 'center', 'right'])
+    parser.add_argument('--offset-x', type=int)
+    parser.add_argument('--offset-y', type=int)
+    parser.add_argument('--bg-color', help="auto, white, black o #RRGGBB")
+    parser.add_argument('--cache-dir', help="Directorio de la cache de máscaras")
+    parser.add_argument('--mask-cache-mb', type=int, default=512, help="Tamaño máximo de la cache de máscaras")
+    parser.add_argument('--no-mask-cache', action='store_true', help="No usar la cache de máscaras en disco")
+    parser.add_argument('--overwrite', action='store_true', help="Sobrescribir salidas existentes")
+    parser.add_argument('--list-resolutions', action='store_true', help="Mostrar presets y salir")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.list_resolutions:
+        for name, size in RESOLUTIONS.items():
+            if size:
+                print(f"{name}")
+        return 0
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("No se encontraron imágenes de entrada", file=sys.stderr)
+        return 1
+    try:
+        options = build_options(args)
+        encoding = build_encoding(args)
+        target_filename(args.name_template, inputs[0], 'Personalizado', (1, 1), args.format)
+    except (ValueError, KeyError, IndexError, argparse.ArgumentTypeError) as e:
+        print(f"Opciones inválidas: {e}", file=sys.stderr)
+        return 2
+
+    total = len(inputs)
+    failed = 0
+    inference_time = 0.0
+    mask_hits = mask_misses = 0
+    encode_time = 0.0
+    encoded_bytes = 0
+    mask_cache = {'directory': args.cache_dir, 'max_bytes': args.mask_cache_mb * 1024 * 1024,
+                  'enabled': not args.no_mask_cache}
+    start = time.perf_counter()
+    target = f"{args.resolution[0]}x{args.resolution[1]}" if args.resolution else "todos los presets"
+    print(f"Procesando {total} imágenes a {target}...", flush=True)
+    for done, (path, out_path, elapsed, error, timings) in enumerate(
+            run_batch(inputs, args.output, args.resolution, options, args.format,
+                      args.workers, args.overwrite, mask_cache, args.name_template, encoding), start=1):
+        inference_time += timings.get('inference', 0.0)
+        encode_time += timings.get('encode', 0.0)
+        encoded_bytes += timings.get('bytes', 0)
+        mask_hits += timings.get('mask_hits', 0)
+        mask_misses += timings.get('mask_misses', 0)
+        if error:
+            failed += 1
+            print(f"[{done}/{total}] ERROR {path}: {error}", flush=True)
+        else:
+            detail = f", inferencia {timings['inference']:.2f}s" if timings.get('inference') else ""
+            if timings.get('bytes'):
+                detail += f", {timings['bytes'] / 1e6:.2f} MB codificados en {timings['encode']:.2f}s"
+            print(f"[{done}/{total}] {path} -> {out_path} ({elapsed:.2f}s{detail})", flush=True)
+
+    total_time = time.perf_counter() - start
+    rate = total / total_time if total_time > 0 else 0.0
+    print(f"Listo: {total - failed} generados, {failed} errores en {total_time:.1f}s ({rate:.2f} img/s)")
+    if inference_time:
+        print(f"Inferencia de segmentación acumulada: {inference_time:.1f}s "
+              f"(la carga del modelo se hace una vez por worker, fuera de este tiempo)")
+    if mask_hits or mask_misses:
+        print(f"Cache de máscaras: {mask_hits} aciertos, {mask_misses} fallos")
+    if encoded_bytes:
+        print(f"Codificación {args.format} ({args.compression}): {encoded_bytes / 1e6:.2f} MB "
+              f"en {encode_time:.1f}s acumulados")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
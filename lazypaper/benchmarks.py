@@ -0,0 +1,588 @@
+# benchmarks.py - Mediciones de rendimiento del motor
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List
+
+from PIL import Image, ImageDraw, ImageFilter
+import numpy as np
+
+import segmentation
+import outline
+import background
+import analysis
+import loader
+import encoder
+import compositing
+import resampling
+from logic import LazyPaperLogic, DEFAULT_OPTIONS, composite_subject, place_subject, subject_box, subject_canvas
+
+try:
+    import resource  # Solo en Unix: pico de memoria del proceso
+except ImportError:
+    resource = None
+
+
+# ---------- Utilidades ----------
+def synthetic_photo(width: int, height: int, seed: int = 0) -> Image.Image:
+    """Imagen sintética tipo foto: degradado suave + ruido leve + un sujeto central"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    arr = np.empty((height, width, 3), dtype=np.float32)
+    arr[..., 0] = 255 * x / max(width - 1, 1)
+    arr[..., 1] = 255 * y / max(height - 1, 1)
+    arr[..., 2] = 128
+    arr += rng.normal(0, 6, size=arr.shape).astype(np.float32)
+    img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8), 'RGB')
+    ImageDraw.Draw(img).ellipse((width // 3, height // 4, 2 * width // 3, 3 * height // 4),
+                                fill=(220, 60, 40))
+    return img
+
+def timeit(func: Callable, repeat: int = 3) -> float:
+    """Mejor tiempo (segundos) de varias ejecuciones"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def print_table(headers: List[str], rows: List[List]):
+    widths = [max(len(str(v)) for v in col) for col in zip(headers, *rows)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+# ---------- Eliminación de fondo: bytes PNG vs memoria ----------
+def _ellipse_mask(image: Image.Image) -> Image.Image:
+    """Segmentador de reemplazo (sin rembg) para aislar el costo de E/S"""
+    mask = Image.new('L', image.size, 0)
+    w, h = image.size
+    ImageDraw.Draw(mask).ellipse((w // 4, h // 4, 3 * w // 4, 3 * h // 4), fill=255)
+    return mask
+
+def fake_segmentation(logic: LazyPaperLogic) -> LazyPaperLogic:
+    """Máscara elíptica en lugar del modelo, también sin rembg instalado.
+
+    _cutout comprueba la disponibilidad de rembg antes de pedir la máscara,
+    así que además de la máscara hay que dar rembg por disponible.
+    """
+    segmentation.REMBG_AVAILABLE = True
+    segmentation.load_rembg = lambda: True
+    logic.REMBG_AVAILABLE = True
+    logic._predict_mask_cached = lambda seg_image, digest: _ellipse_mask(seg_image)
+    return logic
+
+def cutout_bytes_path(image: Image.Image, use_rembg: bool) -> Image.Image:
+    """Camino anterior: PNG -> rembg(bytes) -> PNG -> RGBA"""
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    data = buf.getvalue()
+    if use_rembg:
+        res = segmentation.remove(data)
+    else:
+        src = Image.open(io.BytesIO(data)).convert('RGBA')
+        src.putalpha(_ellipse_mask(src))
+        out = io.BytesIO()
+        src.save(out, format='PNG')
+        res = out.getvalue()
+    return Image.open(io.BytesIO(res)).convert('RGBA')
+
+def cutout_memory_path(image: Image.Image, use_rembg: bool) -> Image.Image:
+    """Camino nuevo: imagen en memoria -> máscara -> putalpha"""
+    mask = segmentation.predict_mask(image) if use_rembg else _ellipse_mask(image)
+    result = image.convert('RGBA')
+    result.putalpha(mask)
+    return result
+
+def bench_rembg_io(args):
+    sizes, repeat = args.sizes, args.repeat
+    use_rembg = segmentation.load_rembg()
+    if use_rembg:
+        segmentation.get_session()  # La carga del modelo no entra en la medición
+    else:
+        print("rembg no disponible: se mide solo el costo de E/S alrededor del segmentador")
+    rows = []
+    for side in sizes:
+        img = synthetic_photo(side * 3 // 2, side)
+        old = timeit(lambda: cutout_bytes_path(img, use_rembg), repeat)
+        new = timeit(lambda: cutout_memory_path(img, use_rembg), repeat)
+        rows.append([f"{img.width}x{img.height}", f"{img.width * img.height / 1e6:.1f}MP",
+                     f"{old * 1000:.0f}ms", f"{new * 1000:.0f}ms", f"{old / new:.1f}x"])
+    print_table(["tamaño", "px", "bytes PNG", "memoria", "mejora"], rows)
+
+
+# ---------- Contorno: GaussianBlur + point() vs transformada de distancia ----------
+def synthetic_cutout(width: int, height: int) -> Image.Image:
+    """Recorte RGBA con un sujeto que ocupa ~1/4 del lienzo"""
+    img = synthetic_photo(width, height).convert('RGBA')
+    mask = Image.new('L', img.size, 0)
+    ImageDraw.Draw(mask).ellipse((width * 3 // 8, height // 4, width * 5 // 8, height * 3 // 4), fill=255)
+    img.putalpha(mask)
+    return img
+
+def outline_blur_threshold(image: Image.Image, outline_width: int = 6) -> Image.Image:
+    """Implementación anterior de add_outline_to_image (referencia)"""
+    alpha = image.split()[-1]
+    dilated = alpha.filter(ImageFilter.GaussianBlur(radius=outline_width/2))
+    bw = dilated.point(lambda p: 255 if p > 10 else 0)
+    outline_img = Image.new('RGBA', (image.width, image.height), (255, 255, 255, 0))
+    outline_img.paste(Image.new('RGBA', (image.width, image.height), (255,255,255,255)), mask=bw)
+    outline_img.paste(image, (0,0), image)
+    return outline_img
+
+def bench_outline(args):
+    for side in args.sizes:
+        img = synthetic_cutout(side * 3 // 2, side)
+        rows = []
+        for width in args.widths:
+            old = timeit(lambda: outline_blur_threshold(img, width), args.repeat)
+            new = timeit(lambda: outline.add_outline(img, width), args.repeat)
+            rows.append([f"{width}px", f"{old * 1000:.0f}ms", f"{new * 1000:.0f}ms", f"{old / new:.1f}x"])
+        print(f"Recorte {img.width}x{img.height}")
+        print_table(["ancho", "blur+umbral", "distancia", "mejora"], rows)
+        print()
+
+
+# ---------- Fondo desenfocado: resolución completa vs pirámide ----------
+def bench_blur(args):
+    img = synthetic_photo(6000, 4000)
+    rows = []
+    for target in [(1920, 1080), (3840, 2160), (7680, 4320)]:
+        radius = background.effective_radius(background.DEFAULT_BLUR_RADIUS, target)
+        full = background.blur_full(img, target, radius)
+        pyramid = background.blur_pyramid(img, target, radius)
+        diff = np.abs(np.asarray(full, dtype=np.int16) - np.asarray(pyramid, dtype=np.int16)).mean()
+        old = timeit(lambda: background.blur_full(img, target, radius), args.repeat)
+        new = timeit(lambda: background.blur_pyramid(img, target, radius), args.repeat)
+        rows.append([f"{target[0]}x{target[1]}", f"{radius:.0f}px", f"{old * 1000:.0f}ms",
+                     f"{new * 1000:.0f}ms", f"{old / new:.1f}x", f"{diff:.2f}"])
+    print(f"Origen {img.width}x{img.height}")
+    print_table(["destino", "radio", "completo", "pirámide", "mejora", "dif. media"], rows)
+
+
+# ---------- Color dominante: Counter de tuplas vs NumPy ----------
+def analysis_counter(image: Image.Image):
+    """Implementación anterior: bordes a resolución completa + Counter (referencia)"""
+    arr = np.array(image.convert('RGB'))
+    border = [tuple(p) for p in np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])]
+    uniform = Counter(border).most_common(1)[0][1] / len(border) > 0.8
+    small = image.copy()
+    small.thumbnail((100, 100), Image.LANCZOS)
+    arr = np.array(small)
+    border = [tuple(p) for p in np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])]
+    return uniform, Counter(border).most_common(1)[0][0]
+
+def bench_palette(args):
+    rows = []
+    for side in args.sizes:
+        img = synthetic_photo(side * 3 // 2, side)
+        old = timeit(lambda: analysis_counter(img), args.repeat)
+        new = timeit(lambda: analysis.color_stats(img), args.repeat)
+        rows.append([f"{img.width}x{img.height}", f"{old * 1000:.1f}ms", f"{new * 1000:.1f}ms",
+                     f"{old / new:.1f}x"])
+    print_table(["imagen", "Counter", "NumPy", "mejora"], rows)
+
+
+# ---------- Carga: decodificación completa vs vista previa reducida ----------
+def load_full_preview(path: str) -> Image.Image:
+    """Carga anterior: decodificar todo, convertir y reducir a 300 px (referencia)"""
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+    thumb = img.copy()
+    thumb.thumbnail((300, 300), Image.LANCZOS)
+    return thumb
+
+def bench_load(args):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for side in args.sizes:
+            path = os.path.join(tmp, f"{side}.jpg")
+            synthetic_photo(side * 3 // 2, side).save(path, 'JPEG', quality=90)
+            old = timeit(lambda: load_full_preview(path), args.repeat)
+            new = timeit(lambda: loader.ImageSource(path).preview(), args.repeat)
+            rows.append([f"{side * 3 // 2}x{side}", f"{old * 1000:.0f}ms", f"{new * 1000:.0f}ms",
+                         f"{old / new:.1f}x"])
+    print("Tiempo hasta la primera vista previa (JPEG)")
+    print_table(["imagen", "completa", "draft", "mejora"], rows)
+
+
+# ---------- Todas las resoluciones: una generación por preset vs render_targets ----------
+def _targets_logic(image: Image.Image, use_rembg: bool) -> LazyPaperLogic:
+    logic = LazyPaperLogic()
+    logic.set_image(image, 'bench.png')
+    return logic if use_rembg else fake_segmentation(logic)
+
+def render_each_target(image: Image.Image, options, output_dir: str, use_rembg: bool):
+    """Como pulsar Generar/Guardar por cada preset: nada se comparte entre destinos"""
+    for name, size in LazyPaperLogic().preset_targets().items():
+        logic = _targets_logic(image, use_rembg)
+        encoder.save(logic.generate_wallpaper(size, options),
+                     os.path.join(output_dir, f"{size[0]}x{size[1]}.png"))
+
+def bench_targets(args):
+    use_rembg = segmentation.load_rembg()
+    if use_rembg:
+        segmentation.get_session()
+    options = dict(DEFAULT_OPTIONS, remove_bg=True, add_outline=True)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for side in args.sizes:
+            img = synthetic_photo(side * 3 // 2, side)
+            old = timeit(lambda: render_each_target(img, options, tmp, use_rembg), 1)
+            new = timeit(lambda: _targets_logic(img, use_rembg).render_targets(
+                LazyPaperLogic().preset_targets(), options, tmp), 1)
+            rows.append([f"{img.width}x{img.height}", f"{old:.2f}s", f"{new:.2f}s", f"{old / new:.1f}x"])
+    print(f"Exportar todos los presets (recorte + contorno, {os.cpu_count()} núcleos)")
+    print_table(["imagen", "uno a uno", "render_targets", "mejora"], rows)
+
+
+# ---------- Codificación: tamaño y tiempo por formato y preset ----------
+def encode_in_memory(image: Image.Image) -> List[encoder.EncodeResult]:
+    """Tamaño y tiempo de codificación de image en cada formato y preset disponibles"""
+    results = []
+    for fmt in encoder.available_formats():
+        for preset in encoder.PRESETS:
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            encoder.encode(image, buffer, fmt, preset)
+            results.append(encoder.EncodeResult(None, fmt, preset, buffer.tell(), time.perf_counter() - start))
+    return results
+
+def bench_encode(args):
+    rows = []
+    for side in args.sizes:
+        img = synthetic_photo(side * 16 // 9, side)
+        for result in encode_in_memory(img):
+            rows.append([f"{img.width}x{img.height}", result.format, result.preset,
+                         f"{result.nbytes / 1e6:.2f}MB", f"{result.seconds * 1000:.0f}ms"])
+    print_table(["imagen", "formato", "preset", "tamaño", "tiempo"], rows)
+
+
+# ---------- Salidas enormes: lienzo completo vs franjas ----------
+def _peak_render(source_path: str, target_size, output_path: str, tiled: bool):
+    """En un proceso nuevo: (segundos, MB de pico por encima del estado tras el recorte)"""
+    logic = LazyPaperLogic()
+    logic.set_source(loader.ImageSource(source_path))
+    options = dict(DEFAULT_OPTIONS, remove_bg=True, add_outline=True)
+    fake_segmentation(logic)
+    logic.prepare_subject(options)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if tiled:
+        logic.render_to_file(target_size, options, output_path)
+    else:
+        encoder.save(logic.generate_wallpaper(target_size, options), output_path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return time.perf_counter() - start, (peak - base) / 1024
+
+def bench_tiled(args):
+    if resource is None:
+        print("El benchmark 'tiled' necesita el módulo resource (Unix)")
+        return
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.jpg")
+        synthetic_photo(3000, 2000).save(source, 'JPEG', quality=90)
+        for side in args.sizes:
+            size = (side * 16 // 9, side)
+            results = []
+            for tiled in (False, True):
+                # Un proceso por medición: el pico de memoria no se arrastra entre casos
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    results.append(pool.submit(_peak_render, source, size,
+                                               os.path.join(tmp, "out.png"), tiled).result())
+            (old_t, old_mb), (new_t, new_mb) = results
+            rows.append([f"{size[0]}x{size[1]}", f"{old_t:.2f}s", f"{old_mb:.0f}MB",
+                         f"{new_t:.2f}s", f"{new_mb:.0f}MB"])
+    print("Generar y guardar PNG: lienzo completo vs franjas (pico de memoria adicional)")
+    print_table(["salida", "completo", "memoria", "franjas", "memoria"], rows)
+
+
+# ---------- Composición: lienzo RGBA completo vs rectángulo del sujeto ----------
+def composite_full_frame(base: Image.Image, subject: Image.Image, position) -> Image.Image:
+    """Versión anterior: todo el lienzo pasa a RGBA y se compone entero"""
+    rgba = base.convert('RGBA')
+    temp = Image.new('RGBA', base.size, (0,0,0,0))
+    temp.paste(subject, position, subject)
+    return Image.alpha_composite(rgba, temp).convert('RGB')
+
+def bench_composite(args):
+    base = synthetic_photo(3840, 2160)
+    rows = []
+    for side in args.sizes:
+        subject = synthetic_cutout(side * 3 // 2, side)
+        # Centrado y parcialmente fuera por la esquina superior izquierda
+        for position in [((base.width - subject.width) // 2, (base.height - subject.height) // 2),
+                         (-subject.width // 3, -subject.height // 3)]:
+            old = timeit(lambda: composite_full_frame(base.copy(), subject, position), args.repeat)
+            new = timeit(lambda: composite_subject(base.copy(), subject, position), args.repeat)
+            rows.append([f"{subject.width}x{subject.height}", str(position),
+                         f"{old * 1000:.0f}ms", f"{new * 1000:.0f}ms", f"{old / new:.1f}x"])
+    print("Sujeto RGBA sobre un lienzo 4K (incluye la copia del lienzo)")
+    print_table(["sujeto", "posición", "completo", "rectángulo", "mejora"], rows)
+
+
+# ---------- Núcleo premultiplicado: composición, escalado y calidad de bordes ----------
+def soft_cutout(width: int, height: int) -> Image.Image:
+    """Recorte con borde suave (como una máscara de segmentación reescalada)"""
+    img = synthetic_cutout(width, height)
+    img.putalpha(img.getchannel('A').filter(ImageFilter.GaussianBlur(max(2, width // 200))))
+    return img
+
+def edge_error(result: Image.Image, reference: np.ndarray) -> float:
+    """Error medio de color (0-255) en los píxeles semitransparentes frente a la referencia"""
+    arr = np.asarray(result).astype(np.float64)
+    edge = (reference[..., 3] > 0.5) & (reference[..., 3] < 254.5)
+    return float(np.abs(arr[edge, :3] - reference[edge, :3]).mean()) if edge.any() else 0.0
+
+def resize_reference(image: Image.Image, size) -> np.ndarray:
+    """Escalado premultiplicado en float64 canal a canal (referencia de calidad)"""
+    rgba = np.asarray(image).astype(np.float64)
+    rgba[..., :3] *= rgba[..., 3:4] / 255.0
+    channels = [np.asarray(Image.fromarray(rgba[..., c].astype(np.float32), 'F').resize(size, Image.LANCZOS))
+                .astype(np.float64) for c in range(4)]
+    out = np.clip(np.stack(channels, axis=-1), 0, 255)
+    alpha = out[..., 3:4]
+    out[..., :3] = np.where(alpha > 0, out[..., :3] * 255.0 / np.maximum(alpha, 1e-9), 0)
+    return out
+
+def bench_premultiplied(args):
+    base = synthetic_photo(3840, 2160)
+    rows = []
+    for side in args.sizes:
+        subject = soft_cutout(side * 3 // 2, side)
+        position = ((base.width - subject.width) // 2, (base.height - subject.height) // 2)
+        region = np.array(base.crop(position + (position[0] + subject.width, position[1] + subject.height)))
+        sprites = {p: compositing.Sprite(subject, p) for p in compositing.PRECISIONS}
+        rows.append([f"{subject.width}x{subject.height}", "lienzo RGBA completo (anterior)",
+                     f"{timeit(lambda: composite_full_frame(base.copy(), subject, position), args.repeat) * 1000:.1f}ms"])
+        rows.append(["", "paste con máscara (Pillow)",
+                     f"{timeit(lambda: composite_subject(base.copy(), subject, position), args.repeat) * 1000:.1f}ms"])
+        for precision, sprite in sprites.items():
+            rows.append(["", f"Sprite {precision}",
+                         f"{timeit(lambda: compositing.composite_sprite(base.copy(), sprite, position), args.repeat) * 1000:.1f}ms"])
+        rows.append(["", "Sprite float32, solo el núcleo (array)",
+                     f"{timeit(lambda: sprites['float32'].composite_onto(region, (0, 0)), args.repeat) * 1000:.1f}ms"])
+        target = (subject.width // 3, subject.height // 3)
+        reference = resize_reference(subject, target)
+        pil = subject.resize(target, Image.LANCZOS)
+        rows.append(["", "escalado RGBA Pillow (8 bits)",
+                     f"{timeit(lambda: subject.resize(target, Image.LANCZOS), args.repeat) * 1000:.1f}ms",
+                     f"{edge_error(pil, reference):.2f}"])
+        for precision in compositing.PRECISIONS:
+            premul = compositing.resize_premultiplied(subject, target, Image.LANCZOS, precision)
+            rows.append(["", f"escalado premultiplicado {precision}",
+                         f"{timeit(lambda: compositing.resize_premultiplied(subject, target, Image.LANCZOS, precision), args.repeat) * 1000:.1f}ms",
+                         f"{edge_error(premul, reference):.2f}"])
+    print("Composición sobre 4K (incluye la copia del lienzo) y escalado a 1/3 con error de color en bordes")
+    print_table(["sujeto", "método", "tiempo", "error borde"], [r + [""] * (4 - len(r)) for r in rows])
+
+
+# ---------- Política de remuestreo: LANCZOS en todo vs filtro por uso y calidad ----------
+def bench_resampling(args):
+    rows = []
+    for side in args.sizes:
+        img = synthetic_photo(side * 3 // 2, side)
+        cases = [(resampling.SUBJECT, (1920, 1080)), (resampling.SUBJECT, (1280, 720)),
+                 (resampling.BACKGROUND, (1280, 720)), (resampling.PREVIEW, (600, 400))]
+        for purpose, target in cases:
+            # Mismo ajuste que el sujeto: proporciones del origen dentro del destino
+            scale = min(target[0] / img.width, target[1] / img.height)
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            reference = img.resize(size, Image.LANCZOS)
+            old = timeit(lambda: img.resize(size, Image.LANCZOS), args.repeat)
+            exact = np.asarray(reference, dtype=np.int16)
+            for quality in (resampling.QUALITIES if purpose not in resampling.FIXED else ('-',)):
+                q = quality if quality != '-' else resampling.DEFAULT_QUALITY
+                out = resampling.resize(img, size, purpose, q)
+                new = timeit(lambda: resampling.resize(img, size, purpose, q), args.repeat)
+                diff = np.abs(np.asarray(out, dtype=np.int16) - exact)
+                rows.append([f"{img.width}x{img.height}", f"{purpose} {size[0]}x{size[1]}", quality,
+                             f"{old * 1000:.0f}ms", f"{new * 1000:.0f}ms", f"{old / new:.1f}x",
+                             f"{diff.mean():.2f}", str(int(diff.max()))])
+    print("Referencia: LANCZOS exacto en un paso (lo que se usaba en todos los escalados)")
+    print_table(["origen", "uso", "calidad", "LANCZOS", "política", "mejora", "dif. media", "dif. máx"], rows)
+
+
+# ---------- Bordes del sujeto: recorte escalado por región vs marco entero ----------
+# Diferencia máxima permitida (niveles de 0-255) con filtro exacto ('best');
+# con reducing_gap la reducción por bloques se alinea distinto y solo se informa
+EDGE_TOLERANCE = 3
+
+def _on_gray(image: Image.Image, size, position) -> np.ndarray:
+    canvas = Image.new('RGB', size, (128, 128, 128))
+    canvas.paste(image, position, image)
+    return np.asarray(canvas, dtype=np.int16)
+
+def bench_edges(args):
+    """Regresión de bordes: devuelve 1 si con 'best' el recorte no coincide con el marco entero"""
+    logic = LazyPaperLogic()
+    rows, failed = [], []
+    for side in args.sizes:
+        img = synthetic_photo(side * 3 // 2 + 1, side + 3)
+        w, h = img.size
+        for shape in ('rectángulo', 'elipse'):
+            mask = Image.new('L', img.size, 0)
+            draw = ImageDraw.Draw(mask)
+            (draw.rectangle if shape == 'rectángulo' else draw.ellipse)(
+                (w * 0.237, h * 0.205, w * 0.736, h * 0.824), fill=255)
+            subject = logic._crop_subject(img, mask, f"edges-{side}-{shape}")
+            frame = img.convert('RGBA')
+            frame.putalpha(mask)
+            for target in ((1280, 720), (1920, 1080), (800, 600)):
+                for quality in resampling.QUALITIES:
+                    options = dict(DEFAULT_OPTIONS, resample_quality=quality)
+                    size, position, source = place_subject(subject.frame, subject_box(subject), target, options)
+                    cropped = logic._resized_stage(subject.image, size, quality=quality, box=source,
+                                                   canvas=subject_canvas(subject))
+                    full_size, full_position, _ = place_subject(img.size, (0, 0) + img.size, target, options)
+                    full = logic._resized_stage(frame, full_size, quality=quality)
+                    diff = np.abs(_on_gray(cropped, target, position) - _on_gray(full, target, full_position))
+                    ok = quality != 'best' or diff.max() <= EDGE_TOLERANCE
+                    if not ok:
+                        failed.append(f"{shape} {target[0]}x{target[1]}")
+                    rows.append([f"{w}x{h}", shape, f"{target[0]}x{target[1]}", quality,
+                                 str(int((diff.max(axis=-1) > 1).sum())), str(int(diff.max())),
+                                 "ok" if ok else "DIFIERE"])
+    print("Sujeto recortado y escalado por región frente a escalar el marco entero (sobre gris)")
+    print_table(["origen", "sujeto", "destino", "calidad", "píxeles >1", "dif. máx", ""], rows)
+    if failed:
+        print(f"Bordes distintos del marco entero en: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+# ---------- Memoria: copias transitorias por etapa sobre una imagen grande ----------
+# Pico permitido por encima del estado previo, en múltiplos del tamaño del
+# original en memoria (Pillow guarda RGB con 4 bytes por píxel)
+MEMORY_BUDGETS = {
+    'vista previa': 0.1,
+    'análisis': 0.1,
+    'recorte': 1.0,  # El recorte RGBA cacheado cuenta (~60% del original con la elipse)
+    'contorno': 1.0,
+    'render 3840x2160': 0.75,  # Incluye la copia del recorte con el borde que pide la región exacta
+    'render 3840x2160 blur': 1.75,  # Sujeto escalado (dos pasadas) + fondo + lienzo
+}
+
+def _memory_mark() -> float:
+    """Reiniciar el pico de memoria (Linux: VmHWM) y devolver la memoria actual en MB.
+
+    Sin /proc se usa ru_maxrss, que no se reinicia: el pico de una etapa previa
+    puede tapar el de la etapa medida.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _proc_status_mb('VmRSS')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _memory_peak() -> float:
+    try:
+        return _proc_status_mb('VmHWM')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _proc_status_mb(field: str) -> float:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    raise OSError(field)
+
+def _stage_peak(source_path: str, stage: str):
+    """En un proceso nuevo: (segundos, MB de pico por encima del estado antes de la etapa)"""
+    logic = fake_segmentation(LazyPaperLogic())
+    logic.mask_cache.enabled = False
+    source = loader.ImageSource(source_path)
+    logic.set_source(source)
+    image = logic.original_image
+    cutout = dict(DEFAULT_OPTIONS, remove_bg=True)
+    outlined = dict(cutout, add_outline=True)
+    # Las etapas previas tienen que haber recortado de verdad; si no, la medida no vale
+    if stage == 'contorno' and not logic.prepare_subject(cutout):
+        raise RuntimeError("No se pudo preparar el recorte")
+    elif stage == 'render 3840x2160' and not logic.prepare_subject(outlined):
+        raise RuntimeError("No se pudo preparar el recorte con contorno")
+    run = {
+        'vista previa': lambda: source.reduced(loader.PREVIEW_SIDE),
+        'análisis': lambda: analysis.analyze(image),
+        'recorte': lambda: logic.prepare_subject(cutout),
+        'contorno': lambda: logic.prepare_subject(outlined),
+        'render 3840x2160': lambda: logic.generate_wallpaper((3840, 2160), outlined),
+        'render 3840x2160 blur': lambda: logic.generate_wallpaper((3840, 2160), dict(DEFAULT_OPTIONS, blur_bg=True)),
+    }[stage]
+    base = _memory_mark()
+    start = time.perf_counter()
+    result = run()
+    seconds, mb = time.perf_counter() - start, _memory_peak() - base
+    # prepare_subject devuelve un bool; las demás etapas, su imagen o resultado
+    if result is None or result is False:
+        raise RuntimeError(f"La etapa '{stage}' no produjo imagen")
+    return seconds, mb
+
+def bench_memory(args):
+    """Regresión de memoria: devuelve 1 si alguna etapa supera su presupuesto"""
+    if resource is None:
+        print("El benchmark 'memory' necesita el módulo resource (Unix)")
+        return 0
+    side = max(args.sizes)
+    width, height = side * 3 // 2, side
+    source_mb = width * height * 4 / 2 ** 20
+    rows, failed = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.png")
+        synthetic_photo(width, height).save(source, 'PNG', compress_level=1)
+        for stage, budget in MEMORY_BUDGETS.items():
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                seconds, mb = pool.submit(_stage_peak, source, stage).result()
+            ok = mb <= budget * source_mb
+            if not ok:
+                failed.append(stage)
+            rows.append([stage, f"{seconds * 1000:.0f}ms", f"{mb:.0f}MB",
+                         f"{budget * source_mb:.0f}MB", "ok" if ok else "EXCEDIDO"])
+    print(f"Pico de memoria adicional por etapa, original {width}x{height} ({source_mb:.0f} MB en memoria)")
+    print_table(["etapa", "tiempo", "pico", "presupuesto", ""], rows)
+    if failed:
+        print(f"Regresión de memoria en: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+# ---------- CLI ----------
+BENCHMARKS = {
+    'rembg-io': bench_rembg_io,
+    'outline': bench_outline,
+    'blur': bench_blur,
+    'palette': bench_palette,
+    'load': bench_load,
+    'targets': bench_targets,
+    'encode': bench_encode,
+    'tiled': bench_tiled,
+    'composite': bench_composite,
+    'premultiplied': bench_premultiplied,
+    'resampling': bench_resampling,
+    'edges': bench_edges,
+    'memory': bench_memory,
+}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de LazyPaper")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000],
+                        help="Alto de las imágenes sintéticas (ancho = 1.5x)")
+    parser.add_argument('--widths', type=int, nargs='+', default=[2, 4, 8, 16, 32, 64],
+                        help="Anchos de contorno (benchmark 'outline')")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.name](args) or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# cache.py - Cache LRU en memoria para las etapas del pipeline
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+from PIL import Image
+
+
+def estimate_nbytes(value) -> int:
+    """Tamaño aproximado en memoria de un valor cacheado"""
+    if isinstance(value, Image.Image):
+        bytes_per_pixel = 1 if value.mode in ('1', 'L', 'P') else 4
+        return value.width * value.height * bytes_per_pixel
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value) + 64
+    nbytes = getattr(value, 'nbytes', None)  # arrays de NumPy
+    return int(nbytes) if nbytes is not None else 64
+
+
+class _Flight:
+    """Cálculo en curso de una clave: los demás hilos esperan su resultado"""
+    __slots__ = ('done', 'value', 'ok')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+
+
+class LRUCache:
+    """Cache LRU acotada por memoria (bytes estimados) y segura entre hilos.
+
+    Los valores se comparten tal cual: quien los obtiene no debe modificarlos
+    (copiar antes de pegar/dibujar encima).
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024,
+                 sizeof: Callable[[object], int] = estimate_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Al enviar la lógica a otro proceso no se copia el contenido
+        state = self.__dict__.copy()
+        state.update(_entries=OrderedDict(), _bytes=0, _flights={}, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return  # No cabe: no desalojar todo por un solo valor
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], object]):
+        """Devolver el valor cacheado o calcularlo y guardarlo (None no se cachea).
+
+        Un solo cálculo por clave: si otro hilo ya la está calculando (p. ej. la
+        vista previa y el render segmentando la misma imagen) se espera a su
+        resultado en lugar de repetirlo.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                flight = self._flights.get(key)
+                owner = flight is None
+                if owner:
+                    self.misses += 1
+                    flight = self._flights[key] = _Flight()
+            if owner:
+                break
+            flight.done.wait()
+            if flight.ok:
+                with self._lock:
+                    self.hits += 1
+                return flight.value
+            # El cálculo del otro hilo falló o se canceló: se intenta en este
+        try:
+            value = factory()
+            if value is not None:
+                self.put(key, value)
+            flight.value, flight.ok = value, True
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self._entries), 'bytes': self._bytes}
@@ -0,0 +1,59 @@
+# fingerprint.py - Identidad de imágenes para claves de cache en memoria (no persistentes)
+import hashlib
+import os
+import weakref
+from typing import Dict, Optional
+
+from PIL import Image
+
+# Huella asignada a cada imagen viva (por id). Se limpia al liberar la imagen.
+_tags: Dict[int, str] = {}
+
+
+def _digest(*parts) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode())
+    return h.hexdigest()
+
+def file_fingerprint(path: str) -> str:
+    """Huella de un archivo: ruta absoluta + mtime + tamaño (estable entre reinicios)"""
+    st = os.stat(path)
+    return _digest('file', os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def sampled_fingerprint(image: Image.Image, samples: int = 32) -> str:
+    """Huella rápida por muestreo de filas y columnas espaciadas.
+
+    Lee O((ancho + alto) * samples) píxeles en lugar de copiar todo el buffer.
+    """
+    w, h = image.size
+    parts = ['sample', image.mode, w, h]
+    for i in range(samples):
+        y = (h - 1) * i // max(samples - 1, 1)
+        x = (w - 1) * i // max(samples - 1, 1)
+        parts.append(image.crop((0, y, w, y + 1)).tobytes())
+        parts.append(image.crop((x, 0, x + 1, h)).tobytes())
+    return _digest(*parts)
+
+def derive(parent: str, *params) -> str:
+    """Huella de una imagen derivada (recorte, contorno, redimensionado...)"""
+    return _digest('derived', parent, *params)
+
+def tag(image: Image.Image, fp: str) -> Image.Image:
+    """Asociar una huella a una imagen; las búsquedas posteriores son O(1)"""
+    key = id(image)
+    if key not in _tags:
+        weakref.finalize(image, _tags.pop, key, None)
+    _tags[key] = fp
+    return image
+
+def get(image: Image.Image) -> Optional[str]:
+    return _tags.get(id(image))
+
+def fingerprint(image: Image.Image) -> str:
+    """Huella de la imagen: la asignada al cargar/derivar o, si no hay, una muestreada"""
+    fp = _tags.get(id(image))
+    if fp is None:
+        fp = sampled_fingerprint(image)
+        tag(image, fp)
+    return fp
@@ -1,885 +1,1097 @@
-# gui.py - Interfaz gráfica
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, colorchooser
-import tkinter.font as tkfont
-from PIL import Image, ImageTk, ImageDraw
-import os
-import threading
-import time
-import queue
-import sys
-from concurrent.futures import ThreadPoolExecutor
-from logic import LazyPaperLogic
-
-#Funcion para manejar rutas en desarrollo y el ejecutable (se puede hacer anotacion solo es para desarrollo)
-def resource_path(relative_path):
-    """Obtiene la ruta absoluta a un recurso, funciona para desarrollo y para PyInstaller"""
-    try:
-        # PyInstaller crea una carpeta temporal y almacena la ruta en _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    
-    return os.path.join(base_path, relative_path)
-class LazyPaper:
-    def __init__(self, root):
-        self.root = root
-        
-        # Inicializar variables esenciales primero
-        self.logic = LazyPaperLogic()
-        self.preview_tk_image = None
-        self.status_var = tk.StringVar(value="Inicializando...")
-        self.drag_data = {"x": 0, "y": 0, "item": None}
-        self.icon_photo = None
-        self.resolution_var = tk.StringVar(value="Desktop FHD (1920x1080)")
-        self.image_info_var = tk.StringVar(value="No hay imagen cargada")
-        self.zoom_info = tk.StringVar(value="Vista previa")
-        self._preview_cache = None
-        self._last_update_time = 0
-        self._update_debounce_id = None
-        self.task_queue = queue.Queue()
-        self.current_task_id = 0
-        self.is_processing = False
-        self.active_threads = set()
-        
-        # Configuración básica de la ventana
-        self.root.title("Lazypaper - Generate my Wallpaper")
-        self.root.geometry("1500x800")
-        self.root.minsize(1200, 700)
-        
-        # Configurar icono y fuente
-        self.set_window_icon()
-        self.set_default_font()
-        
-        # Configurar UI básica inmediatamente
-        self.setup_basic_ui()
-        
-        # Cargar el resto de la UI después de un breve delay
-        self.root.after(100, self.finish_init)
-
-    def setup_basic_ui(self):
-        """Configurar UI básica para mostrar inmediatamente"""
-        # Barra de estado básica
-        status_bar = ttk.Frame(self.root)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
-        ttk.Label(status_bar, textvariable=self.status_var, 
-                 font=("Helvetica", 10)).pack(side=tk.LEFT)
-        ttk.Label(status_bar, text="Lazypaper v1.3 - SF27", 
-                 font=("Helvetica", 10)).pack(side=tk.RIGHT)
-        
-        # Mostrar mensaje de carga
-        loading_frame = ttk.Frame(self.root)
-        loading_frame.pack(expand=True, fill=tk.BOTH)
-        ttk.Label(loading_frame, text="Cargando interfaz...", 
-                 font=("Helvetica", 14)).pack(expand=True)
-
-    def finish_init(self):
-        """Terminar la inicialización después de mostrar la UI básica"""
-        # Limpiar frame de carga
-        for widget in self.root.winfo_children():
-            if isinstance(widget, ttk.Frame):
-                widget.destroy()
-        
-        # Configurar UI completa
-        self.setup_ui()
-        
-        # Iniciar carga de recursos en segundo plano
-        self.load_background_resources()
-        
-        self.status_var.set("Listo")
-
-    # -------------------- Carga de recursos --------------------
-    def load_background_resources(self):
-        """Cargar recursos pesados en segundo plano"""
-        def load_task():
-            # Precargar modelos de rembg si están disponibles
-            if hasattr(self.logic, 'REMBG_AVAILABLE') and self.logic.REMBG_AVAILABLE:
-                try:
-                    # Verificar si rembg está disponible y cargar el modelo correctamente
-                    import rembg
-                    from rembg.session_factory import new_session
-                    
-                    # Intentar crear una sesión para precargar el modelo
-                    # Esto forzará la descarga del modelo si no está disponible
-                    session = new_session('u2net')
-                    return "Modelos de IA cargados correctamente"
-                except ImportError:
-                    return "rembg no disponible"
-                except Exception as e:
-                    return f"Error cargando modelos: {str(e)}"
-            return "Recursos cargados (rembg no disponible)"
-        
-        def load_callback(result):
-            self.status_var.set(f"Listo - {result}")
-            # Actualizar el estado del checkbox de rembg según disponibilidad
-            if "no disponible" in result:
-                # Deshabilitar la opción de rembg si no está disponible
-                for widget in self.root.winfo_children():
-                    if hasattr(widget, 'winfo_children'):
-                        for child in widget.winfo_children():
-                            if hasattr(child, 'winfo_children'):
-                                for grandchild in child.winfo_children():
-                                    try:
-                                        if "rembg" in str(grandchild.cget("text")).lower():
-                                            grandchild.config(state="disabled")
-                                            grandchild.config(text="Eliminar fondo (rembg) — no disponible")
-                                    except:
-                                        pass
-        
-        self.add_to_queue(load_task, load_callback)
-
-    # -------------------- ICONO OPTIMIZADO --------------------
-    def set_window_icon(self):
-        """Carga optimizada del icono de la ventana"""
-        icon_paths = [
-            resource_path("icon.png"),
-            resource_path(os.path.join("assets", "images", "icon.png")),
-            resource_path(os.path.join("icons", "icon.ico")),
-            resource_path(os.path.join("icons", "icon.png")),
-        ]
-        
-        for icon_path in icon_paths:
-            if os.path.exists(icon_path):
-                try:
-                    img = Image.open(icon_path).resize((64, 64), Image.LANCZOS)
-                    photo = ImageTk.PhotoImage(img)
-                    self.root.iconphoto(True, photo)
-                    self.icon_photo = photo
-                    print(f"Icono cargado desde: {icon_path}")
-                    return
-                except Exception as e:
-                    print(f"Error al cargar icono: {e}")
-        
-        # Fallback: icono básico en memoria
-        try:
-            img = Image.new('RGB', (64, 64), color='#2c3e50')
-            draw = ImageDraw.Draw(img)
-            draw.rectangle([16, 16, 48, 48], fill='#3498db')
-            photo = ImageTk.PhotoImage(img)
-            self.root.iconphoto(True, photo)
-            self.icon_photo = photo
-        except Exception as e:
-            print(f"No se pudo crear icono de fallback: {e}")
-
-    # -------------------- FUENTE OPTIMIZADA --------------------
-    def set_default_font(self):
-        """Configuración optimizada de fuentes"""
-        preferred_fonts = [
-            "Segoe UI", "Helvetica", "Arial",
-            "Liberation Sans", "DejaVu Sans", "Tahoma", "Verdana"
-        ]
-        
-        available_font = "TkDefaultFont"
-        try:
-            # Probar fuentes disponibles
-            test_font = tkfont.Font()
-            for font in preferred_fonts:
-                try:
-                    test_font.config(family=font)
-                    available_font = font
-                    break
-                except:
-                    continue
-        except:
-            available_font = "TkDefaultFont"
-        
-        print(f"Usando fuente: {available_font}")
-        # Configurar estilo global
-        style = ttk.Style()
-        style.configure(".", font=(available_font, 10))
-        style.configure("TButton", font=(available_font, 10))
-        style.configure("TLabel", font=(available_font, 10))
-        style.configure("TEntry", font=(available_font, 10))
-        style.configure("TCombobox", font=(available_font, 10))
-        style.configure("TCheckbutton", font=(available_font, 10))
-        style.configure("TRadiobutton", font=(available_font, 10))
-        style.configure("TLabelFrame", font=(available_font, 10, "bold"))
-        style.configure("Nudge.TButton", font=(available_font, 9, "bold"))
-
-    # -------------------- UI OPTIMIZADA --------------------
-    def setup_ui(self):
-        """Configuración optimizada de la interfaz"""
-        # Configuración principal
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky="nsew")
-        main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(0, weight=1)
-
-        # Panel de controles con scroll
-        self.setup_controls_panel(main_frame)
-        # Panel de vista previa
-        self.setup_preview_panel(main_frame)
-        # Barra de estado
-        self.setup_status_bar(main_frame)
-        
-        # Inicializar thread pool después de que la UI esté lista
-        self.thread_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="LazyPaper")
-
-    def setup_controls_panel(self, parent):
-        """Panel de controles optimizado"""
-        # Contenedor principal
-        controls_container = ttk.Frame(parent)
-        controls_container.grid(row=0, column=0, sticky="nsew", padx=(0, 10))
-        controls_container.columnconfigure(0, weight=1)
-        controls_container.rowconfigure(0, weight=1)
-        
-        # Canvas y scrollbar
-        controls_canvas = tk.Canvas(controls_container, highlightthickness=0, bg='#f0f0f0')
-        controls_scrollbar = ttk.Scrollbar(controls_container, orient="vertical", command=controls_canvas.yview)
-        controls_scrollable_frame = ttk.Frame(controls_canvas)
-        
-        # Configuración del scroll
-        controls_scrollable_frame.bind("<Configure>", 
-            lambda e: controls_canvas.configure(scrollregion=controls_canvas.bbox("all")))
-        controls_canvas.create_window((0, 0), window=controls_scrollable_frame, anchor="nw")
-        controls_canvas.configure(yscrollcommand=controls_scrollbar.set)
-        controls_canvas.grid(row=0, column=0, sticky="nsew")
-        controls_scrollbar.grid(row=0, column=1, sticky="ns")
-        
-        # Frame de controles
-        controls_frame = ttk.LabelFrame(controls_scrollable_frame, text="Controles", padding="8")
-        controls_frame.grid(row=0, column=0, sticky="nsew")
-        controls_frame.columnconfigure(0, weight=1)
-        
-        # Secciones de controles
-        self.setup_image_section(controls_frame)
-        self.setup_processing_section(controls_frame)
-        self.setup_resolution_section(controls_frame)
-        self.setup_color_section(controls_frame)
-        self.setup_position_section(controls_frame)
-        
-        # Eventos de scroll
-        controls_canvas.bind("<Configure>", 
-            lambda e: controls_canvas.itemconfig(1, width=e.width))
-        
-        def on_mousewheel(event):
-            controls_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        controls_canvas.bind("<MouseWheel>", on_mousewheel)
-
-    def add_to_queue(self, task_func, callback=None):
-        """Añadir tarea a la cola con manejo mejorado"""
-        task_id = time.time_ns()
-        self.task_queue.put((task_id, task_func, callback))
-        self.process_queue()
-
-    def process_queue(self):
-        """Procesar tareas en cola de manera asíncrona con límite"""
-        if not self.is_processing and not self.task_queue.empty() and len(self.active_threads) < 3:
-            self.is_processing = True
-            task_id, task_func, callback = self.task_queue.get()
-            self.current_task_id = task_id
-            def wrapped_task():
-                thread_id = threading.get_ident()
-                self.active_threads.add(thread_id)
-                try:
-                    result = task_func()
-                    self.root.after(0, lambda: self.finish_task(task_id, result, callback, thread_id))
-                except Exception as e:
-                    print(f"Error en tarea en segundo plano: {e}")
-                    self.root.after(0, lambda: self.finish_task(task_id, None, callback, thread_id))
-                finally:
-                    self.active_threads.discard(thread_id)
-            threading.Thread(target=wrapped_task, daemon=True, name=f"LazyPaperThread-{task_id}").start()
-
-    def finish_task(self, task_id, result, callback, thread_id):
-        """Finalizar tarea y ejecutar callback"""
-        if task_id == self.current_task_id:
-            self.is_processing = False
-            if callback:
-                try:
-                    callback(result)
-                except Exception as e:
-                    print(f"Error en callback: {e}")
-            self.process_queue()
-
-    def setup_image_section(self, parent):
-        """Sección de carga de imagen"""
-        ttk.Button(parent, text="Cargar Imagen", command=self.load_image).grid(
-            row=0, column=0, sticky="ew", pady=4)
-        info_frame = ttk.Frame(parent)
-        info_frame.grid(row=1, column=0, sticky="ew", pady=(0,8))
-        ttk.Label(info_frame, text="Información:", font=("Helvetica", 10, "bold")).grid(
-            row=0, column=0, sticky="w")
-        ttk.Label(info_frame, textvariable=self.image_info_var, wraplength=220, 
-        justify=tk.LEFT).grid(row=1, column=0, sticky="w")
-        ttk.Separator(parent, orient="horizontal").grid(row=2, column=0, sticky="ew", pady=6)
-        ttk.Button(parent, text="Generar Wallpaper", command=self.generate_wallpaper).grid(
-            row=3, column=0, sticky="ew", pady=4)
-        ttk.Button(parent, text="Guardar", command=self.save_wallpaper).grid(
-            row=4, column=0, sticky="ew", pady=4)
-        ttk.Separator(parent, orient="horizontal").grid(row=5, column=0, sticky="ew", pady=6)
-
-    def setup_processing_section(self, parent):
-        """Sección de procesamiento"""
-        ttk.Label(parent, text="Opciones de procesamiento:").grid(
-            row=6, column=0, sticky="w")
-        self.remove_bg_var = tk.BooleanVar(value=False)
-        
-        # Texto inicial del checkbox
-        remove_bg_text = "Eliminar fondo (rembg)"
-        if not self.logic.REMBG_AVAILABLE:
-            remove_bg_text = "Eliminar fondo (rembg) — no disponible"
-        
-        remove_cb = ttk.Checkbutton(parent, text=remove_bg_text, 
-        variable=self.remove_bg_var, command=self.update_options)
-        remove_cb.grid(row=7, column=0, sticky="w", pady=2)
-        
-        if not self.logic.REMBG_AVAILABLE:
-            remove_cb.config(state="disabled")
-        
-        self.add_outline_var = tk.BooleanVar()
-        self.outline_check = ttk.Checkbutton(parent, text="Agregar contorno blanco", 
-        variable=self.add_outline_var)
-        self.outline_check.grid(row=8, column=0, sticky="w", pady=2)
-        
-        if not self.logic.REMBG_AVAILABLE:
-            self.outline_check.config(state="disabled")
-        
-        self.blur_bg_var = tk.BooleanVar()
-        ttk.Checkbutton(parent, text="Fondo con blur", variable=self.blur_bg_var).grid(
-            row=9, column=0, sticky="w", pady=2)
-        ttk.Separator(parent, orient="horizontal").grid(row=10, column=0, sticky="ew", pady=6)
-
-    def setup_position_section(self, parent):
-        """Sección de posicionamiento con sliders mejorados"""
-        ttk.Label(parent, text="Posición de la imagen:").grid(row=18, column=0, sticky="w")
-        
-        # Frame para sliders
-        slider_frame = ttk.Frame(parent)
-        slider_frame.grid(row=19, column=0, sticky="ew", pady=2)
-        slider_frame.columnconfigure(1, weight=1)
-        
-        # Slider para Offset X
-        ttk.Label(slider_frame, text="Offset X:").grid(row=0, column=0, sticky="w")
-        self.offset_x_scale = ttk.Scale(slider_frame, from_=-500, to=500, 
-        variable=self.logic.offset_x_var,command=self.on_slider_move)
-        self.offset_x_scale.grid(row=0, column=1, sticky="ew", padx=5)
-        self.offset_x_value = ttk.Label(slider_frame, text="0")
-        self.offset_x_value.grid(row=0, column=2, padx=5)
-        
-        # Slider para Offset Y
-        ttk.Label(slider_frame, text="Offset Y:").grid(row=1, column=0, sticky="w")
-        self.offset_y_scale = ttk.Scale(slider_frame, from_=-500, to=500, 
-        variable=self.logic.offset_y_var,command=self.on_slider_move)
-        self.offset_y_scale.grid(row=1, column=1, sticky="ew", padx=5)
-        self.offset_y_value = ttk.Label(slider_frame, text="0")
-        self.offset_y_value.grid(row=1, column=2, padx=5)
-        
-        # Vincular variables a las etiquetas de valores
-        def update_offset_labels(*args):
-            self.offset_x_value.config(text=str(self.logic.offset_x_var.get()))
-            self.offset_y_value.config(text=str(self.logic.offset_y_var.get()))
-
-        self.logic.offset_x_var.trace_add("write", update_offset_labels)
-        self.logic.offset_y_var.trace_add("write", update_offset_labels)
-        # Botones de ajuste fino
-        self.setup_nudge_buttons(parent)
-
-    def on_slider_move(self, value):
-        """Manejar movimiento del slider con debounce"""
-        # Actualizar valores
-        self.offset_x_value.config(text=str(self.logic.offset_x_var.get()))
-        self.offset_y_value.config(text=str(self.logic.offset_y_var.get()))
-        
-        # Usar debounce para evitar actualizaciones excesivas
-        self.debounced_update_preview()
-
-    def setup_resolution_section(self, parent):
-        """Sección de resolución"""
-        ttk.Label(parent, text="Resolución:").grid(row=11, column=0, sticky="w")
-        
-        resolution_combo = ttk.Combobox(parent, textvariable=self.resolution_var, 
-        values=list(self.logic.resolutions.keys()), 
-        state="readonly", width=20)
-        resolution_combo.grid(row=12, column=0, sticky="ew", pady=2)
-        resolution_combo.bind("<<ComboboxSelected>>", self.on_resolution_change)
-
-        # Configuración personalizada
-        self.custom_frame = ttk.Frame(parent)
-        self.custom_frame.grid(row=13, column=0, sticky="ew", pady=2)
-        self.custom_width = tk.StringVar(value="1920")
-        self.custom_height = tk.StringVar(value="1080")
-        ttk.Label(self.custom_frame, text="Ancho:").grid(row=0, column=0, sticky="w")
-        ttk.Entry(self.custom_frame, textvariable=self.custom_width, width=8).grid(
-        row=0, column=1, padx=2)
-        ttk.Label(self.custom_frame, text="Alto:").grid(row=0, column=2, sticky="w", padx=(8,0))
-        ttk.Entry(self.custom_frame, textvariable=self.custom_height, width=8).grid(
-        row=0, column=3, padx=2)
-        self.custom_frame.grid_remove()
-        ttk.Separator(parent, orient="horizontal").grid(row=14, column=0, sticky="ew", pady=6)
-
-    def setup_color_section(self, parent):
-        """Sección de color de fondo"""
-        ttk.Label(parent, text="Color de fondo:").grid(row=15, column=0, sticky="w")
-        color_frame = ttk.Frame(parent)
-        color_frame.grid(row=16, column=0, sticky="ew")
-        self.color_option = tk.StringVar(value="auto")
-        ttk.Radiobutton(color_frame, text="Automático", variable=self.color_option, 
-        value="auto", command=self.debounced_update_preview).grid(
-            row=0, column=0, sticky="w")
-        ttk.Radiobutton(color_frame, text="Blanco", variable=self.color_option, 
-        value="white", command=self.debounced_update_preview).grid(
-            row=1, column=0, sticky="w")
-        ttk.Radiobutton(color_frame, text="Negro", variable=self.color_option, 
-        value="black", command=self.debounced_update_preview).grid(
-            row=2, column=0, sticky="w")
-        ttk.Radiobutton(color_frame, text="Personalizado", variable=self.color_option, 
-        value="custom", command=self.debounced_update_preview).grid(
-            row=3, column=0, sticky="w")
-        self.custom_color = "#FFFFFF"
-        ttk.Button(color_frame, text="Elegir color", command=self.choose_color).grid(
-            row=4, column=0, sticky="w", pady=4)
-        ttk.Separator(parent, orient="horizontal").grid(row=17, column=0, sticky="ew", pady=6)
-
-    def setup_position_section(self, parent):
-        """Sección de posicionamiento"""
-        ttk.Label(parent, text="Posición de la imagen:").grid(row=18, column=0, sticky="w")
-        pos_frame = ttk.Frame(parent)
-        pos_frame.grid(row=19, column=0, sticky="ew", pady=2)
-        ttk.Radiobutton(pos_frame, text="Izquierda", variable=self.logic.position_var, 
-            value="left", command=self.debounced_update_preview).grid(
-            row=0, column=0, sticky="w")
-        ttk.Radiobutton(pos_frame, text="Centro", variable=self.logic.position_var, 
-            value="center", command=self.debounced_update_preview).grid(
-            row=0, column=1, sticky="w")
-        ttk.Radiobutton(pos_frame, text="Derecha", variable=self.logic.position_var, 
-            value="right", command=self.debounced_update_preview).grid(
-            row=0, column=2, sticky="w")
-
-        # Offsets
-        offset_frame = ttk.Frame(parent)
-        offset_frame.grid(row=20, column=0, sticky="ew", pady=4)
-        ttk.Label(offset_frame, text="Offset X:").grid(row=0, column=0, sticky="w")
-        ttk.Spinbox(offset_frame, from_=-5000, to=5000, textvariable=self.logic.offset_x_var, 
-        width=7, command=self.debounced_update_preview).grid(row=0, column=1, padx=4)
-        ttk.Label(offset_frame, text="Offset Y:").grid(row=0, column=2, sticky="w", padx=(8,0))
-        ttk.Spinbox(offset_frame, from_=-5000, to=5000, textvariable=self.logic.offset_y_var, 
-        width=7, command=self.debounced_update_preview).grid(row=0, column=3, padx=4)
-
-        # Botones de ajuste
-        self.setup_nudge_buttons(parent)
-
-    def setup_nudge_buttons(self, parent):
-        """Botones de ajuste fino"""
-        nudges = ttk.Frame(parent)
-        nudges.grid(row=21, column=0, sticky="ew", pady=(4,6))
-        nudges.columnconfigure([0,1,2], weight=1)
-
-        buttons = [
-            ("↖", -10, -10), ("↑", 0, -10), ("↗", 10, -10),
-            ("←", -10, 0), ("•", 0, 0), ("→", 10, 0),
-            ("↙", -10, 10), ("↓", 0, 10), ("↘", 10, 10)
-        ]
-        for i, (text, dx, dy) in enumerate(buttons):
-            row, col = i // 3, i % 3
-            ttk.Button(nudges, text=text, width=3, style="Nudge.TButton",
-                command=lambda dxx=dx, dyy=dy: self.nudge(dxx, dyy)).grid(
-                row=row, column=col, padx=2, pady=2)
-
-    def setup_preview_panel(self, parent):
-        """Panel de vista previa optimizado"""
-        preview_frame = ttk.LabelFrame(parent, text="Vista Previa", padding="8")
-        preview_frame.grid(row=0, column=1, sticky="nsew")
-        preview_frame.columnconfigure(0, weight=1)
-        preview_frame.rowconfigure(0, weight=1)
-
-        # Canvas con scrollbars
-        self.preview_canvas = tk.Canvas(preview_frame, bg="#f0f0f0",
-        relief="sunken", borderwidth=1)
-        self.preview_canvas.grid(row=0, column=0, sticky="nsew")
-        v_scroll = ttk.Scrollbar(preview_frame, orient="vertical",
-        command=self.preview_canvas.yview)
-        v_scroll.grid(row=0, column=1, sticky="ns")
-        h_scroll = ttk.Scrollbar(preview_frame, orient="horizontal",
-        command=self.preview_canvas.xview)
-        h_scroll.grid(row=1, column=0, sticky="ew")
-        self.preview_canvas.configure(yscrollcommand=v_scroll.set,
-        xscrollcommand=h_scroll.set)
-
-        # Info de zoom
-        ttk.Label(preview_frame, textvariable=self.zoom_info,
-        font=("Helvetica", 10)).grid(row=2, column=0, sticky="ew")
-
-        # Bind de eventos
-        self.setup_canvas_events()
-
-    def setup_canvas_events(self):
-        """Configuración de eventos del canvas"""
-        # Teclado
-        key_bindings = {
-            "<Left>": (-10, 0), "<Right>": (10, 0),
-            "<Up>": (0, -10), "<Down>": (0, 10),
-            "<Shift-Left>": (-1, 0), "<Shift-Right>": (1, 0),
-            "<Shift-Up>": (0, -1), "<Shift-Down>": (0, 1)
-        }
-        for key, (dx, dy) in key_bindings.items():
-            self.root.bind(key, lambda e, dxx=dx, dyy=dy: self.nudge(dxx, dyy))
-        
-        # Manipulacion con el Raton
-        self.preview_canvas.bind("<Button-1>", 
-        lambda e: self.preview_canvas.focus_set())
-        self.preview_canvas.bind("<ButtonPress-1>", self.on_drag_start)
-        self.preview_canvas.bind("<B1-Motion>", self.on_drag_motion)
-        self.preview_canvas.bind("<ButtonRelease-1>", self.on_drag_release)
-
-    def setup_status_bar(self, parent):
-        """Barra de estado"""
-        status_bar = ttk.Frame(parent)
-        status_bar.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
-        ttk.Label(status_bar, textvariable=self.status_var, 
-        font=("Helvetica", 10)).pack(side=tk.LEFT)
-        ttk.Label(status_bar, text="Lazypaper v1.3 - SF27", 
-        font=("Helvetica", 10)).pack(side=tk.RIGHT)
-
-    # -------------------- MÉTODOS DE INTERACCIÓN --------------------
-    def on_drag_start(self, event):
-        """Inicio del arrastre optimizado"""
-        self.drag_data.update({"x": event.x, "y": event.y, "item": None})
-        items = self.preview_canvas.find_overlapping(event.x-1, event.y-1, event.x+1, event.y+1)
-        if items:
-            self.drag_data["item"] = items[0]
-
-    def on_drag_motion(self, event):
-        """Durante el arrastre optimizado"""
-        if not self.drag_data["item"]:
-            return
-        dx = event.x - self.drag_data["x"]
-        dy = event.y - self.drag_data["y"]
-        self.preview_canvas.move(self.drag_data["item"], dx, dy)
-        self.drag_data.update({"x": event.x, "y": event.y})
-
-    def on_drag_release(self, event):
-        """Fin del arrastre"""
-        self.drag_data["item"] = None
-
-    def debounced_update_preview(self, event=None):
-        """Actualización con debounce mejorado"""
-        current_time = time.time()
-        
-        # Cancelar actualización pendiente si existe
-        if self._update_debounce_id:
-            self.root.after_cancel(self._update_debounce_id)
-            self._update_debounce_id = None
-        
-        # Esperar 150ms antes de actualizar
-        self._update_debounce_id = self.root.after(150, self._execute_update_preview)
-
-    def _execute_update_preview(self):
-        """Ejecutar actualización de preview"""
-        self._update_debounce_id = None
-        self._last_update_time = time.time()
-        self.update_preview()
-
-    # -------------------- MÉTODOS UTILITARIOS --------------------
-    def get_target_resolution(self):
-        """Obtener resolución con validación optimizada"""
-        res_name = self.resolution_var.get()
-        if not res_name:
-            messagebox.showwarning("Advertencia", "Selecciona una resolución primero.")
-            return (1920, 1080)
-        
-        if res_name == "Personalizado":
-            try:
-                width = int(self.custom_width.get())
-                height = int(self.custom_height.get())
-                if width > 0 and height > 0:
-                    return width, height
-            except ValueError:
-                pass
-            messagebox.showwarning("Advertencia", "Resolución personalizada inválida.")
-            return (1920, 1080)
-        return self.logic.resolutions.get(res_name, (1920, 1080))
-        
-    def nudge(self, dx: int, dy: int):
-        """Ajuste fino de posición"""
-        self.logic.offset_x_var.set(self.logic.offset_x_var.get() + dx)
-        self.logic.offset_y_var.set(self.logic.offset_y_var.get() + dy)
-        self.debounced_update_preview()
-    
-    def update_options(self):
-        """Actualizar opciones de procesamiento"""
-        if self.remove_bg_var.get() and self.logic.REMBG_AVAILABLE:
-            self.outline_check.config(state="normal")
-        else:
-            self.outline_check.config(state="disabled")
-            
-    def on_resolution_change(self, event=None):
-        """Manejar cambio de resolución"""
-        if self.resolution_var.get() == "Personalizado":
-            self.custom_frame.grid()
-        else:
-            self.custom_frame.grid_remove()
-            
-    def choose_color(self):
-        """Selector de color optimizado"""
-        color = colorchooser.askcolor(title="Elegir color de fondo", 
-        initialcolor=self.custom_color)
-        if color and color[1]:
-            self.custom_color = color[1]
-            self.debounced_update_preview()
-            
-    def get_background_color(self):
-        """Obtener color de fondo optimizado"""
-        option = self.color_option.get()
-        if option == "white":
-            return (255, 255, 255)
-        elif option == "black":
-            return (0, 0, 0)
-        elif option == "custom":
-            try:
-                hex_color = self.custom_color.lstrip('#')
-                return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            except:
-                return (255, 255, 255)
-        else:  # auto
-            if self.logic.original_image:
-                try:
-                    return self.logic.get_dominant_color(self.logic.original_image)
-                except Exception as e:
-                    print(f"Error al obtener color dominante: {e}")
-                    return (255, 255, 255)
-            return (255, 255, 255)
-
-    # -------------------- CARGA DE IMAGEN OPTIMIZADA --------------------
-    def load_image(self):
-        """Carga optimizada de imágenes"""
-        file_types = [
-            ('Imágenes', '*.png *.jpg *.jpeg *.tiff *.tif'),
-            ('PNG', '*.png'),
-            ('JPEG', '*.jpg *.jpeg'),
-            ('TIFF', '*.tiff *.tif')
-        ]
-        filename = filedialog.askopenfilename(title="Seleccionar imagen", filetypes=file_types)
-        if not filename:
-            return
-
-        self.status_var.set(f"Cargando {os.path.basename(filename)}...")
-        
-        def load_task():
-            try:
-                with Image.open(filename) as img:
-                    if img.mode not in ['RGB', 'RGBA']:
-                        img = img.convert('RGB')
-                    
-                    # Crear thumbnail para vista previa rápida (más pequeño)
-                    thumb = img.copy()
-                    thumb.thumbnail((300, 300), Image.LANCZOS)  # Reducido de 400 a 300
-                    
-                    return {
-                        'image': img,
-                        'thumbnail': thumb,
-                        'filename': filename,
-                        'error': None
-                    }
-            except Exception as e:
-                return {'error': str(e), 'image': None, 'thumbnail': None, 'filename': None}
-        
-        def load_callback(result):
-            if result['error']:
-                messagebox.showerror("Error", f"No se pudo cargar: {result['error']}")
-                self.status_var.set("Error al cargar")
-                return
-                
-            self.logic.original_image = result['image']
-            self.logic.thumbnail = result['thumbnail']
-            self.logic.current_image_path = result['filename']
-            self.logic.processed_image = None
-            self.logic.offset_x_var.set(0)
-            self.logic.offset_y_var.set(0)  
-            # Mostrar thumbnail
-            self.show_thumbnail(self.logic.thumbnail)
-            
-            # Procesar análisis en segundo plano
-            def analysis_task():
-                self.logic.analyze_image()
-                return True
-
-            def analysis_callback(analysis_result):
-                self.root.after(0, lambda: self.image_info_var.set(self.logic.image_info.get()))
-
-            self.add_to_queue(analysis_task, analysis_callback)
-            self.status_var.set("Imagen cargada")
-        self.add_to_queue(load_task, load_callback)
-
-    def show_thumbnail(self, thumbnail):
-        """Mostrar thumbnail mientras se procesa la imagen completa"""
-        if thumbnail:
-            # Convertir a PhotoImage y mostrar
-            thumb_tk = ImageTk.PhotoImage(thumbnail)
-            self.preview_canvas.delete("all")
-            canvas_w = self.preview_canvas.winfo_width()
-            canvas_h = self.preview_canvas.winfo_height()
-            x = (canvas_w - thumb_tk.width()) // 2
-            y = (canvas_h - thumb_tk.height()) // 2
-            self.preview_canvas.create_image(x, y, anchor=tk.NW, image=thumb_tk)
-            self.preview_canvas.image = thumb_tk  # Mantener referencia
-            self.zoom_info.set("Vista previa (thumbnail)")
-
-    def _analyze_in_background(self):
-        """Análisis de imagen en segundo plano"""
-        if not self.logic.original_image:
-            return
-            
-        try:
-            # Hacer una copia para análisis
-            analysis_img = self.logic.original_image.copy()
-            analysis_img.thumbnail((200, 200), Image.LANCZOS)
-            
-            # Realizar análisis
-            self.logic.analyze_image()
-            # Actualizar UI en el hilo principal
-            def update_ui():
-                try:
-                    self.image_info_var.set(self.logic.image_info.get())
-                except Exception as e:
-                    print(f"Error al actualizar UI: {e}")
-            
-            self.root.after(0, update_ui) 
-        except Exception as e:
-            print(f"Error en análisis de fondo: {e}")
-
-    # -------------------- GENERACIÓN OPTIMIZADA --------------------
-    def generate_wallpaper(self):
-        """Generación de wallpaper"""
-        if not self.logic.original_image:
-            messagebox.showwarning("Advertencia", "Carga una imagen primero.")
-            return
-        try:
-            target_size = self.get_target_resolution()
-            self.status_var.set("Generando wallpaper...")
-            options = {
-                'remove_bg': self.remove_bg_var.get(),
-                'add_outline': self.add_outline_var.get(),
-                'blur_bg': self.blur_bg_var.get(),
-                'position': self.logic.position_var.get(),
-                'offset_x': self.logic.offset_x_var.get(),
-                'offset_y': self.logic.offset_y_var.get(),
-                'bg_color': self.get_background_color()
-            }
-            # Generar en thread separado para no bloquear la UI
-            def generate_thread():
-                result = self.logic.generate_wallpaper(target_size, options)
-                self.root.after(0, lambda: self._finish_generate(result))
-            threading.Thread(target=generate_thread, daemon=True).start()
-        except Exception as e:
-            self.status_var.set("Error al generar")
-            messagebox.showerror("Error", f"Error al generar wallpaper: {str(e)}")
-
-    def _finish_generate(self, result):
-        """Finalizar generación"""
-        if result:
-            self.logic.processed_image = result
-            self.update_preview()
-            self.status_var.set("Wallpaper generado")
-            messagebox.showinfo("Éxito", "Wallpaper generado correctamente!")
-        else:
-            self.status_var.set("Error al generar")
-            messagebox.showerror("Error", "No se pudo generar el wallpaper")
-
-    # -------------------- VISTA PREVIA OPTIMIZADA --------------------
-    def update_preview(self):
-        """Vista previa"""
-        if not hasattr(self.logic, 'original_image') or self.logic.original_image is None:
-            self.preview_canvas.delete("all")
-            return
-
-        display_image = self.logic.processed_image if self.logic.processed_image else self.logic.original_image
-        
-        # Obtener dimensiones del canvas
-        try:
-            canvas_w = max(self.preview_canvas.winfo_width(), 1)
-            canvas_h = max(self.preview_canvas.winfo_height(), 1)
-            if canvas_w <= 10 or canvas_h <= 10:
-                self.root.after(50, self.update_preview)
-                return
-        except:
-            self.root.after(50, self.update_preview)
-            return
-
-        img_w, img_h = display_image.size
-        
-        # Calcular tamaño de preview optimizado (máximo 600px en la dimensión más grande)
-        max_preview_size = 600
-        if img_w > img_h:
-            preview_w = min(canvas_w, max_preview_size)
-            preview_h = int(preview_w * img_h / img_w)
-        else:
-            preview_h = min(canvas_h, max_preview_size)
-            preview_w = int(preview_h * img_w / img_h)
-
-        # Cache de imagen
-        cache_key = (preview_w, preview_h, hash(display_image.tobytes()))
-        if hasattr(self, '_preview_cache') and self._preview_cache and self._preview_cache[0] == cache_key:
-            preview_tk_image = self._preview_cache[1]
-        else:
-            try:
-                # Usar thumbnail para mejor rendimiento
-                preview_img = display_image.copy()
-                if img_w * img_h > 500000:  # Si la imagen es grande
-                    preview_img.thumbnail((preview_w, preview_h), Image.LANCZOS)
-                else:
-                    preview_img = preview_img.resize((preview_w, preview_h), Image.LANCZOS)
-
-                preview_tk_image = ImageTk.PhotoImage(preview_img)
-                self._preview_cache = (cache_key, preview_tk_image)
-            except Exception as e:
-                print(f"Error al procesar vista previa: {e}")
-                return
-
-        # Limpiar y actualizar canvas
-        self.preview_canvas.delete("all")
-        # Calcular posición centrada
-        x = (canvas_w - preview_w) // 2
-        y = (canvas_h - preview_h) // 2
-
-        # Dibujar fondo si es necesario (solo para imagen original)
-        if self.logic.processed_image is None:
-            try:
-                bg_color = self.get_background_color()
-                self.preview_canvas.create_rectangle(0, 0, canvas_w, canvas_h,
-                                                fill='#%02x%02x%02x' % bg_color, outline='')
-            except:
-                pass
-        # Dibujar imagen
-        try:
-            self.preview_canvas.create_image(x, y, anchor=tk.NW, image=preview_tk_image)
-            self.preview_canvas.image_ref = preview_tk_image  # Mantener referencia
-        except Exception as e:
-            print(f"Error al dibujar imagen: {e}")
-            return
-
-        # Actualizar info de zoom
-        try:
-            zoom_percent = min(preview_w/img_w, preview_h/img_h) * 100
-            self.zoom_info.set(f"Vista previa ({zoom_percent:.1f}%)")
-        except:
-            self.zoom_info.set("Vista previa")
-
-    # -------------------- GUARDADO OPTIMIZADO --------------------
-    def save_wallpaper(self):
-        """Guardado optimizado"""
-        if not self.logic.processed_image:
-            messagebox.showwarning("Advertencia", "Genera un wallpaper primero.")
-            return
-        file_types = [
-            ('PNG', '*.png'),
-            ('JPEG', '*.jpg'),
-            ('TIFF', '*.tiff')
-        ]
-        filename = filedialog.asksaveasfilename(
-            title="Guardar wallpaper",
-            defaultextension=".png",
-            filetypes=file_types
-        )
-        if not filename:
-            return
-        try:
-            self.status_var.set("Guardando...")
-            self.logic.save_wallpaper(filename)
-            self.status_var.set("Wallpaper guardado")
-            messagebox.showinfo("Éxito", f"Wallpaper guardado como: {filename}")
-        except Exception as e:
-            self.status_var.set("Error al guardar")
-            messagebox.showerror("Error", f"No se pudo guardar: {str(e)}")
\ No newline at end of file
+# gui.py - Interfaz gráfica
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, colorchooser, simpledialog
+import tkinter.font as tkfont
+from PIL import Image, ImageTk, ImageDraw
+import os
+import time
+import sys
+from logic import LazyPaperLogic, DEFAULT_NAME_TEMPLATE, TILED_MIN_PIXELS, target_filename
+import segmentation
+import loader
+import scheduler
+import encoder
+import resampling
+
+#Funcion para manejar rutas en desarrollo y el ejecutable (se puede hacer anotacion solo es para desarrollo)
+def resource_path(relative_path):
+    """Obtiene la ruta absoluta a un recurso, funciona para desarrollo y para PyInstaller"""
+    try:
+        # PyInstaller crea una carpeta temporal y almacena la ruta en _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    
+    return os.path.join(base_path, relative_path)
+class LazyPaper:
+    def __init__(self, root):
+        self.root = root
+        
+        # Inicializar variables esenciales primero
+        self.logic = LazyPaperLogic()
+        self.preview_tk_image = None
+        self.status_var = tk.StringVar(value="Inicializando...")
+        self.drag_data = {"x": 0, "y": 0, "item": None}
+        self.icon_photo = None
+        self.resolution_var = tk.StringVar(value="Desktop FHD (1920x1080)")
+        self.image_info_var = tk.StringVar(value="No hay imagen cargada")
+        self.zoom_info = tk.StringVar(value="Vista previa")
+        self._preparing_subject = None  # Opciones del sujeto que se está calculando
+        self._layers = None  # Capas de la vista previa en el canvas (fondo y sujeto)
+        self._auto_color = (255, 255, 255)  # Último color 'auto' (hasta que termine el análisis)
+        self.name_template = DEFAULT_NAME_TEMPLATE  # Plantilla de "Exportar todas"
+        self.encode_preset_var = tk.StringVar(value=encoder.DEFAULT_PRESET)
+        self.resample_quality_var = tk.StringVar(value=resampling.DEFAULT_QUALITY)
+        self._last_update_time = 0
+        self._update_debounce_id = None
+        # Tareas en segundo plano: prioridades, cancelación y sustitución por clave
+        self.scheduler = scheduler.Scheduler(dispatch=lambda fn: self.root.after(0, fn))
+        
+        # Variables de posición enlazadas al estado plano de la lógica
+        self.position_var = tk.StringVar()  # left, center, right
+        self.offset_x_var = tk.IntVar()
+        self.offset_y_var = tk.IntVar()
+        self.bind_state_var(self.position_var, 'position')
+        self.bind_state_var(self.offset_x_var, 'offset_x')
+        self.bind_state_var(self.offset_y_var, 'offset_y')
+        # Los offsets solo mueven la capa del sujeto (sin re-renderizar)
+        self.offset_x_var.trace_add("write", self.on_offset_change)
+        self.offset_y_var.trace_add("write", self.on_offset_change)
+        
+        # Configuración básica de la ventana
+        self.root.title("Lazypaper - Generate my Wallpaper")
+        self.root.geometry("1500x800")
+        self.root.minsize(1200, 700)
+        
+        # Configurar icono y fuente
+        self.set_window_icon()
+        self.set_default_font()
+        
+        # Configurar UI básica inmediatamente
+        self.setup_basic_ui()
+        
+        # Cargar el resto de la UI después de un breve delay
+        self.root.after(100, self.finish_init)
+
+    def bind_state_var(self, var, field):
+        """Sincronizar una variable de tkinter con un campo de logic.state"""
+        var.set(getattr(self.logic.state, field))
+        def on_write(*args):
+            try:
+                setattr(self.logic.state, field, var.get())
+            except tk.TclError:
+                pass  # Valor intermedio inválido (p. ej. Spinbox vacío)
+        var.trace_add("write", on_write)
+
+    def setup_basic_ui(self):
+        """Configurar UI básica para mostrar inmediatamente"""
+        # Barra de estado básica
+        status_bar = ttk.Frame(self.root)
+        status_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
+        ttk.Label(status_bar, textvariable=self.status_var, 
+                 font=("Helvetica", 10)).pack(side=tk.LEFT)
+        ttk.Label(status_bar, text="Lazypaper v1.3 - SF27", 
+                 font=("Helvetica", 10)).pack(side=tk.RIGHT)
+        
+        # Mostrar mensaje de carga
+        loading_frame = ttk.Frame(self.root)
+        loading_frame.pack(expand=True, fill=tk.BOTH)
+        ttk.Label(loading_frame, text="Cargando interfaz...", 
+                 font=("Helvetica", 14)).pack(expand=True)
+
+    def finish_init(self):
+        """Terminar la inicialización después de mostrar la UI básica"""
+        # Limpiar frame de carga
+        for widget in self.root.winfo_children():
+            if isinstance(widget, ttk.Frame):
+                widget.destroy()
+        
+        # Configurar UI completa
+        self.setup_ui()
+        
+        # Iniciar carga de recursos en segundo plano
+        self.load_background_resources()
+        
+        self.status_var.set("Listo")
+
+    # -------------------- Carga de recursos --------------------
+    def load_background_resources(self):
+        """Cargar recursos pesados en segundo plano"""
+        def load_task(token):
+            # Precargar modelos de rembg si están disponibles
+            if hasattr(self.logic, 'REMBG_AVAILABLE') and self.logic.REMBG_AVAILABLE:
+                try:
+                    # Crear la sesión compartida que usará remove_background
+                    # Esto forzará la descarga del modelo si no está disponible
+                    session = segmentation.get_session(self.logic.rembg_model, self.logic.rembg_providers)
+                    if session is None:
+                        return "rembg no disponible"
+                    load_time, _ = segmentation.totals()
+                    return f"Modelos de IA cargados correctamente ({load_time:.1f}s)"
+                except Exception as e:
+                    return f"Error cargando modelos: {str(e)}"
+            return "Recursos cargados (rembg no disponible)"
+        
+        def load_callback(result):
+            self.status_var.set(f"Listo - {result}")
+            # Actualizar el estado del checkbox de rembg según disponibilidad
+            if "no disponible" in result:
+                # Deshabilitar la opción de rembg si no está disponible
+                for widget in self.root.winfo_children():
+                    if hasattr(widget, 'winfo_children'):
+                        for child in widget.winfo_children():
+                            if hasattr(child, 'winfo_children'):
+                                for grandchild in child.winfo_children():
+                                    try:
+                                        if "rembg" in str(grandchild.cget("text")).lower():
+                                            grandchild.config(state="disabled")
+                                            grandchild.config(text="Eliminar fondo (rembg) — no disponible")
+                                    except:
+                                        pass
+        
+        self.scheduler.submit(load_task, load_callback, scheduler.STARTUP, key='resources')
+
+    # -------------------- ICONO OPTIMIZADO --------------------
+    def set_window_icon(self):
+        """Carga optimizada del icono de la ventana"""
+        icon_paths = [
+            resource_path("icon.png"),
+            resource_path(os.path.join("assets", "images", "icon.png")),
+            resource_path(os.path.join("icons", "icon.ico")),
+            resource_path(os.path.join("icons", "icon.png")),
+        ]
+        
+        for icon_path in icon_paths:
+            if os.path.exists(icon_path):
+                try:
+                    img = resampling.resize(Image.open(icon_path), (64, 64), resampling.PREVIEW)
+                    photo = ImageTk.PhotoImage(img)
+                    self.root.iconphoto(True, photo)
+                    self.icon_photo = photo
+                    print(f"Icono cargado desde: {icon_path}")
+                    return
+                except Exception as e:
+                    print(f"Error al cargar icono: {e}")
+        
+        # Fallback: icono básico en memoria
+        try:
+            img = Image.new('RGB', (64, 64), color='#2c3e50')
+            draw = ImageDraw.Draw(img)
+            draw.rectangle([16, 16, 48, 48], fill='#3498db')
+            photo = ImageTk.PhotoImage(img)
+            self.root.iconphoto(True, photo)
+            self.icon_photo = photo
+        except Exception as e:
+            print(f"No se pudo crear icono de fallback: {e}")
+
+    # -------------------- FUENTE OPTIMIZADA --------------------
+    def set_default_font(self):
+        """Configuración optimizada de fuentes"""
+        preferred_fonts = [
+            "Segoe UI", "Helvetica", "Arial",
+            "Liberation Sans", "DejaVu Sans", "Tahoma", "Verdana"
+        ]
+        
+        available_font = "TkDefaultFont"
+        try:
+            # Probar fuentes disponibles
+            test_font = tkfont.Font()
+            for font in preferred_fonts:
+                try:
+                    test_font.config(family=font)
+                    available_font = font
+                    break
+                except:
+                    continue
+        except:
+            available_font = "TkDefaultFont"
+        
+        print(f"Usando fuente: {available_font}")
+        # Configurar estilo global
+        style = ttk.Style()
+        style.configure(".", font=(available_font, 10))
+        style.configure("TButton", font=(available_font, 10))
+        style.configure("TLabel", font=(available_font, 10))
+        style.configure("TEntry", font=(available_font, 10))
+        style.configure("TCombobox", font=(available_font, 10))
+        style.configure("TCheckbutton", font=(available_font, 10))
+        style.configure("TRadiobutton", font=(available_font, 10))
+        style.configure("TLabelFrame", font=(available_font, 10, "bold"))
+        style.configure("Nudge.TButton", font=(available_font, 9, "bold"))
+
+    # -------------------- UI OPTIMIZADA --------------------
+    def setup_ui(self):
+        """Configuración optimizada de la interfaz"""
+        # Configuración principal
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky="nsew")
+        main_frame.columnconfigure(1, weight=1)
+        main_frame.rowconfigure(0, weight=1)
+
+        # Panel de controles con scroll
+        self.setup_controls_panel(main_frame)
+        # Panel de vista previa
+        self.setup_preview_panel(main_frame)
+        # Barra de estado
+        self.setup_status_bar(main_frame)
+
+
+    def setup_controls_panel(self, parent):
+        """Panel de controles optimizado"""
+        # Contenedor principal
+        controls_container = ttk.Frame(parent)
+        controls_container.grid(row=0, column=0, sticky="nsew", padx=(0, 10))
+        controls_container.columnconfigure(0, weight=1)
+        controls_container.rowconfigure(0, weight=1)
+        
+        # Canvas y scrollbar
+        controls_canvas = tk.Canvas(controls_container, highlightthickness=0, bg='#f0f0f0')
+        controls_scrollbar = ttk.Scrollbar(controls_container, orient="vertical", command=controls_canvas.yview)
+        controls_scrollable_frame = ttk.Frame(controls_canvas)
+        
+        # Configuración del scroll
+        controls_scrollable_frame.bind("<Configure>", 
+            lambda e: controls_canvas.configure(scrollregion=controls_canvas.bbox("all")))
+        controls_canvas.create_window((0, 0), window=controls_scrollable_frame, anchor="nw")
+        controls_canvas.configure(yscrollcommand=controls_scrollbar.set)
+        controls_canvas.grid(row=0, column=0, sticky="nsew")
+        controls_scrollbar.grid(row=0, column=1, sticky="ns")
+        
+        # Frame de controles
+        controls_frame = ttk.LabelFrame(controls_scrollable_frame, text="Controles", padding="8")
+        controls_frame.grid(row=0, column=0, sticky="nsew")
+        controls_frame.columnconfigure(0, weight=1)
+        
+        # Secciones de controles
+        self.setup_image_section(controls_frame)
+        self.setup_processing_section(controls_frame)
+        self.setup_resolution_section(controls_frame)
+        self.setup_color_section(controls_frame)
+        self.setup_position_section(controls_frame)
+        
+        # Eventos de scroll
+        controls_canvas.bind("<Configure>", 
+            lambda e: controls_canvas.itemconfig(1, width=e.width))
+        
+        def on_mousewheel(event):
+            controls_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        controls_canvas.bind("<MouseWheel>", on_mousewheel)
+
+    def setup_image_section(self, parent):
+        """Sección de carga de imagen"""
+        ttk.Button(parent, text="Cargar Imagen", command=self.load_image).grid(
+            row=0, column=0, sticky="ew", pady=4)
+        info_frame = ttk.Frame(parent)
+        info_frame.grid(row=1, column=0, sticky="ew", pady=(0,8))
+        ttk.Label(info_frame, text="Información:", font=("Helvetica", 10, "bold")).grid(
+            row=0, column=0, sticky="w")
+        ttk.Label(info_frame, textvariable=self.image_info_var, wraplength=220, 
+        justify=tk.LEFT).grid(row=1, column=0, sticky="w")
+        ttk.Separator(parent, orient="horizontal").grid(row=2, column=0, sticky="ew", pady=6)
+        ttk.Button(parent, text="Generar Wallpaper", command=self.generate_wallpaper).grid(
+            row=3, column=0, sticky="ew", pady=4)
+        save_frame = ttk.Frame(parent)
+        save_frame.grid(row=4, column=0, sticky="ew", pady=4)
+        save_frame.columnconfigure((0, 1), weight=1)
+        ttk.Button(save_frame, text="Guardar", command=self.save_wallpaper).grid(
+            row=0, column=0, sticky="ew", padx=(0, 2))
+        ttk.Button(save_frame, text="Exportar todas...", command=self.export_all_targets).grid(
+            row=0, column=1, sticky="ew", padx=(2, 0))
+        ttk.Label(save_frame, text="Compresión:").grid(row=1, column=0, sticky="w", pady=(4, 0))
+        ttk.Combobox(save_frame, textvariable=self.encode_preset_var, values=list(encoder.PRESETS),
+                     state="readonly", width=10).grid(row=1, column=1, sticky="ew", pady=(4, 0))
+        ttk.Label(save_frame, text="Escalado:").grid(row=2, column=0, sticky="w", pady=(4, 0))
+        ttk.Combobox(save_frame, textvariable=self.resample_quality_var, values=list(resampling.QUALITIES),
+                     state="readonly", width=10).grid(row=2, column=1, sticky="ew", pady=(4, 0))
+        ttk.Separator(parent, orient="horizontal").grid(row=5, column=0, sticky="ew", pady=6)
+
+    def setup_processing_section(self, parent):
+        """Sección de procesamiento"""
+        ttk.Label(parent, text="Opciones de procesamiento:").grid(
+            row=6, column=0, sticky="w")
+        self.remove_bg_var = tk.BooleanVar(value=False)
+        
+        # Texto inicial del checkbox
+        remove_bg_text = "Eliminar fondo (rembg)"
+        if not self.logic.REMBG_AVAILABLE:
+            remove_bg_text = "Eliminar fondo (rembg) — no disponible"
+        
+        remove_cb = ttk.Checkbutton(parent, text=remove_bg_text, 
+        variable=self.remove_bg_var, command=self.update_options)
+        remove_cb.grid(row=7, column=0, sticky="w", pady=2)
+        
+        if not self.logic.REMBG_AVAILABLE:
+            remove_cb.config(state="disabled")
+        
+        # Opciones que dependen de rembg
+        cutout_frame = ttk.Frame(parent)
+        cutout_frame.grid(row=8, column=0, sticky="w")
+        self.add_outline_var = tk.BooleanVar()
+        self.outline_check = ttk.Checkbutton(cutout_frame, text="Agregar contorno blanco", 
+        variable=self.add_outline_var, command=self.debounced_update_preview)
+        self.outline_check.grid(row=0, column=0, sticky="w", pady=2)
+        self.outline_width_var = tk.IntVar(value=6)
+        self.outline_width_spin = ttk.Spinbox(cutout_frame, from_=1, to=64, width=4,
+        textvariable=self.outline_width_var, command=self.debounced_update_preview)
+        self.outline_width_spin.grid(row=0, column=1, sticky="w", padx=(6, 0))
+        ttk.Label(cutout_frame, text="px").grid(row=0, column=2, sticky="w", padx=(2, 0))
+        self.refine_mask_var = tk.BooleanVar()
+        self.refine_check = ttk.Checkbutton(cutout_frame, text="Refinar bordes del recorte", 
+        variable=self.refine_mask_var, command=self.debounced_update_preview)
+        self.refine_check.grid(row=1, column=0, sticky="w", pady=2)
+        self.fit_subject_var = tk.BooleanVar()
+        self.fit_check = ttk.Checkbutton(cutout_frame, text="Ajustar al sujeto", 
+        variable=self.fit_subject_var, command=self.debounced_update_preview)
+        self.fit_check.grid(row=2, column=0, sticky="w", pady=2)
+        
+        if not self.logic.REMBG_AVAILABLE:
+            self.outline_check.config(state="disabled")
+            self.outline_width_spin.config(state="disabled")
+            self.refine_check.config(state="disabled")
+            self.fit_check.config(state="disabled")
+        
+        self.blur_bg_var = tk.BooleanVar()
+        ttk.Checkbutton(parent, text="Fondo con blur", variable=self.blur_bg_var,
+        command=self.debounced_update_preview).grid(
+            row=9, column=0, sticky="w", pady=2)
+        ttk.Separator(parent, orient="horizontal").grid(row=10, column=0, sticky="ew", pady=6)
+
+    def setup_position_section(self, parent):
+        """Sección de posicionamiento con sliders mejorados"""
+        ttk.Label(parent, text="Posición de la imagen:").grid(row=18, column=0, sticky="w")
+        
+        # Frame para sliders
+        slider_frame = ttk.Frame(parent)
+        slider_frame.grid(row=19, column=0, sticky="ew", pady=2)
+        slider_frame.columnconfigure(1, weight=1)
+        
+        # Slider para Offset X
+        ttk.Label(slider_frame, text="Offset X:").grid(row=0, column=0, sticky="w")
+        self.offset_x_scale = ttk.Scale(slider_frame, from_=-500, to=500, 
+        variable=self.offset_x_var,command=self.on_slider_move)
+        self.offset_x_scale.grid(row=0, column=1, sticky="ew", padx=5)
+        self.offset_x_value = ttk.Label(slider_frame, text="0")
+        self.offset_x_value.grid(row=0, column=2, padx=5)
+        
+        # Slider para Offset Y
+        ttk.Label(slider_frame, text="Offset Y:").grid(row=1, column=0, sticky="w")
+        self.offset_y_scale = ttk.Scale(slider_frame, from_=-500, to=500, 
+        variable=self.offset_y_var,command=self.on_slider_move)
+        self.offset_y_scale.grid(row=1, column=1, sticky="ew", padx=5)
+        self.offset_y_value = ttk.Label(slider_frame, text="0")
+        self.offset_y_value.grid(row=1, column=2, padx=5)
+        
+        # Vincular variables a las etiquetas de valores
+        def update_offset_labels(*args):
+            self.offset_x_value.config(text=str(self.offset_x_var.get()))
+            self.offset_y_value.config(text=str(self.offset_y_var.get()))
+
+        self.offset_x_var.trace_add("write", update_offset_labels)
+        self.offset_y_var.trace_add("write", update_offset_labels)
+        # Botones de ajuste fino
+        self.setup_nudge_buttons(parent)
+
+    def on_slider_move(self, value):
+        """Manejar movimiento del slider con debounce"""
+        # Actualizar valores
+        self.offset_x_value.config(text=str(self.offset_x_var.get()))
+        self.offset_y_value.config(text=str(self.offset_y_var.get()))
+        
+        # La capa del sujeto se mueve desde la traza de los offsets
+
+    def setup_resolution_section(self, parent):
+        """Sección de resolución"""
+        ttk.Label(parent, text="Resolución:").grid(row=11, column=0, sticky="w")
+        
+        resolution_combo = ttk.Combobox(parent, textvariable=self.resolution_var, 
+        values=list(self.logic.resolutions.keys()), 
+        state="readonly", width=20)
+        resolution_combo.grid(row=12, column=0, sticky="ew", pady=2)
+        resolution_combo.bind("<<ComboboxSelected>>", self.on_resolution_change)
+
+        # Configuración personalizada
+        self.custom_frame = ttk.Frame(parent)
+        self.custom_frame.grid(row=13, column=0, sticky="ew", pady=2)
+        self.custom_width = tk.StringVar(value="1920")
+        self.custom_height = tk.StringVar(value="1080")
+        ttk.Label(self.custom_frame, text="Ancho:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(self.custom_frame, textvariable=self.custom_width, width=8).grid(
+        row=0, column=1, padx=2)
+        ttk.Label(self.custom_frame, text="Alto:").grid(row=0, column=2, sticky="w", padx=(8,0))
+        ttk.Entry(self.custom_frame, textvariable=self.custom_height, width=8).grid(
+        row=0, column=3, padx=2)
+        self.custom_frame.grid_remove()
+        # Un render con la resolución anterior ya no sirve
+        self.custom_width.trace_add("write", lambda *args: self.cancel_generate())
+        self.custom_height.trace_add("write", lambda *args: self.cancel_generate())
+        ttk.Separator(parent, orient="horizontal").grid(row=14, column=0, sticky="ew", pady=6)
+
+    def setup_color_section(self, parent):
+        """Sección de color de fondo"""
+        ttk.Label(parent, text="Color de fondo:").grid(row=15, column=0, sticky="w")
+        color_frame = ttk.Frame(parent)
+        color_frame.grid(row=16, column=0, sticky="ew")
+        self.color_option = tk.StringVar(value="auto")
+        ttk.Radiobutton(color_frame, text="Automático", variable=self.color_option, 
+        value="auto", command=self.debounced_update_preview).grid(
+            row=0, column=0, sticky="w")
+        ttk.Radiobutton(color_frame, text="Blanco", variable=self.color_option, 
+        value="white", command=self.debounced_update_preview).grid(
+            row=1, column=0, sticky="w")
+        ttk.Radiobutton(color_frame, text="Negro", variable=self.color_option, 
+        value="black", command=self.debounced_update_preview).grid(
+            row=2, column=0, sticky="w")
+        ttk.Radiobutton(color_frame, text="Personalizado", variable=self.color_option, 
+        value="custom", command=self.debounced_update_preview).grid(
+            row=3, column=0, sticky="w")
+        self.custom_color = "#FFFFFF"
+        ttk.Button(color_frame, text="Elegir color", command=self.choose_color).grid(
+            row=4, column=0, sticky="w", pady=4)
+        ttk.Separator(parent, orient="horizontal").grid(row=17, column=0, sticky="ew", pady=6)
+
+    def setup_position_section(self, parent):
+        """Sección de posicionamiento"""
+        ttk.Label(parent, text="Posición de la imagen:").grid(row=18, column=0, sticky="w")
+        pos_frame = ttk.Frame(parent)
+        pos_frame.grid(row=19, column=0, sticky="ew", pady=2)
+        ttk.Radiobutton(pos_frame, text="Izquierda", variable=self.position_var, 
+            value="left", command=self.debounced_update_preview).grid(
+            row=0, column=0, sticky="w")
+        ttk.Radiobutton(pos_frame, text="Centro", variable=self.position_var, 
+            value="center", command=self.debounced_update_preview).grid(
+            row=0, column=1, sticky="w")
+        ttk.Radiobutton(pos_frame, text="Derecha", variable=self.position_var, 
+            value="right", command=self.debounced_update_preview).grid(
+            row=0, column=2, sticky="w")
+
+        # Offsets
+        offset_frame = ttk.Frame(parent)
+        offset_frame.grid(row=20, column=0, sticky="ew", pady=4)
+        ttk.Label(offset_frame, text="Offset X:").grid(row=0, column=0, sticky="w")
+        ttk.Spinbox(offset_frame, from_=-5000, to=5000, textvariable=self.offset_x_var, 
+        width=7).grid(row=0, column=1, padx=4)
+        ttk.Label(offset_frame, text="Offset Y:").grid(row=0, column=2, sticky="w", padx=(8,0))
+        ttk.Spinbox(offset_frame, from_=-5000, to=5000, textvariable=self.offset_y_var, 
+        width=7).grid(row=0, column=3, padx=4)
+
+        # Botones de ajuste
+        self.setup_nudge_buttons(parent)
+
+    def setup_nudge_buttons(self, parent):
+        """Botones de ajuste fino"""
+        nudges = ttk.Frame(parent)
+        nudges.grid(row=21, column=0, sticky="ew", pady=(4,6))
+        nudges.columnconfigure([0,1,2], weight=1)
+
+        buttons = [
+            ("↖", -10, -10), ("↑", 0, -10), ("↗", 10, -10),
+            ("←", -10, 0), ("•", 0, 0), ("→", 10, 0),
+            ("↙", -10, 10), ("↓", 0, 10), ("↘", 10, 10)
+        ]
+        for i, (text, dx, dy) in enumerate(buttons):
+            row, col = i // 3, i % 3
+            ttk.Button(nudges, text=text, width=3, style="Nudge.TButton",
+                command=lambda dxx=dx, dyy=dy: self.nudge(dxx, dyy)).grid(
+                row=row, column=col, padx=2, pady=2)
+
+    def setup_preview_panel(self, parent):
+        """Panel de vista previa optimizado"""
+        preview_frame = ttk.LabelFrame(parent, text="Vista Previa", padding="8")
+        preview_frame.grid(row=0, column=1, sticky="nsew")
+        preview_frame.columnconfigure(0, weight=1)
+        preview_frame.rowconfigure(0, weight=1)
+
+        # Canvas con scrollbars
+        self.preview_canvas = tk.Canvas(preview_frame, bg="#f0f0f0",
+        relief="sunken", borderwidth=1)
+        self.preview_canvas.grid(row=0, column=0, sticky="nsew")
+        v_scroll = ttk.Scrollbar(preview_frame, orient="vertical",
+        command=self.preview_canvas.yview)
+        v_scroll.grid(row=0, column=1, sticky="ns")
+        h_scroll = ttk.Scrollbar(preview_frame, orient="horizontal",
+        command=self.preview_canvas.xview)
+        h_scroll.grid(row=1, column=0, sticky="ew")
+        self.preview_canvas.configure(yscrollcommand=v_scroll.set,
+        xscrollcommand=h_scroll.set)
+
+        # Info de zoom
+        ttk.Label(preview_frame, textvariable=self.zoom_info,
+        font=("Helvetica", 10)).grid(row=2, column=0, sticky="ew")
+
+        # Bind de eventos
+        self.setup_canvas_events()
+
+    def setup_canvas_events(self):
+        """Configuración de eventos del canvas"""
+        # Teclado
+        key_bindings = {
+            "<Left>": (-10, 0), "<Right>": (10, 0),
+            "<Up>": (0, -10), "<Down>": (0, 10),
+            "<Shift-Left>": (-1, 0), "<Shift-Right>": (1, 0),
+            "<Shift-Up>": (0, -1), "<Shift-Down>": (0, 1)
+        }
+        for key, (dx, dy) in key_bindings.items():
+            self.root.bind(key, lambda e, dxx=dx, dyy=dy: self.nudge(dxx, dyy))
+        
+        # Manipulacion con el Raton
+        self.preview_canvas.bind("<Button-1>", 
+        lambda e: self.preview_canvas.focus_set())
+        self.preview_canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.preview_canvas.bind("<B1-Motion>", self.on_drag_motion)
+        self.preview_canvas.bind("<ButtonRelease-1>", self.on_drag_release)
+
+    def setup_status_bar(self, parent):
+        """Barra de estado"""
+        status_bar = ttk.Frame(parent)
+        status_bar.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        ttk.Label(status_bar, textvariable=self.status_var, 
+        font=("Helvetica", 10)).pack(side=tk.LEFT)
+        ttk.Label(status_bar, text="Lazypaper v1.3 - SF27", 
+        font=("Helvetica", 10)).pack(side=tk.RIGHT)
+
+    # -------------------- MÉTODOS DE INTERACCIÓN --------------------
+    def on_drag_start(self, event):
+        """Inicio del arrastre: solo se arrastra la capa del sujeto"""
+        self.drag_data.update({"x": event.x, "y": event.y, "item": None})
+        if not self._layers:
+            return
+        items = self.preview_canvas.find_overlapping(event.x-1, event.y-1, event.x+1, event.y+1)
+        if self._layers['subject_item'] in items:
+            self.drag_data["item"] = self._layers['subject_item']
+            self.drag_data["offset"] = (self.offset_x_var.get(), self.offset_y_var.get())
+
+    def on_drag_motion(self, event):
+        """Durante el arrastre: escribir los offsets en píxeles de salida"""
+        if not self.drag_data["item"] or not self._layers:
+            return
+        scale = self._layers['scale']
+        start_x, start_y = self.drag_data["offset"]
+        # La traza de los offsets coloca la capa (sin trabajo de imagen)
+        self.offset_x_var.set(start_x + round((event.x - self.drag_data["x"]) / scale))
+        self.offset_y_var.set(start_y + round((event.y - self.drag_data["y"]) / scale))
+
+    def on_drag_release(self, event):
+        """Fin del arrastre"""
+        self.drag_data["item"] = None
+
+    def debounced_update_preview(self, event=None):
+        """Actualización con debounce mejorado"""
+        current_time = time.time()
+        
+        # Cancelar actualización pendiente si existe
+        if self._update_debounce_id:
+            self.root.after_cancel(self._update_debounce_id)
+            self._update_debounce_id = None
+        
+        # Agrupar los cambios de un mismo frame (~16ms): la vista previa es barata
+        self._update_debounce_id = self.root.after(16, self._execute_update_preview)
+
+    def _execute_update_preview(self):
+        """Ejecutar actualización de preview"""
+        self._update_debounce_id = None
+        self._last_update_time = time.time()
+        self.update_preview()
+
+    # -------------------- MÉTODOS UTILITARIOS --------------------
+    def get_target_resolution(self, warn: bool = True):
+        """Obtener resolución con validación optimizada (warn=False: sin diálogos)"""
+        res_name = self.resolution_var.get()
+        if not res_name:
+            if warn:
+                messagebox.showwarning("Advertencia", "Selecciona una resolución primero.")
+            return (1920, 1080)
+        
+        if res_name == "Personalizado":
+            try:
+                width = int(self.custom_width.get())
+                height = int(self.custom_height.get())
+                if width > 0 and height > 0:
+                    return width, height
+            except ValueError:
+                pass
+            if warn:
+                messagebox.showwarning("Advertencia", "Resolución personalizada inválida.")
+            return (1920, 1080)
+        return self.logic.resolutions.get(res_name, (1920, 1080))
+        
+    def nudge(self, dx: int, dy: int):
+        """Ajuste fino de posición"""
+        self.offset_x_var.set(self.offset_x_var.get() + dx)
+        self.offset_y_var.set(self.offset_y_var.get() + dy)
+    
+    def update_options(self):
+        """Actualizar opciones de procesamiento"""
+        state = "normal" if self.remove_bg_var.get() and self.logic.REMBG_AVAILABLE else "disabled"
+        self.outline_check.config(state=state)
+        self.outline_width_spin.config(state=state)
+        self.refine_check.config(state=state)
+        self.fit_check.config(state=state)
+        self.debounced_update_preview()
+            
+    def on_resolution_change(self, event=None):
+        """Manejar cambio de resolución"""
+        if self.resolution_var.get() == "Personalizado":
+            self.custom_frame.grid()
+        else:
+            self.custom_frame.grid_remove()
+        self.cancel_generate()
+        self.debounced_update_preview()
+            
+    def choose_color(self):
+        """Selector de color optimizado"""
+        color = colorchooser.askcolor(title="Elegir color de fondo", 
+        initialcolor=self.custom_color)
+        if color and color[1]:
+            self.custom_color = color[1]
+            self.debounced_update_preview()
+            
+    def get_outline_width(self):
+        """Ancho del contorno validado"""
+        try:
+            return max(1, min(64, int(self.outline_width_var.get())))
+        except (tk.TclError, ValueError):
+            return 6
+
+    def get_background_color(self):
+        """Obtener color de fondo optimizado"""
+        option = self.color_option.get()
+        if option == "white":
+            return (255, 255, 255)
+        elif option == "black":
+            return (0, 0, 0)
+        elif option == "custom":
+            try:
+                hex_color = self.custom_color.lstrip('#')
+                return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+            except:
+                return (255, 255, 255)
+        else:  # auto
+            # Sin bloquear la interfaz: hasta que el análisis esté en cache se usa el
+            # último color; analysis_callback redibuja la vista previa con el bueno
+            if self.logic.has_image():
+                color = self.logic.cached_dominant_color()
+                if color is not None:
+                    self._auto_color = color
+            return self._auto_color
+
+    def _final_color(self, options, auto):
+        """En el hilo del trabajo: el color 'auto' definitivo (puede esperar al análisis)"""
+        if auto:
+            return dict(options, bg_color=self.logic.get_dominant_color())
+        return options
+
+    # -------------------- CARGA DE IMAGEN OPTIMIZADA --------------------
+    def load_image(self):
+        """Carga optimizada de imágenes"""
+        file_types = [
+            ('Imágenes', '*.png *.jpg *.jpeg *.tiff *.tif'),
+            ('PNG', '*.png'),
+            ('JPEG', '*.jpg *.jpeg'),
+            ('TIFF', '*.tiff *.tif')
+        ]
+        filename = filedialog.askopenfilename(title="Seleccionar imagen", filetypes=file_types)
+        if not filename:
+            return
+
+        self.status_var.set(f"Cargando {os.path.basename(filename)}...")
+        start = time.perf_counter()
+        # Lo pendiente de la imagen anterior ya no sirve (un guardado en curso sí termina)
+        for priority in (scheduler.PREVIEW, scheduler.ANALYSIS, scheduler.SEGMENTATION, scheduler.RENDER):
+            self.scheduler.cancel(priority=priority)
+        self._preparing_subject = None
+        
+        def load_task(token):
+            # Fase 1: cabecera + vista previa reducida (miniatura EXIF o draft JPEG)
+            try:
+                source = loader.ImageSource(filename)
+                return {'source': source, 'preview': source.preview(), 'error': None}
+            except Exception as e:
+                return {'error': str(e), 'source': None, 'preview': None}
+        
+        def load_callback(result):
+            if result['error']:
+                messagebox.showerror("Error", f"No se pudo cargar: {result['error']}")
+                self.status_var.set("Error al cargar")
+                return
+                
+            source = result['source']
+            self.logic.set_source(source)
+            self.logic.thumbnail = result['preview']
+            self.offset_x_var.set(0)
+            self.offset_y_var.set(0)  
+            # Mostrar thumbnail
+            self.show_thumbnail(self.logic.thumbnail)
+            first_pixel = time.perf_counter() - start
+            self.status_var.set(f"Imagen cargada (vista previa en {first_pixel * 1000:.0f} ms)")
+            print(f"Carga de {os.path.basename(filename)}: primer píxel {first_pixel * 1000:.0f} ms "
+                  f"({source.describe_timings()})")
+            
+            # Fase 2: análisis sobre una decodificación reducida; la imagen
+            # completa se decodifica al generar o guardar
+            def analysis_task(token):
+                self.logic.analyze_image()
+                return True
+
+            def analysis_callback(analysis_result):
+                self.image_info_var.set(self.logic.state.image_info)
+                self.debounced_update_preview()
+
+            self.scheduler.submit(analysis_task, analysis_callback, scheduler.ANALYSIS, key='analysis')
+        self.scheduler.submit(load_task, load_callback, scheduler.PREVIEW, key='load')
+
+    def show_thumbnail(self, thumbnail):
+        """Mostrar thumbnail mientras se procesa la imagen completa"""
+        if thumbnail:
+            # Convertir a PhotoImage y mostrar
+            thumb_tk = ImageTk.PhotoImage(thumbnail)
+            self.preview_canvas.delete("all")
+            self._layers = None
+            canvas_w = self.preview_canvas.winfo_width()
+            canvas_h = self.preview_canvas.winfo_height()
+            x = (canvas_w - thumb_tk.width()) // 2
+            y = (canvas_h - thumb_tk.height()) // 2
+            self.preview_canvas.create_image(x, y, anchor=tk.NW, image=thumb_tk)
+            self.preview_canvas.image = thumb_tk  # Mantener referencia
+            self.zoom_info.set("Vista previa (thumbnail)")
+
+    def get_options(self):
+        """Opciones de render según los controles (las mismas para vista previa y generación)"""
+        return {
+            'remove_bg': self.remove_bg_var.get(),
+            'add_outline': self.add_outline_var.get(),
+            'blur_bg': self.blur_bg_var.get(),
+            'position': self.logic.state.position,
+            'offset_x': self.logic.state.offset_x,
+            'offset_y': self.logic.state.offset_y,
+            'bg_color': self.get_background_color(),
+            'mask_refine': 'guided' if self.refine_mask_var.get() else None,
+            'outline_width': self.get_outline_width(),
+            'fit_subject': self.fit_subject_var.get(),
+            'resample_quality': self.resample_quality_var.get()
+        }
+
+    # -------------------- GENERACIÓN OPTIMIZADA --------------------
+    def generate_wallpaper(self):
+        """Generación de wallpaper"""
+        if not self.logic.has_image():
+            messagebox.showwarning("Advertencia", "Carga una imagen primero.")
+            return
+        try:
+            target_size = self.get_target_resolution()
+            if target_size[0] * target_size[1] >= TILED_MIN_PIXELS:
+                self.generate_to_file(target_size)
+                return
+            self.status_var.set("Generando wallpaper...")
+            options, auto = self.get_options(), self.color_option.get() == "auto"
+            # Generar en segundo plano; una nueva petición sustituye a la anterior
+            def generate_task(token):
+                progress = self.make_progress("Generando", token)
+                return self.logic.generate_wallpaper(target_size, self._final_color(options, auto), progress)
+            self.scheduler.submit(generate_task, self._finish_generate, scheduler.RENDER, key='generate')
+        except Exception as e:
+            self.status_var.set("Error al generar")
+            messagebox.showerror("Error", f"Error al generar wallpaper: {str(e)}")
+
+    def generate_to_file(self, target_size):
+        """Salidas muy grandes: se generan por franjas directamente al archivo (sin tenerlas en memoria).
+
+        JPEG, WebP y AVIF no se pueden escribir por franjas: se generan enteros en memoria.
+        """
+        filename = filedialog.asksaveasfilename(
+            title=f"Guardar wallpaper de {target_size[0]}x{target_size[1]}",
+            defaultextension=".png",
+            filetypes=self._save_file_types()
+        )
+        if not filename:
+            return
+        fmt = encoder.format_for(filename)
+        if fmt in encoder.STREAMABLE:
+            self.status_var.set("Generando wallpaper...")
+        else:
+            self.status_var.set(f"Generando wallpaper en memoria ({fmt} no se escribe por franjas; "
+                                f"PNG o TIFF usan mucha menos)...")
+        options, preset = self.get_options(), self.encode_preset_var.get()
+        auto = self.color_option.get() == "auto"
+
+        def generate_task(token):
+            try:
+                return self.logic.render_to_file(target_size, self._final_color(options, auto), filename, preset,
+                                                 progress=self.make_progress("Generando", token))
+            except scheduler.Cancelled:
+                raise
+            except Exception as e:
+                return e
+
+        self.scheduler.submit(generate_task, self._finish_save, scheduler.RENDER, key='generate')
+
+    def make_progress(self, label, token):
+        """Progress que muestra la etapa en la barra de estado (solo si cambia el porcentaje)"""
+        shown = [None]
+
+        def report(stage, fraction):
+            text = f"{label}: {stage} {fraction:.0%}"
+            if text != shown[0]:
+                shown[0] = text
+                self.root.after(0, lambda: self._show_progress(token, text))
+        return scheduler.Progress(report, token)
+
+    def _show_progress(self, token, text):
+        # Solo si la tarea sigue viva: una cancelada no pisa el estado actual
+        if not token.cancelled:
+            self.status_var.set(text)
+
+    def cancel_generate(self):
+        """Abortar la generación en curso (cambio de resolución, nueva imagen...)"""
+        if self.scheduler.cancel('generate'):
+            self.status_var.set("Generación cancelada")
+
+    def _finish_generate(self, result):
+        """Finalizar generación"""
+        if result:
+            self.logic.processed_image = result
+            self.update_preview()
+            self.status_var.set("Wallpaper generado")
+            timings = scheduler.Progress.format_timings(self.logic.last_timings)
+            if timings:
+                print(f"Generación: {timings}")
+            messagebox.showinfo("Éxito", "Wallpaper generado correctamente!")
+        else:
+            self.status_var.set("Error al generar")
+            messagebox.showerror("Error", "No se pudo generar el wallpaper")
+
+    # -------------------- VISTA PREVIA OPTIMIZADA --------------------
+    def update_preview(self):
+        """Vista previa en vivo: el pipeline completo a resolución de canvas.
+
+        Generar/Guardar siguen usando la resolución completa.
+        """
+        if not self.logic.has_image():
+            self.preview_canvas.delete("all")
+            self._layers = None
+            return
+
+        # Obtener dimensiones del canvas
+        try:
+            canvas_w = max(self.preview_canvas.winfo_width(), 1)
+            canvas_h = max(self.preview_canvas.winfo_height(), 1)
+            if canvas_w <= 10 or canvas_h <= 10:
+                self.root.after(50, self.update_preview)
+                return
+        except:
+            self.root.after(50, self.update_preview)
+            return
+
+        target_w, target_h = self.get_target_resolution(warn=False)
+        
+        # Tamaño de la vista previa con la proporción del destino (máximo 600px)
+        max_preview_size = 600
+        scale = min(canvas_w / target_w, canvas_h / target_h, max_preview_size / max(target_w, target_h))
+        preview_w = max(1, int(target_w * scale))
+        preview_h = max(1, int(target_h * scale))
+
+        options = self.get_options()
+        if not self.logic.subject_ready(options):
+            # El recorte se calcula en segundo plano; mientras, sin eliminar fondo
+            self._prepare_subject(options)
+            options = dict(options, remove_bg=False)
+        frame = self.logic.render_preview((target_w, target_h), (preview_w, preview_h), options)
+        if frame is None:
+            return
+        # Calcular posición centrada
+        origin = ((canvas_w - preview_w) // 2, (canvas_h - preview_h) // 2)
+        try:
+            self.draw_preview_layers(frame, origin, options)
+        except Exception as e:
+            print(f"Error al dibujar imagen: {e}")
+            return
+
+        # Actualizar info de zoom
+        self.zoom_info.set(f"Vista previa ({frame.scale * 100:.1f}%)")
+
+    def draw_preview_layers(self, frame, origin, options):
+        """Fondo y sujeto como capas separadas del canvas.
+
+        Cada PhotoImage se reconstruye solo si su imagen cambia; el resto de
+        cambios (posición, offsets) mueven la capa del sujeto.
+        """
+        canvas = self.preview_canvas
+        layers = self._layers
+        preview_size = frame.background.size
+        solid = None if options['blur_bg'] and not options['remove_bg'] else options['bg_color']
+        bg_key = (preview_size, solid) if solid is not None else frame.background
+        if layers is None or layers['origin'] != origin or layers['size'] != preview_size:
+            canvas.delete("all")
+            layers = self._layers = {'origin': origin, 'size': preview_size, 'bg_key': None,
+                                     'subject_src': None}
+            x0, y0 = origin
+            x1, y1 = x0 + preview_size[0], y0 + preview_size[1]
+            layers['bg_item'] = canvas.create_rectangle(x0, y0, x1, y1, outline='')
+            layers['bg_image_item'] = canvas.create_image(x0, y0, anchor=tk.NW)
+            layers['subject_item'] = canvas.create_image(x0, y0, anchor=tk.NW)
+            # Marco con el color del canvas: recorta el sujeto fuera del wallpaper
+            far = 100000
+            for box in ((-far, -far, far, y0), (-far, y1, far, far), (-far, y0, x0, y1), (x1, y0, far, y1)):
+                canvas.create_rectangle(*box, fill=canvas.cget('bg'), outline='')
+
+        if not self._same_layer(layers['bg_key'], bg_key):
+            if solid is not None:
+                canvas.itemconfig(layers['bg_item'], fill='#%02x%02x%02x' % tuple(solid))
+                canvas.itemconfig(layers['bg_image_item'], image='')
+                layers['bg_tk'] = None
+            else:
+                layers['bg_tk'] = ImageTk.PhotoImage(frame.background)
+                canvas.itemconfig(layers['bg_image_item'], image=layers['bg_tk'])
+            layers['bg_key'] = bg_key
+        if layers['subject_src'] is not frame.subject:
+            layers['subject_tk'] = ImageTk.PhotoImage(frame.subject)
+            canvas.itemconfig(layers['subject_item'], image=layers['subject_tk'])
+            layers['subject_src'] = frame.subject
+
+        layers.update(position=frame.position, scale=frame.scale,
+                      offsets=(options['offset_x'], options['offset_y']))
+        self.place_subject_layer(*layers['offsets'])
+
+    @staticmethod
+    def _same_layer(old, new):
+        # Los fondos desenfocados se comparan por identidad (vienen de la cache)
+        if isinstance(old, tuple) and isinstance(new, tuple):
+            return old == new
+        return old is new
+
+    def place_subject_layer(self, offset_x, offset_y):
+        """Colocar la capa del sujeto para unos offsets (en píxeles de salida)"""
+        layers = self._layers
+        base_x, base_y = layers['offsets']
+        x = layers['position'][0] + round((offset_x - base_x) * layers['scale'])
+        y = layers['position'][1] + round((offset_y - base_y) * layers['scale'])
+        self.preview_canvas.coords(layers['subject_item'], layers['origin'][0] + x, layers['origin'][1] + y)
+
+    def on_offset_change(self, *args):
+        """Traza de los offsets: mover la capa del sujeto sin trabajo de imagen"""
+        if not self._layers:
+            return
+        try:
+            self.place_subject_layer(self.offset_x_var.get(), self.offset_y_var.get())
+        except tk.TclError:
+            pass  # Valor intermedio inválido (p. ej. Spinbox vacío)
+
+    def _prepare_subject(self, options):
+        """Calcular el recorte a resolución completa en segundo plano y refrescar la vista previa"""
+        subject_options = (options.get('mask_refine'), options['add_outline'],
+                           options.get('outline_width'), options.get('fit_subject'))
+        if self._preparing_subject == subject_options:
+            return
+        # Una petición con otras opciones sustituye a la pendiente
+        self._preparing_subject = subject_options
+        self.status_var.set("Eliminando fondo...")
+
+        def prepare_task(token):
+            return self.logic.prepare_subject(options, self.make_progress("Eliminando fondo", token))
+
+        def prepare_callback(ready):
+            self._preparing_subject = None
+            if ready:
+                self.status_var.set("Fondo eliminado")
+                self.debounced_update_preview()
+            else:
+                self.status_var.set("No se pudo eliminar el fondo")
+
+        # En su propio carril: la carga de otra imagen (PREVIEW) no espera a una inferencia
+        self.scheduler.submit(prepare_task, prepare_callback, scheduler.SEGMENTATION, key='subject')
+
+    # -------------------- GUARDADO OPTIMIZADO --------------------
+    def save_wallpaper(self):
+        """Guardado optimizado"""
+        if not self.logic.processed_image:
+            messagebox.showwarning("Advertencia", "Genera un wallpaper primero.")
+            return
+        filename = filedialog.asksaveasfilename(
+            title="Guardar wallpaper",
+            defaultextension=".png",
+            filetypes=self._save_file_types()
+        )
+        if not filename:
+            return
+        self.status_var.set("Guardando...")
+        image, preset = self.logic.processed_image, self.encode_preset_var.get()
+
+        # Codificar fuera del hilo de la UI; el resultado no se modifica después de generarse
+        def save_task(token):
+            try:
+                return encoder.save(image, filename, preset)
+            except Exception as e:
+                return e
+
+        self.scheduler.submit(save_task, self._finish_save, scheduler.ENCODE, key='save')
+
+    def _save_file_types(self):
+        file_types = [
+            ('PNG', '*.png'),
+            ('JPEG', '*.jpg'),
+            ('TIFF', '*.tiff')
+        ]
+        return file_types + [(fmt, f"*.{fmt.lower()}") for fmt in ('WEBP', 'AVIF') if encoder.available(fmt)]
+
+    def _finish_save(self, result):
+        if result is None:
+            self.status_var.set("Error al generar")
+            messagebox.showerror("Error", "No se pudo generar el wallpaper")
+        elif isinstance(result, encoder.EncodeResult):
+            self.status_var.set(f"Wallpaper guardado ({result.describe()})")
+            messagebox.showinfo("Éxito", f"Wallpaper guardado como: {result.path}")
+        else:
+            self.status_var.set("Error al guardar")
+            messagebox.showerror("Error", f"No se pudo guardar: {str(result)}")
+
+    def export_all_targets(self):
+        """Exportar todos los presets de resolución con un único recorte"""
+        if not self.logic.has_image():
+            messagebox.showwarning("Advertencia", "Carga una imagen primero.")
+            return
+        output_dir = filedialog.askdirectory(title="Carpeta de destino")
+        if not output_dir:
+            return
+        template = simpledialog.askstring(
+            "Nombre de archivo", "Plantilla ({stem}, {preset}, {name}, {width}, {height}):",
+            initialvalue=self.name_template)
+        if not template:
+            return
+        try:
+            targets = self.logic.preset_targets()
+            # Validar la plantilla antes de lanzar el trabajo
+            target_filename(template, self.logic.current_image_path, 'Personalizado', (1, 1))
+        except (KeyError, ValueError, IndexError) as e:
+            messagebox.showerror("Error", f"Plantilla inválida: {e}")
+            return
+        self.name_template = template
+        options = self.get_options()
+        auto = self.color_option.get() == "auto"
+        preset = self.encode_preset_var.get()
+        self.status_var.set(f"Exportando {len(targets)} resoluciones...")
+
+        def export_task(token):
+            start = time.perf_counter()
+            results = self.logic.render_targets(targets, self._final_color(options, auto), output_dir, template,
+                                                progress=self.make_progress("Exportando", token),
+                                                preset=preset)
+            return results, time.perf_counter() - start
+
+        # Clave propia: cambiar la resolución (cancel_generate) no aborta la exportación
+        self.scheduler.submit(export_task, self._finish_export, scheduler.RENDER, key='export')
+
+    def _finish_export(self, outcome):
+        results, elapsed = outcome or ([], 0.0)
+        failed = [r for r in results if r.error]
+        saved = len(results) - len(failed)
+        total_bytes = sum(r.encoded.nbytes for r in results if r.encoded)
+        self.status_var.set(f"Exportadas {saved} resoluciones en {elapsed:.1f}s ({total_bytes / 1e6:.1f} MB)")
+        for r in results:
+            if r.encoded:
+                print(f"{r.name}: {r.encoded.describe()}")
+        if failed:
+            details = "\n".join(f"{r.name}: {r.error}" for r in failed)
+            messagebox.showerror("Error", f"No se pudieron exportar {len(failed)} resoluciones:\n{details}")
+        elif results:
+            messagebox.showinfo("Éxito", f"{saved} wallpapers guardados en {os.path.dirname(results[0].path)}")
\ No newline at end of file
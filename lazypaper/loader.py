@@ -0,0 +1,133 @@
+# loader.py - Carga en dos fases: vista previa reducida inmediata y decodificación completa diferida
+import io
+import threading
+import time
+from typing import Dict, Optional
+
+from PIL import ExifTags, Image
+
+import analysis
+import fingerprint
+import resampling
+
+PREVIEW_SIDE = 300
+# Etiquetas de IFD1 con la posición de la miniatura JPEG embebida en EXIF
+EXIF_THUMB_OFFSET = 0x0201
+EXIF_THUMB_LENGTH = 0x0202
+
+
+def normalize_mode(image: Image.Image) -> Image.Image:
+    """La aplicación trabaja en RGB o RGBA"""
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGB')
+    return image
+
+def exif_thumbnail(img: Image.Image) -> Optional[Image.Image]:
+    """Miniatura embebida en EXIF (JPEG de cámara/móvil) o None"""
+    raw = img.info.get('exif')
+    if not raw:
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset, length = ifd1.get(EXIF_THUMB_OFFSET), ifd1.get(EXIF_THUMB_LENGTH)
+        if not offset or not length:
+            return None
+        # Los offsets son relativos a la cabecera TIFF, tras el prefijo 'Exif\0\0'
+        start = 6 if raw.startswith(b'Exif\x00\x00') else 0
+        thumb = Image.open(io.BytesIO(raw[start + offset:start + offset + length]))
+        thumb.load()
+    except Exception:
+        return None
+    # Descartar miniaturas con otra proporción (bandas negras, recortes)
+    if abs(thumb.width / thumb.height - img.width / img.height) > 0.02 * img.width / img.height:
+        return None
+    return normalize_mode(thumb)
+
+
+class ImageSource:
+    """Imagen en disco: cabecera al abrir, versiones reducidas baratas y
+    decodificación completa solo cuando generar o guardar la necesitan.
+
+    En JPEG las versiones reducidas usan draft() (escala 1/2-1/8 en el propio
+    decodificador); en otros formatos se decodifica una vez y se reutiliza.
+    """
+
+    def __init__(self, path: str):
+        start = time.perf_counter()
+        self.path = path
+        self.fingerprint = fingerprint.file_fingerprint(path)
+        with Image.open(path) as img:
+            self.size = img.size
+            self.mode = img.mode
+            self.format = img.format
+            self.info = dict(img.info)
+        self._image: Optional[Image.Image] = None
+        self._lock = threading.Lock()
+        self.timings: Dict[str, float] = {'header': time.perf_counter() - start}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._image is not None
+
+    def preview(self, side: int = PREVIEW_SIDE) -> Image.Image:
+        """Vista previa lo antes posible: miniatura EXIF, reducida o la imagen ya cargada"""
+        start = time.perf_counter()
+        thumb = None
+        if not self.loaded and self.format == 'JPEG':
+            with Image.open(self.path) as img:
+                thumb = exif_thumbnail(img)
+        if thumb is None:
+            thumb = self.reduced(side)
+        else:
+            resampling.thumbnail(thumb, side, resampling.PREVIEW)
+        self.timings['preview'] = time.perf_counter() - start
+        return thumb
+
+    def reduced(self, side: int) -> Image.Image:
+        """Versión de lado máximo side (sin decodificar a resolución completa en JPEG).
+
+        Sin draft se reduce la imagen completa sin copiarla; si ya cabe en side
+        se devuelve la misma (compartida: no modificar).
+        """
+        if self._image is None and self.format == 'JPEG':
+            with Image.open(self.path) as img:
+                img.draft('RGB', (side, side))  # El resultado es >= side en ambos ejes
+                img = normalize_mode(img)
+                img.load()
+            resampling.thumbnail(img, side, resampling.PREVIEW)
+            return img
+        return resampling.contain(self.full(), side, resampling.PREVIEW)
+
+    def full(self) -> Image.Image:
+        """Imagen completa (decodificada una sola vez y con la huella del archivo)"""
+        with self._lock:
+            if self._image is None:
+                start = time.perf_counter()
+                with Image.open(self.path) as img:
+                    img.load()
+                    image = normalize_mode(img)
+                self._image = fingerprint.tag(image, self.fingerprint)
+                self.timings['full'] = time.perf_counter() - start
+            return self._image
+
+    def analyze(self) -> analysis.ImageAnalysis:
+        """Análisis de carga sobre una decodificación reducida"""
+        if self.loaded:
+            return analysis.analyze(self._image)
+        start = time.perf_counter()
+        side = max(analysis.PYRAMID_SIDES)
+        record = analysis.analyze(self.reduced(side), self.size, self.mode)
+        self.timings['analysis'] = time.perf_counter() - start
+        return record
+
+    def describe_timings(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.timings.items())
@@ -1,314 +1,828 @@
-# logic.py - Lógica de la aplicación
-import io
-import os
-from typing import Tuple, Optional
-from collections import Counter
-import tkinter as tk
-
-from PIL import Image, ImageFilter, ImageDraw, ImageOps
-import numpy as np
-
-# Importar rembg opcionalmente
-try:
-    from rembg import remove as rembg_remove
-    from rembg.session_factory import new_session
-    REMBG_AVAILABLE = True
-except Exception as e:
-    print(f"rembg no disponible: {e}")
-    REMBG_AVAILABLE = False
-
-class LazyPaperLogic:
-    def __init__(self):
-        # Variables y estado
-        self.original_image: Optional[Image.Image] = None
-        self.processed_image: Optional[Image.Image] = None
-        self.current_image_path: Optional[str] = None
-        self._remove_bg_cache = None
-        self._dominant_color_cache = None
-        
-        # Variables de estado para la interfaz
-        self.image_info = tk.StringVar(value="No hay imagen cargada")
-        self.position_var = tk.StringVar(value="center")  # left, center, right
-        self.offset_x_var = tk.IntVar(value=0)
-        self.offset_y_var = tk.IntVar(value=0)
-        
-        # Resoluciones comunes
-        self.resolutions = {
-            "Desktop HD (1280x720)": (1280, 720),
-            "Desktop FHD (1920x1080)": (1920, 1080),
-            "Desktop QHD (2560x1440)": (2560, 1440),
-            "Desktop 4K (3840x2160)": (3840, 2160),
-            "Mobile HD (1080x2150)": (1080, 2160),
-            "Mobile QHD (1170x2532)": (1440, 2960),
-            "Apple iPad (2048x1536)": (2048, 1536),
-            "Apple iPad Pro (2048x2732)": (2048, 2732),
-            "Tablet Android HD (1920x1200)": (1920, 1200),
-            "Tablet Android Full HD (2048x2732)": (2560, 1600),
-            "Personalizado": None
-        }
-        
-        # Disponibilidad de rembg
-        self.REMBG_AVAILABLE = REMBG_AVAILABLE
-
-    # ---------- METHOD Analizar imagen----------
-    def analyze_image(self):
-        if not self.original_image:
-            self.image_info.set("No hay imagen cargada")
-            return
-        w, h = self.original_image.size
-        mode = self.original_image.mode
-        has_transparency = mode in ['RGBA', 'LA'] or 'transparency' in self.original_image.info
-        has_uniform_bg = self.detect_uniform_background()
-        info_text = f"Dimensiones: {w}x{h}\nModo: {mode}\nTransparencia: {'Sí' if has_transparency else 'No'}\nFondo uniforme: {'Probable' if has_uniform_bg else 'No detectado'}"
-        self.image_info.set(info_text)
-
-    def detect_uniform_background(self) -> bool:
-        if not self.original_image:
-            return False
-        img_rgb = self.original_image.convert('RGB')
-        arr = np.array(img_rgb)
-        h, w = arr.shape[:2]
-        border_pixels = []
-        border_pixels.extend(arr[0, :].reshape(-1, 3))
-        border_pixels.extend(arr[-1, :].reshape(-1, 3))
-        border_pixels.extend(arr[:, 0].reshape(-1, 3))
-        border_pixels.extend(arr[:, -1].reshape(-1, 3))
-        border_colors = [tuple(p) for p in border_pixels]
-        if not border_colors:
-            return False
-        counts = Counter(border_colors)
-        most_common_count = counts.most_common(1)[0][1]
-        return (most_common_count / len(border_colors)) > 0.8
-
-    # ---------- METHOD Background removal ----------
-        
-    def remove_background(self, image: Image.Image) -> Optional[Image.Image]:
-        if not self.REMBG_AVAILABLE:
-            return None
-        
-        # Verificar cache
-        image_hash = hash(image.tobytes())
-        if self._remove_bg_cache and self._remove_bg_cache[0] == image_hash:
-            return self._remove_bg_cache[1].copy()
-            
-        try:
-            # Optimizar: reducir tamaño para rembg si la imagen es muy grande
-            if image.width * image.height > 2000 * 2000:
-                # Crear una versión más pequeña para procesamiento
-                temp_img = image.copy()
-                temp_img.thumbnail((1500, 1500), Image.LANCZOS)
-                
-                # Convertir a bytes
-                buf = io.BytesIO()
-                temp_img.save(buf, format='PNG')
-                data = buf.getvalue()
-                
-                # Procesar
-                res = rembg_remove(data)
-                result = Image.open(io.BytesIO(res)).convert('RGBA')
-                
-                # Escalar de vuelta al tamaño original
-                result = result.resize(image.size, Image.LANCZOS)
-            else:
-                # Procesar imagen normal
-                buf = io.BytesIO()
-                image.save(buf, format='PNG')
-                data = buf.getvalue()
-                res = rembg_remove(data)
-                result = Image.open(io.BytesIO(res)).convert('RGBA')
-            
-            # Actualizar cache
-            self._remove_bg_cache = (image_hash, result.copy())
-            return result
-            
-        except Exception as e:
-            print(f"No se pudo eliminar el fondo: {str(e)}")
-            return None
-
-    # ---------- METHOD Outline ----------
-    def add_outline_to_image(self, image: Image.Image, outline_width: int = 6) -> Image.Image:
-        """Crear contorno blanco a partir del canal alfa de la imagen (si la imagen tiene alfa)"""
-        # Asegurar RGBA
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-        alpha = image.split()[-1]
-
-        # blur + threshold
-        dilated = alpha.filter(ImageFilter.GaussianBlur(radius=outline_width/2))
-        # Threshold
-        bw = dilated.point(lambda p: 255 if p > 10 else 0)
-        # Contorno blanco
-        outline_img = Image.new('RGBA', (image.width, image.height), (255, 255, 255, 0))
-        # Rellenar de blanco donde bw es blanco
-        outline_img.paste(Image.new('RGBA', (image.width, image.height), (255,255,255,255)), mask=bw)
-        # Pegar la imagen original encima
-        outline_img.paste(image, (0,0), image)
-        return outline_img
-
-    # ---------- METHOD Blur background ----------
-    def create_blur_background(self, image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
-        target_w, target_h = target_size
-        img_ratio = image.width / image.height
-        target_ratio = target_w / target_h
-        if img_ratio > target_ratio:
-            new_height = target_h
-            new_width = int(img_ratio * new_height)
-        else:
-            new_width = target_w
-            new_height = int(new_width / img_ratio)
-        bg = image.resize((new_width, new_height), Image.LANCZOS)
-        bg = bg.filter(ImageFilter.GaussianBlur(radius=20))
-        result = Image.new('RGB', (target_w, target_h), (0,0,0))
-        x = (target_w - new_width)//2
-        y = (target_h - new_height)//2
-        result.paste(bg, (x,y))
-        return result
-            
-    def get_dominant_color(self, image: Image.Image) -> Tuple[int, int, int]:
-        """Método mejorado para obtener color dominante"""
-        # Verificar cache
-        image_hash = hash(image.tobytes())
-        if self._dominant_color_cache and self._dominant_color_cache[0] == image_hash:
-            return self._dominant_color_cache[1]
-        
-        try:
-            # Reducir tamaño para análisis
-            img = image.copy()
-            img.thumbnail((100, 100), Image.LANCZOS)
-            
-            # Convertir a numpy array
-            arr = np.array(img)
-            
-            # Si la imagen tiene transparencia, usar solo píxeles no transparentes
-            if arr.shape[2] == 4:
-                # Crear máscara para píxeles no transparentes
-                alpha = arr[:,:,3] > 10  # Umbral para considerar no transparente
-                if np.any(alpha):
-                    pixels = arr[alpha][:,:3]
-                else:
-                    # Si toda la imagen es transparente, usar blanco
-                    return (255, 255, 255)
-            else:
-                # Para imágenes sin transparencia, usar todos los píxeles
-                pixels = arr.reshape(-1, 3)
-            
-            if len(pixels) == 0:
-                return (255, 255, 255)
-            
-            try:
-                # Obtener colores de los bordes
-                border_pixels = []
-                border_pixels.extend(arr[0, :, :3])  # Borde superior
-                border_pixels.extend(arr[-1, :, :3])  # Borde inferior
-                border_pixels.extend(arr[:, 0, :3])  # Borde izquierdo
-                border_pixels.extend(arr[:, -1, :3])  # Borde derecho
-                
-                if len(border_pixels) > 0:
-                    border_pixels = np.array(border_pixels)
-                    # Usar el color más común en los bordes
-                    border_colors = [tuple(color) for color in border_pixels]
-                    color_counts = Counter(border_colors)
-                    if color_counts:
-                        most_common_border = color_counts.most_common(1)[0][0]
-                        # Verificar si este color es predominante en los bordes
-                        if color_counts.most_common(1)[0][1] > len(border_pixels) * 0.3:
-                            result = tuple(int(c) for c in most_common_border)
-                            self._dominant_color_cache = (image_hash, result)
-                            return result
-            except:
-                pass
-            
-            # Si el método de bordes falla, usar el color promedio
-            avg_color = np.mean(pixels, axis=0).astype(int)
-            result = tuple(avg_color)
-            
-            # Actualizar cache
-            self._dominant_color_cache = (image_hash, result)
-            return result
-            
-        except Exception as e:
-            print(f"Error en get_dominant_color: {e}")
-            return (255, 255, 255)  # Blanco por defecto en caso de error
-
-    # ---------- METHOD Generation ----------
-    def generate_wallpaper(self, target_size, options):
-        if not self.original_image:
-            return None
-            
-        try:
-            target_w, target_h = target_size
-            work_image = self.original_image.copy()
-
-            # Eliminar fondo
-            if options['remove_bg']:
-                removed = self.remove_background(work_image)
-                if removed:
-                    work_image = removed
-
-                    if options['add_outline']:
-                        work_image = self.add_outline_to_image(work_image)
-                else:
-                    # Si rembg falla, devolver None para indicar error
-                    return None
-
-            # Crear fondo
-            if options['blur_bg'] and not options['remove_bg']:
-                result = self.create_blur_background(self.original_image, (target_w, target_h))
-            else:
-                bg_color = options['bg_color']
-                result = Image.new('RGB', (target_w, target_h), bg_color)
-
-            # Calculo de tamaño manteniendo proporciones
-            img_ratio = work_image.width / work_image.height
-            target_ratio = target_w / target_h
-            if img_ratio > target_ratio:
-                new_w = min(target_w, work_image.width)
-                new_h = int(new_w / img_ratio)
-            else:
-                new_h = min(target_h, work_image.height)
-                new_w = int(new_h * img_ratio)
-
-            if work_image.size != (new_w, new_h):
-                work_image = work_image.resize((new_w, new_h), Image.LANCZOS)
-
-            # Position horizontal
-            pos = options['position']
-            offset_x = options['offset_x']
-            offset_y = options['offset_y']
-
-            if pos == 'left':
-                x = 0 + offset_x
-            elif pos == 'right':
-                x = target_w - new_w + offset_x
-            else:  # center
-                x = (target_w - new_w)//2 + offset_x
-            y = (target_h - new_h)//2 + offset_y
-
-            # Pegar respetando alfa si existe
-            if work_image.mode == 'RGBA':
-                base = result.convert('RGBA')
-                temp = Image.new('RGBA', (target_w, target_h), (0,0,0,0))
-                temp.paste(work_image, (x, y), work_image)
-                base = Image.alpha_composite(base, temp)
-                result = base.convert('RGB')
-            else:
-                result.paste(work_image, (x, y))
-
-            return result
-            
-        except Exception as e:
-            print(f"Error al generar wallpaper: {str(e)}")
-            return None
-
-    # ---------- METHOD Guardado de imagen ----------
-    def save_wallpaper(self, filename):
-        if not self.processed_image:
-            return
-            
-        if filename.lower().endswith(('.jpg', '.jpeg')):
-            save_image = self.processed_image.convert('RGB')
-            save_image.save(filename, 'JPEG', quality=95)
-        elif filename.lower().endswith('.tiff'):
-            self.processed_image.save(filename, 'TIFF')
-        else:
-            self.processed_image.save(filename, 'PNG')
\ No newline at end of file
+# logic.py - Lógica de la aplicación
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, NamedTuple, Tuple, Optional
+
+from PIL import Image
+
+import segmentation
+from mask_cache import MaskCache, content_digest
+from cache import LRUCache
+import fingerprint
+import background
+import resampling
+from scheduler import Cancelled, Progress
+
+# analysis, outline, loader, encoder y compositing cargan NumPy (unos 80 ms):
+# se importan en las funciones que los usan, así importar logic es barato
+if TYPE_CHECKING:
+    import analysis
+    import encoder
+    import loader
+
+# Resoluciones comunes
+RESOLUTIONS = {
+    "Desktop HD (1280x720)": (1280, 720),
+    "Desktop FHD (1920x1080)": (1920, 1080),
+    "Desktop QHD (2560x1440)": (2560, 1440),
+    "Desktop 4K (3840x2160)": (3840, 2160),
+    "Mobile HD (1080x2150)": (1080, 2160),
+    "Mobile QHD (1170x2532)": (1440, 2960),
+    "Apple iPad (2048x1536)": (2048, 1536),
+    "Apple iPad Pro (2048x2732)": (2048, 2732),
+    "Tablet Android HD (1920x1200)": (1920, 1200),
+    "Tablet Android Full HD (2048x2732)": (2560, 1600),
+    "Personalizado": None
+}
+
+# Opciones por defecto (mismo diccionario que construye la GUI)
+DEFAULT_OPTIONS = {
+    'remove_bg': False,
+    'add_outline': False,
+    'blur_bg': False,
+    'position': 'center',
+    'offset_x': 0,
+    'offset_y': 0,
+    'bg_color': (255, 255, 255),
+    'mask_refine': None,  # None o 'guided'
+    'outline_width': 6,
+    'outline_color': (255, 255, 255),
+    'outline_antialias': True,
+    'fit_subject': False,  # Escalar/posicionar según la caja del sujeto y no el marco
+    'blur_radius': 20,  # Referido a una salida de 1080 px de lado corto
+    'blur_mode': 'pyramid',  # 'pyramid' o 'full'
+    # None: 8 bits con Pillow; 'float32'/'uint16': escalado, contorno y composición
+    # premultiplicados con ese intermedio (bordes semitransparentes más limpios)
+    'composite_precision': None,
+    'resample_quality': resampling.DEFAULT_QUALITY  # 'fast', 'balanced' o 'best' (ver resampling.py)
+}
+
+# A partir de este tamaño rembg trabaja sobre una copia reducida y la máscara se reescala
+SEGMENTATION_MIN_PIXELS = 2000 * 2000
+
+# Plantilla de nombre al exportar varias resoluciones (la extensión se añade aparte)
+DEFAULT_NAME_TEMPLATE = "{stem}_{preset}_{width}x{height}"
+# Desde este número de píxeles de salida se compone y guarda por franjas (8K y más)
+TILED_MIN_PIXELS = 7680 * 4320
+STRIP_HEIGHT = 512
+
+@dataclass
+class LazyPaperState:
+    """Estado plano del motor (sin tkinter). La GUI enlaza sus variables a estos campos"""
+    image_info: str = "No hay imagen cargada"
+    position: str = "center"  # left, center, right
+    offset_x: int = 0
+    offset_y: int = 0
+
+class Subject(NamedTuple):
+    """Sujeto recortado a su caja alfa y su posición dentro del marco original"""
+    image: Image.Image
+    offset: Tuple[int, int]  # esquina superior izquierda del recorte en el marco
+    frame: Tuple[int, int]   # tamaño del marco (imagen original)
+
+class PreviewFrame(NamedTuple):
+    """Vista previa a resolución de pantalla: fondo y sujeto por separado"""
+    background: Image.Image  # RGB, tamaño de la vista previa
+    subject: Image.Image  # Sujeto ya escalado a la vista previa
+    position: Tuple[int, int]  # Esquina superior izquierda del sujeto en la vista previa
+    scale: float  # Píxeles de vista previa por píxel de salida
+
+    def composite(self) -> Image.Image:
+        result = self.background.copy()
+        mask = self.subject if self.subject.mode == 'RGBA' else None
+        result.paste(self.subject, self.position, mask)
+        return result
+
+class RenderedTarget(NamedTuple):
+    """Resultado de una resolución en render_targets"""
+    name: str
+    size: Tuple[int, int]
+    path: Optional[str]
+    seconds: float
+    error: Optional[str]
+    encoded: Optional['encoder.EncodeResult'] = None
+
+def preset_slug(name: str) -> str:
+    """'Desktop 4K (3840x2160)' -> 'desktop-4k'"""
+    label = name.split('(')[0]
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-') or 'custom'
+
+def target_filename(template: str, source_path: Optional[str], name: str,
+                    size: Tuple[int, int], fmt: str = 'png', stem: Optional[str] = None) -> str:
+    """Nombre de archivo según template: {stem}, {preset}, {name}, {width}, {height}
+
+    stem reemplaza al nombre de source_path (lotes con nombres repetidos).
+    """
+    if stem is None:
+        stem = os.path.splitext(os.path.basename(source_path))[0] if source_path else 'wallpaper'
+    base = template.format(stem=stem, preset=preset_slug(name), name=name,
+                           width=size[0], height=size[1])
+    import encoder
+    return base + encoder.EXTENSIONS[fmt]
+
+def subject_footprint(base_size: Tuple[int, int], subject_size: Tuple[int, int],
+                      position: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """Rectángulo del destino que cubre el sujeto, recortado a la base (None si no la toca)"""
+    x, y = position
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + subject_size[0], base_size[0])
+    bottom = min(y + subject_size[1], base_size[1])
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right, bottom
+
+def composite_subject(base: Image.Image, subject: Image.Image, position: Tuple[int, int]) -> Image.Image:
+    """Pegar subject sobre base (RGB, se modifica) en position respetando su alfa.
+
+    Solo se mezcla el rectángulo que ocupa el sujeto dentro de base; position
+    puede ser negativa o salirse (el sujeto se recorta). base puede ser una franja.
+    """
+    footprint = subject_footprint(base.size, subject.size, position)
+    if footprint is None:
+        return base
+    # Con máscara, paste mezcla base * (1 - a) + sujeto * a solo en ese
+    # rectángulo y recorta lo que quede fuera (offsets negativos incluidos)
+    base.paste(subject, position, subject if subject.mode == 'RGBA' else None)
+    return base
+
+def subject_box(subject: Subject) -> Tuple[int, int, int, int]:
+    """Caja del recorte dentro de su marco"""
+    x, y = subject.offset
+    return (x, y, x + subject.image.width, y + subject.image.height)
+
+def subject_canvas(subject: Subject) -> Tuple[int, int, int, int]:
+    """Caja del marco en coordenadas del recorte: fuera del recorte todo es transparente"""
+    x, y = subject.offset
+    return (-x, -y, subject.frame[0] - x, subject.frame[1] - y)
+
+def place_subject(frame: Tuple[int, int], box: Tuple[int, int, int, int], target_size: Tuple[int, int],
+                  options) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[float, float, float, float]]:
+    """Tamaño y posición en el destino de la caja box de un marco frame, y la
+    región de la caja (en coma flotante, relativa a ella) que se escala a ese tamaño.
+
+    El marco se escala manteniendo proporciones (sin ampliar) y se coloca según
+    position y los offsets; la caja conserva su lugar dentro del marco. La
+    región es la preimagen exacta de los píxeles destino que toca la caja (puede
+    salirse de ella menos de un píxel destino): escalarla con resize(box=) sobre
+    el recorte rodeado del marco transparente que alcanza el filtro (ver
+    _resized_stage) da el mismo resultado que escalar el marco entero. Con
+    reducing_gap, Pillow alinea la reducción por bloques con la región y no con
+    el marco, así que en los bordes puede haber diferencias de unos pocos niveles.
+    """
+    target_w, target_h = target_size
+    frame_w, frame_h = frame
+    img_ratio = frame_w / frame_h
+    if img_ratio > target_w / target_h:
+        new_w = min(target_w, frame_w)
+        new_h = int(new_w / img_ratio)
+    else:
+        new_h = min(target_h, frame_h)
+        new_w = int(new_h * img_ratio)
+
+    scale_x, scale_y = new_w / frame_w, new_h / frame_h
+    left, right = _covering_span(box[0], box[2], scale_x)
+    top, bottom = _covering_span(box[1], box[3], scale_y)
+    source = (_snap(left / scale_x - box[0]), _snap(top / scale_y - box[1]),
+              _snap(right / scale_x - box[0]), _snap(bottom / scale_y - box[1]))
+
+    pos = options['position']
+    if pos == 'left':
+        x = 0 + options['offset_x']
+    elif pos == 'right':
+        x = target_w - new_w + options['offset_x']
+    else:  # center
+        x = (target_w - new_w)//2 + options['offset_x']
+    y = (target_h - new_h)//2 + options['offset_y']
+    return (right - left, bottom - top), (x + left, y + top), source
+
+def _covering_span(start: int, end: int, scale: float) -> Tuple[int, int]:
+    """Píxeles destino [a, b) que toca [start, end) * scale (al menos uno)"""
+    a = math.floor(start * scale + 1e-6)
+    return a, max(a + 1, math.ceil(end * scale - 1e-6))
+
+def _snap(value: float) -> float:
+    """Coordenada sin el error de coma flotante de las divisiones"""
+    nearest = round(value)
+    return float(nearest) if abs(value - nearest) < 1e-6 else value
+
+class LazyPaperLogic:
+    def __init__(self, state: Optional[LazyPaperState] = None):
+        # Variables y estado
+        self.source: Optional['loader.ImageSource'] = None  # Archivo con decodificación diferida
+        self._original_image: Optional[Image.Image] = None
+        self.processed_image: Optional[Image.Image] = None
+        self.current_image_path: Optional[str] = None
+        # Cache por etapas (recorte, contorno, sujeto redimensionado, fondo, color)
+        self.cache = LRUCache(max_bytes=512 * 1024 * 1024)
+        
+        # Estado compartido con la interfaz
+        self.state = state if state is not None else LazyPaperState()
+        
+        # Resoluciones comunes
+        self.resolutions = RESOLUTIONS
+        
+        # Disponibilidad de rembg y sesión de segmentación a usar
+        self.REMBG_AVAILABLE = segmentation.REMBG_AVAILABLE
+        self.rembg_model = segmentation.DEFAULT_MODEL
+        self.rembg_providers = None
+        self.segmentation_max_side = 1500
+        self.mask_cache = MaskCache()
+        # Tiempos por etapa del último generate_wallpaper
+        self.last_timings = {}
+
+    # ---------- METHOD Cargar imagen ----------
+    @property
+    def original_image(self) -> Optional[Image.Image]:
+        """Imagen a resolución completa; con una fuente diferida se decodifica aquí"""
+        if self._original_image is None and self.source is not None:
+            self._original_image = self.source.full()
+        return self._original_image
+
+    @original_image.setter
+    def original_image(self, image: Optional[Image.Image]):
+        self._original_image = image
+        if image is None:
+            self.source = None
+
+    def has_image(self) -> bool:
+        """Hay imagen cargada (sin forzar la decodificación completa)"""
+        return self.source is not None or self._original_image is not None
+
+    def source_fingerprint(self) -> Optional[str]:
+        if self.source is not None:
+            return self.source.fingerprint
+        if self._original_image is not None:
+            return fingerprint.fingerprint(self._original_image)
+        return None
+
+    def set_source(self, source: 'loader.ImageSource', record: Optional['analysis.ImageAnalysis'] = None):
+        """Establecer la imagen a partir de un archivo sin decodificarlo entero"""
+        self.source = source
+        self._original_image = None
+        self.current_image_path = source.path
+        self.processed_image = None
+        if record is not None:
+            self.cache.put(('analysis', source.fingerprint), record)
+
+    def set_image(self, image: Image.Image, path: Optional[str] = None,
+                  record: Optional['analysis.ImageAnalysis'] = None):
+        """Establecer la imagen original y asignarle su huella una sola vez.
+
+        record es el análisis ya calculado al cargar (p. ej. en el hilo de carga).
+        """
+        fp = None
+        if path:
+            try:
+                fp = fingerprint.file_fingerprint(path)
+            except OSError:
+                pass
+        fingerprint.tag(image, fp or fingerprint.sampled_fingerprint(image))
+        self.source = None
+        self.original_image = image
+        self.current_image_path = path
+        self.processed_image = None
+        if record is not None:
+            self.cache.put(('analysis', fingerprint.get(image)), record)
+
+    # ---------- METHOD Analizar imagen----------
+    def analyze_image(self):
+        if not self.has_image():
+            self.state.image_info = "No hay imagen cargada"
+            return
+        self.state.image_info = self.image_analysis().describe()
+
+    def image_analysis(self, image: Optional[Image.Image] = None) -> 'analysis.ImageAnalysis':
+        """Registro de análisis (pirámide, paleta, transparencia), cacheado.
+
+        Sin image se analiza la imagen cargada, a partir de una decodificación
+        reducida si aún no se ha decodificado entera.
+        """
+        import analysis
+        if image is not None:
+            key = ('analysis', fingerprint.fingerprint(image))
+            return self.cache.get_or_create(key, lambda: analysis.analyze(image))
+        key = ('analysis', self.source_fingerprint())
+        if self.source is not None:
+            return self.cache.get_or_create(key, self.source.analyze)
+        return self.cache.get_or_create(key, lambda: analysis.analyze(self._original_image))
+
+    def detect_uniform_background(self) -> bool:
+        if not self.has_image():
+            return False
+        return self.image_analysis().uniform_background
+
+    # ---------- METHOD Background removal ----------
+        
+    def remove_background(self, image: Image.Image, refine: Optional[str] = None,
+                          progress: Optional[Progress] = None,
+                          quality: Optional[str] = None) -> Optional[Image.Image]:
+        """Recortar el sujeto. refine='guided' afina los bordes de la máscara reescalada"""
+        subject = self._cutout(image, refine, progress, quality)
+        if subject is None:
+            return None
+        # Reconstruir el recorte a tamaño completo (el cacheado se comparte entre etapas)
+        result = Image.new('RGBA', subject.frame, (0, 0, 0, 0))
+        result.paste(subject.image, subject.offset)
+        return fingerprint.tag(result, fingerprint.get(subject.image))
+
+    def _cutout(self, image: Image.Image, refine: Optional[str] = None,
+                progress: Optional[Progress] = None, quality: Optional[str] = None) -> Optional[Subject]:
+        """Recorte cacheado por imagen de origen, limitado a la caja del sujeto (compartido, no modificar)"""
+        if not self.REMBG_AVAILABLE or not segmentation.load_rembg():
+            self.REMBG_AVAILABLE = False
+            return None
+        
+        # Verificar cache
+        digest = fingerprint.fingerprint(image)
+        quality = self._mask_quality(image, quality)
+        key = ('cutout', digest, self.rembg_model, self.segmentation_max_side, refine, quality)
+        return self.cache.get_or_create(key, lambda: self._segment(image, digest, refine, progress or Progress(),
+                                                                   quality))
+
+    @staticmethod
+    def _mask_quality(image: Image.Image, quality: Optional[str]) -> Optional[str]:
+        """La calidad solo cuenta si la máscara se reescala (imágenes grandes)"""
+        if image.width * image.height <= SEGMENTATION_MIN_PIXELS:
+            return None
+        return quality or resampling.DEFAULT_QUALITY
+
+    def _segment(self, image: Image.Image, digest: str, refine: Optional[str],
+                 progress: Progress, quality: Optional[str] = None) -> Optional[Subject]:
+        try:
+            with progress.stage('recorte') as report:
+                # La cache en disco sobrevive a reinicios y cambios del archivo: se indexa por
+                # el contenido completo; la huella rápida (digest) solo se usa en memoria
+                content = content_digest(image) if self.mask_cache.enabled else None
+                # Optimizar: reducir tamaño para rembg si la imagen es muy grande
+                if image.width * image.height > SEGMENTATION_MIN_PIXELS:
+                    # Crear una versión más pequeña para procesamiento (sin copiar el original)
+                    temp_img = resampling.contain(image, self.segmentation_max_side, resampling.SEGMENTATION)
+                    report(0.1)
+                    
+                    # Procesar en memoria: solo se recibe la máscara alfa
+                    mask = self._predict_mask_cached(temp_img, content)
+                    report(0.6)
+                    
+                    # Escalar solo la máscara y aplicarla al original intacto
+                    mask = segmentation.upsample_mask(mask, image.size, temp_img, image, refine,
+                                                      progress=lambda f: report(0.6 + 0.3 * f),
+                                                      quality=quality)
+                else:
+                    # Procesar imagen normal
+                    mask = self._predict_mask_cached(image, content)
+                    report(0.9)
+                fp = fingerprint.derive(digest, 'cutout', self.rembg_model, refine, quality)
+                return self._crop_subject(image, mask, fp)
+            
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"No se pudo eliminar el fondo: {str(e)}")
+            return None
+
+    def _crop_subject(self, image: Image.Image, mask: Image.Image, fp: str) -> Subject:
+        """Recortar imagen y máscara a la caja del sujeto (1px de margen; el margen del filtro
+        lo añade _resized_stage al escalar)"""
+        bbox = mask.getbbox()  # Sobre la máscara 'L' tal cual: sin copia y sin umbral
+        if bbox is None:
+            # Sin sujeto detectado: un recorte vacío
+            return Subject(fingerprint.tag(Image.new('RGBA', (1, 1), (0, 0, 0, 0)), fp), (0, 0), image.size)
+        left, top, right, bottom = bbox
+        box = (max(0, left - 1), max(0, top - 1), min(image.width, right + 1), min(image.height, bottom + 1))
+        cutout = image.crop(box).convert('RGBA')
+        cutout.putalpha(mask.crop(box))
+        return Subject(fingerprint.tag(cutout, fp), box[:2], image.size)
+
+    def _predict_mask_cached(self, seg_image: Image.Image, digest: Optional[str]) -> Image.Image:
+        """Máscara del modelo desde la cache en disco, o inferencia si no está.
+
+        digest es el digest del contenido del original (None: sin cache en disco).
+        """
+        if digest is None:
+            return segmentation.predict_mask(seg_image, self.rembg_model, self.rembg_providers)
+        key = MaskCache.make_key(digest, self.rembg_model, size=f"{seg_image.width}x{seg_image.height}")
+        mask = self.mask_cache.get(key)
+        if mask is None:
+            mask = segmentation.predict_mask(seg_image, self.rembg_model, self.rembg_providers)
+            self.mask_cache.put(key, mask)
+        return mask
+
+    # ---------- METHOD Outline ----------
+    def add_outline_to_image(self, image: Image.Image, outline_width: int = 6,
+                             color: Tuple[int, int, int] = (255, 255, 255),
+                             antialias: bool = True, progress: Optional[Progress] = None,
+                             precision: Optional[str] = None, inplace: bool = False) -> Image.Image:
+        """Crear contorno de ancho exacto a partir del canal alfa de la imagen (ver outline.py)"""
+        import outline
+        progress = progress or Progress()
+        with progress.stage('contorno') as report:
+            return outline.add_outline(image, outline_width, color, antialias, progress=report,
+                                       precision=precision, inplace=inplace)
+
+    # ---------- METHOD Blur background ----------
+    def create_blur_background(self, image: Image.Image, target_size: Tuple[int, int],
+                               radius: float = background.DEFAULT_BLUR_RADIUS,
+                               mode: str = 'pyramid', progress: Optional[Progress] = None,
+                               quality: str = resampling.DEFAULT_QUALITY) -> Image.Image:
+        """Fondo desenfocado. radius se escala con la salida; mode 'pyramid' (rápido) o 'full'"""
+        progress = progress or Progress()
+        with progress.stage('fondo') as report:
+            return background.create_blur_background(image, target_size, radius, mode, report, quality)
+            
+    def color_stats(self, image: Optional[Image.Image] = None) -> 'analysis.ColorStats':
+        """Paleta y uniformidad del borde, tomadas del análisis de la imagen"""
+        return self.image_analysis(image).colors
+
+    def cached_dominant_color(self) -> Optional[Tuple[int, int, int]]:
+        """get_dominant_color de la imagen cargada solo si su análisis ya está en cache
+        (None si no): nunca decodifica ni espera al análisis en curso"""
+        if ('analysis', self.source_fingerprint()) not in self.cache:
+            return None
+        return self.get_dominant_color()
+
+    def get_dominant_color(self, image: Optional[Image.Image] = None) -> Tuple[int, int, int]:
+        """Color del borde si predomina; si no, el promedio de los píxeles opacos.
+
+        Sin image se usa la imagen cargada (sin decodificarla entera).
+        """
+        import analysis
+        try:
+            return analysis.dominant_color(self.color_stats(image))
+        except Exception as e:
+            print(f"Error en get_dominant_color: {e}")
+            return (255, 255, 255)  # Blanco por defecto en caso de error
+
+    # ---------- METHOD Generation ----------
+    def generate_wallpaper(self, target_size, options, progress: Optional[Progress] = None):
+        """Generar el wallpaper por etapas cacheadas.
+
+        Recorte, contorno, sujeto redimensionado y fondo se memorizan en
+        self.cache; cambiar solo la posición o el color rehace la composición.
+        progress informa de cada etapa (tiempos en self.last_timings) y
+        permite abortar: con su token cancelado se lanza Cancelled.
+        """
+        if not self.has_image():
+            return None
+        progress = progress or Progress()
+        self.last_timings = progress.timings
+            
+        try:
+            target_w, target_h = target_size
+            with progress.stage('decodificación'):
+                source_fp = fingerprint.fingerprint(self.original_image)
+
+            # Eliminar fondo
+            subject = self._subject_stage(options, progress)
+            if subject is None:
+                # Si rembg falla, devolver None para indicar error
+                return None
+
+            # Crear fondo
+            result = self._background_stage((target_w, target_h), options, progress)
+
+            # Solo se redimensiona el recorte, en su rectángulo dentro del marco escalado
+            size, (x, y), source = place_subject(subject.frame, subject_box(subject), target_size, options)
+            precision = options.get('composite_precision')
+            with progress.stage('escalado'):
+                work_image = self._resized_stage(subject.image, size, precision, self._quality(options),
+                                                 box=source, canvas=subject_canvas(subject))
+
+            # Pegar respetando alfa si existe
+            with progress.stage('composición'):
+                result = self._composite(result, work_image, (x, y), precision)
+
+            return fingerprint.tag(result, fingerprint.derive(source_fp, 'wallpaper', target_size,
+                                                              sorted(options.items())))
+            
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"Error al generar wallpaper: {str(e)}")
+            return None
+
+    def render_strips(self, target_size: Tuple[int, int], options, progress: Optional[Progress] = None,
+                      strip_height: int = STRIP_HEIGHT) -> Optional[Iterator[Image.Image]]:
+        """Wallpaper en franjas horizontales de strip_height filas, de arriba abajo.
+
+        Fondo y composición se hacen franja a franja: nunca hay un lienzo del
+        tamaño de la salida. Devuelve None si falla el recorte.
+        """
+        progress = progress or Progress()
+        subject = self._subject_stage(options, progress)
+        if subject is None:
+            return None
+        size, (x, y), source = place_subject(subject.frame, subject_box(subject), target_size, options)
+        precision = options.get('composite_precision')
+        with progress.stage('escalado'):
+            work_image = self._resized_stage(subject.image, size, precision, self._quality(options),
+                                             box=source, canvas=subject_canvas(subject))
+        region = self._background_strips(target_size, options, progress)
+
+        def strips():
+            target_h = target_size[1]
+            for top in range(0, target_h, strip_height):
+                bottom = min(target_h, top + strip_height)
+                progress.update('composición', top / target_h)
+                yield self._composite(region(top, bottom), work_image, (x, y - top), precision)
+            progress.update('composición', 1.0)
+        return strips()
+
+    def render_to_file(self, target_size: Tuple[int, int], options, filename: str,
+                       preset: Optional[str] = None, overrides=None,
+                       progress: Optional[Progress] = None) -> Optional['encoder.EncodeResult']:
+        """Generar y guardar en filename; None si no se pudo generar.
+
+        A partir de TILED_MIN_PIXELS se compone por franjas y se codifica en
+        streaming, con memoria acotada por la franja y no por la salida. Los
+        formatos que no se pueden escribir por franjas (JPEG, WebP, AVIF) se
+        generan enteros en memoria, con un aviso. preset None es el de encoder.
+        """
+        import encoder
+        if not self.has_image():
+            return None
+        preset = preset or encoder.DEFAULT_PRESET
+        pixels = target_size[0] * target_size[1]
+        fmt = encoder.format_for(filename)
+        if pixels < TILED_MIN_PIXELS or fmt not in encoder.STREAMABLE:
+            if pixels >= TILED_MIN_PIXELS:
+                print(f"Aviso: {fmt} no se puede escribir por franjas; {target_size[0]}x{target_size[1]} "
+                      f"se genera entero en memoria (~{pixels * 4 / 2 ** 20:.0f} MB); PNG y TIFF sí")
+            result = self.generate_wallpaper(target_size, options, progress)
+            return encoder.save(result, filename, preset, overrides) if result is not None else None
+        progress = progress or Progress()
+        self.last_timings = progress.timings
+        strips = self.render_strips(target_size, options, progress)
+        if strips is None:
+            return None
+        return encoder.save_strips(strips, filename, target_size, preset, overrides)
+
+    # ---------- METHOD Vista previa ----------
+    def subject_ready(self, options) -> bool:
+        """El sujeto ya está en cache (la vista previa no ejecutará la segmentación)"""
+        if not options['remove_bg']:
+            return True
+        if not self.has_image() or (self._original_image is None and not self.source.loaded):
+            return False
+        image = self.original_image
+        digest = fingerprint.fingerprint(image)
+        cutout = self.cache.get(('cutout', digest, self.rembg_model, self.segmentation_max_side,
+                                 options.get('mask_refine'), self._mask_quality(image, self._quality(options))))
+        if cutout is None:
+            return False
+        if options['add_outline']:
+            return ('outline', fingerprint.fingerprint(cutout.image)) + self._outline_params(options) in self.cache
+        return True
+
+    def prepare_subject(self, options, progress: Optional[Progress] = None) -> bool:
+        """Calcular (y cachear) el sujeto a resolución completa para la vista previa"""
+        return self._subject_stage(options, progress) is not None
+
+    def render_preview(self, target_size: Tuple[int, int], preview_size: Tuple[int, int],
+                       options) -> Optional[PreviewFrame]:
+        """Mismo pipeline que generate_wallpaper, a resolución de vista previa.
+
+        Fondo y sujeto salen de la pirámide del análisis (o del recorte ya
+        cacheado, reducido una vez); mover o cambiar el color solo recompone.
+        """
+        if not self.has_image():
+            return None
+        try:
+            scale = preview_size[0] / target_size[0]
+            record = self.image_analysis()
+            source_fp = self.source_fingerprint()
+            if options['remove_bg']:
+                subject = self._subject_stage(options)
+                if subject is None:
+                    return None
+                frame, box, image = subject.frame, subject_box(subject), subject.image
+                canvas = subject_canvas(subject)
+            else:
+                frame = record.size
+                box = (0, 0) + tuple(frame)
+                image = canvas = None
+            size, (x, y), source = place_subject(frame, box, target_size, options)
+            proxy_size = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+            if image is None:
+                # Nivel de la pirámide en lugar del original: la región se lleva a su escala
+                image = self._proxy_level(record, source_fp, max(proxy_size))
+                level_x, level_y = image.width / frame[0], image.height / frame[1]
+                source = (source[0] * level_x, source[1] * level_y, source[2] * level_x, source[3] * level_y)
+            subject_img = self._resized_stage(image, proxy_size, purpose=resampling.PREVIEW, box=source,
+                                              canvas=canvas)
+
+            if options['blur_bg'] and not options['remove_bg']:
+                radius = options.get('blur_radius', background.DEFAULT_BLUR_RADIUS)
+                mode = options.get('blur_mode', 'pyramid')
+                level = self._proxy_level(record, source_fp, max(preview_size))
+                bg = self.cache.get_or_create(
+                    ('blur', source_fp, 'proxy', preview_size, radius, mode),
+                    lambda: self.create_blur_background(level, preview_size, radius, mode, quality='fast'))
+            else:
+                bg = Image.new('RGB', preview_size, options['bg_color'])
+            return PreviewFrame(bg, subject_img, (round(x * scale), round(y * scale)), scale)
+        except Exception as e:
+            print(f"Error en la vista previa: {e}")
+            return None
+
+    def _proxy_level(self, record: 'analysis.ImageAnalysis', source_fp: str, side: int) -> Image.Image:
+        """Nivel de la pirámide que cubre side, con huella derivada (claves de cache O(1))"""
+        level = record.level(side)
+        if fingerprint.get(level) is None:
+            fingerprint.tag(level, fingerprint.derive(source_fp, 'level', level.size))
+        return level
+
+    def _subject_stage(self, options, progress: Optional[Progress] = None) -> Optional[Subject]:
+        """Sujeto a componer: original, recorte o recorte con contorno (cacheados)"""
+        if not options['remove_bg']:
+            return Subject(self.original_image, (0, 0), self.original_image.size)
+        subject = self._cutout(self.original_image, options.get('mask_refine'), progress, self._quality(options))
+        if subject is None:
+            return None
+        if options['add_outline']:
+            cutout_fp = fingerprint.fingerprint(subject.image)
+            params = self._outline_params(options)
+            subject = self.cache.get_or_create(
+                ('outline', cutout_fp) + params, lambda: self._outline_subject(subject, *params, progress))
+        if options.get('fit_subject'):
+            # Ajustar al sujeto: la caja del recorte pasa a ser el marco
+            subject = Subject(subject.image, (0, 0), subject.image.size)
+        return subject
+
+    @staticmethod
+    def _quality(options) -> str:
+        return options.get('resample_quality') or resampling.DEFAULT_QUALITY
+
+    @staticmethod
+    def _outline_params(options) -> tuple:
+        return (options.get('outline_width', 6), tuple(options.get('outline_color', (255, 255, 255))),
+                options.get('outline_antialias', True), options.get('composite_precision'))
+
+    def _outline_subject(self, subject: Subject, width: int, color, antialias: bool,
+                         precision: Optional[str] = None, progress: Optional[Progress] = None) -> Subject:
+        """Contorno sobre el recorte, ampliando su caja lo justo para el trazo"""
+        pad = int(width) + 1
+        crop_x, crop_y = subject.offset
+        frame_w, frame_h = subject.frame
+        box = (max(0, crop_x - pad), max(0, crop_y - pad),
+               min(frame_w, crop_x + subject.image.width + pad), min(frame_h, crop_y + subject.image.height + pad))
+        canvas = Image.new('RGBA', (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+        canvas.paste(subject.image, (crop_x - box[0], crop_y - box[1]))
+        # canvas es propio: el trazo se pinta encima sin otra copia
+        outlined = self.add_outline_to_image(canvas, width, color, antialias, progress, precision, inplace=True)
+        fp = fingerprint.derive(fingerprint.fingerprint(subject.image), 'outline', width, color, antialias, precision)
+        return Subject(fingerprint.tag(outlined, fp), box[:2], subject.frame)
+
+    def _resized_stage(self, image: Image.Image, size: Tuple[int, int],
+                       precision: Optional[str] = None, quality: str = resampling.DEFAULT_QUALITY,
+                       purpose: str = resampling.SUBJECT, box=None, canvas=None) -> Image.Image:
+        """Sujeto (o su región box) redimensionado, cacheado por tamaño destino,
+        región y filtro (premultiplicado si hay precision).
+
+        canvas es la caja del marco transparente que rodea a un recorte RGBA (en
+        coordenadas del recorte): se añade hasta donde alcanza el filtro para que
+        Pillow no renormalice sus pesos en el borde del recorte.
+        """
+        if box is not None:
+            box = tuple(_snap(v) for v in box)
+            if image.mode != 'RGBA':
+                box = (max(box[0], 0), max(box[1], 0), min(box[2], image.width), min(box[3], image.height))
+            if box == (0, 0) + image.size:
+                box = None
+        if image.mode != 'RGBA':
+            canvas = None
+        if image.size == size and box is None:
+            return image
+        image_fp = fingerprint.fingerprint(image)
+        resample = resampling.policy(purpose, quality)
+
+        def resize():
+            region = box or (0, 0) + image.size
+            margin = resampling.filter_margin(resample.filter, (region[2] - region[0], region[3] - region[1]), size)
+            frame = canvas or (0, 0) + image.size
+            # Lo que se lee: la imagen entera, la región (que puede salirse menos de un píxel
+            # destino) y el margen del filtro dentro del marco. crop rellena con transparente
+            outer = (min(0, math.floor(region[0]), max(frame[0], math.floor(region[0]) - margin)),
+                     min(0, math.floor(region[1]), max(frame[1], math.floor(region[1]) - margin)),
+                     max(image.width, math.ceil(region[2]), min(frame[2], math.ceil(region[2]) + margin)),
+                     max(image.height, math.ceil(region[3]), min(frame[3], math.ceil(region[3]) + margin)))
+            source = image
+            if outer != (0, 0) + image.size:
+                source = image.crop(outer)
+                region = (region[0] - outer[0], region[1] - outer[1], region[2] - outer[0], region[3] - outer[1])
+            if region == (0, 0) + source.size:
+                region = None
+            if precision is None:
+                resized = resampling.resize(source, size, purpose, quality, region)
+            else:
+                import compositing
+                resized = compositing.resize_premultiplied(source, size, resample.filter, precision,
+                                                           resample.reducing_gap, region)
+            return fingerprint.tag(resized, fingerprint.derive(image_fp, 'resized', size, precision, resample,
+                                                               box, canvas))
+        key = ('resized', image_fp, size, resample, box, canvas) + ((precision,) if precision else ())
+        return self.cache.get_or_create(key, resize)
+
+    def _composite(self, base: Image.Image, subject: Image.Image, position: Tuple[int, int],
+                   precision: Optional[str] = None) -> Image.Image:
+        """composite_subject, o con precision el núcleo premultiplicado (Sprite cacheado)"""
+        if precision is None or subject.mode != 'RGBA':
+            return composite_subject(base, subject, position)
+        import compositing
+        subject_fp = fingerprint.fingerprint(subject)
+        sprite = self.cache.get_or_create(('sprite', subject_fp, precision),
+                                          lambda: compositing.Sprite(subject, precision))
+        return compositing.composite_sprite(base, sprite, position)
+
+    def _background_stage(self, target_size: Tuple[int, int], options,
+                          progress: Optional[Progress] = None) -> Image.Image:
+        """Lienzo de fondo nuevo (se puede modificar); el blur se cachea por tamaño"""
+        if options['blur_bg'] and not options['remove_bg']:
+            radius = options.get('blur_radius', background.DEFAULT_BLUR_RADIUS)
+            mode = options.get('blur_mode', 'pyramid')
+            quality = self._quality(options)
+            key = ('blur', fingerprint.fingerprint(self.original_image), target_size, radius, mode, quality)
+            blurred = self.cache.get_or_create(
+                key, lambda: self.create_blur_background(self.original_image, target_size, radius, mode,
+                                                         progress, quality))
+            return blurred.copy()
+        return Image.new('RGB', target_size, options['bg_color'])
+
+    def _background_strips(self, target_size: Tuple[int, int], options,
+                           progress: Optional[Progress] = None) -> Callable[[int, int], Image.Image]:
+        """Fondo por franjas: region(top, bottom) devuelve esas filas como lienzo nuevo"""
+        if options['blur_bg'] and not options['remove_bg']:
+            radius = options.get('blur_radius', background.DEFAULT_BLUR_RADIUS)
+            mode = options.get('blur_mode', 'pyramid')
+            progress = progress or Progress()
+            with progress.stage('fondo') as report:
+                return background.create_blur_strips(self.original_image, target_size, radius, mode, report,
+                                                     self._quality(options))
+        width, color = target_size[0], options['bg_color']
+        return lambda top, bottom: Image.new('RGB', (width, bottom - top), color)
+
+    # ---------- METHOD Guardado de imagen ----------
+    def save_wallpaper(self, filename, preset: Optional[str] = None,
+                       overrides=None) -> Optional['encoder.EncodeResult']:
+        """Guardar el wallpaper generado; formato por extensión y ajustes según preset (ver encoder.py)"""
+        import encoder
+        if not self.processed_image:
+            return None
+        return encoder.save(self.processed_image, filename, preset or encoder.DEFAULT_PRESET, overrides)
+
+    # ---------- METHOD Exportar todas las resoluciones ----------
+    def preset_targets(self) -> Dict[str, Tuple[int, int]]:
+        """Presets de self.resolutions con tamaño (sin 'Personalizado')"""
+        return {name: size for name, size in self.resolutions.items() if size}
+
+    def render_targets(self, targets: Dict[str, Tuple[int, int]], options, output_dir: str,
+                       template: str = DEFAULT_NAME_TEMPLATE, fmt: str = 'png',
+                       workers: Optional[int] = None, progress: Optional[Progress] = None,
+                       preset: Optional[str] = None, overrides=None,
+                       stem: Optional[str] = None) -> List[RenderedTarget]:
+        """Renderizar y guardar varias resoluciones de la imagen actual.
+
+        La decodificación, el recorte y el contorno se calculan una sola vez (en
+        self.cache); luego cada destino solo escala el sujeto, crea su fondo y
+        compone, en paralelo en workers hilos (Pillow suelta el GIL en esas
+        operaciones y al comprimir).
+        """
+        if not self.has_image() or not targets:
+            return []
+        progress = progress or Progress()
+        os.makedirs(output_dir, exist_ok=True)
+        # Etapas compartidas antes de repartir: ningún hilo repite la segmentación
+        if self._subject_stage(options, progress) is None:
+            return [RenderedTarget(name, size, None, 0.0, "No se pudo eliminar el fondo")
+                    for name, size in targets.items()]
+
+        done = []
+
+        def render(item):
+            name, size = item
+            start = time.perf_counter()
+            path = os.path.join(output_dir, target_filename(template, self.current_image_path, name, size, fmt, stem))
+            try:
+                progress.update(name, 0.0)
+                # Progress propio por hilo (los tiempos no se mezclan), mismo token
+                encoded = self.render_to_file(size, options, path, preset, overrides,
+                                              Progress(token=progress.token))
+                if encoded is None:
+                    return RenderedTarget(name, size, None, time.perf_counter() - start,
+                                          "No se pudo generar el wallpaper")
+                done.append(name)
+                progress.update(name, len(done) / len(targets))
+                return RenderedTarget(name, size, path, time.perf_counter() - start, None, encoded)
+            except Cancelled:
+                raise
+            except Exception as e:
+                return RenderedTarget(name, size, None, time.perf_counter() - start, str(e))
+
+        workers = workers or min(len(targets), os.cpu_count() or 1)
+        if workers <= 1:
+            return [render(item) for item in targets.items()]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(render, targets.items()))
\ No newline at end of file
@@ -0,0 +1,150 @@
+# mask_cache.py - Cache persistente de máscaras de segmentación
+import hashlib
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+from PIL import Image
+
+
+def default_cache_dir() -> str:
+    """Directorio de cache del usuario según la plataforma (o LAZYPAPER_CACHE_DIR)"""
+    if os.environ.get('LAZYPAPER_CACHE_DIR'):
+        return os.environ['LAZYPAPER_CACHE_DIR']
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'LazyPaper', 'cache')
+    if sys.platform == 'darwin':
+        return os.path.join(os.path.expanduser('~'), 'Library', 'Caches', 'LazyPaper')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lazypaper')
+
+def content_digest(image: Image.Image, rows_per_chunk: int = 256) -> str:
+    """Digest estable del contenido de la imagen (por bloques de filas, sin copiar todo el buffer)"""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    for y in range(0, image.height, rows_per_chunk):
+        h.update(image.crop((0, y, image.width, min(image.height, y + rows_per_chunk))).tobytes())
+    return h.hexdigest()
+
+
+class MaskCache:
+    """Máscaras alfa comprimidas (PNG 'L') en disco con desalojo LRU por tamaño.
+
+    La clave combina el digest del contenido con el modelo y los parámetros
+    de reducción, así que re-renderizar con otra resolución o color de fondo
+    no vuelve a ejecutar la red neuronal, ni siquiera entre reinicios.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 512 * 1024 * 1024,
+                 enabled: bool = True):
+        self.directory = os.path.join(directory or default_cache_dir(), 'masks')
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # Se calcula al primer uso
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(digest: str, model_name: str, **params) -> str:
+        parts = [digest, model_name] + [f"{k}={params[k]}" for k in sorted(params)]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.png')
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                mask = img if img.mode == 'L' else img.convert('L')
+            # Marcar como usado recientemente para el LRU
+            os.utime(path, None)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return mask
+
+    def put(self, key: str, mask: Image.Image):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            (mask if mask.mode == 'L' else mask.convert('L')).save(tmp_path, 'PNG', optimize=True)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"No se pudo guardar la máscara en cache: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        """Eliminar las máscaras menos usadas hasta quedar por debajo del 90% del límite"""
+        entries, total = self._scan()
+        entries.sort()
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._scan()[0]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        entries, total = self._scan()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(entries), 'bytes': total}
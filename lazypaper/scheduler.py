@@ -0,0 +1,224 @@
+# scheduler.py - Planificador de tareas en segundo plano con prioridades y cancelación
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, List, Optional
+
+# Prioridades (menor = antes)
+PREVIEW = 0
+ANALYSIS = 1
+RENDER = 2
+ENCODE = 3  # Guardado: no espera a que termine un render
+STARTUP = 4  # Carga de modelos al arrancar: ni bloquea el análisis ni la cancela una imagen nueva
+SEGMENTATION = 5  # Recorte con el modelo (segundos, no se interrumpe a mitad): fuera de PREVIEW
+
+# Trabajos simultáneos por prioridad: un render largo nunca ocupa todos los hilos
+DEFAULT_LIMITS = {PREVIEW: 1, ANALYSIS: 1, RENDER: 1, ENCODE: 1, STARTUP: 1, SEGMENTATION: 1}
+
+
+class Cancelled(Exception):
+    """La tarea se canceló (nueva imagen, petición más reciente...)"""
+
+
+class CancelToken:
+    """Marca de cancelación cooperativa compartida entre la UI y la tarea"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class Progress:
+    """Progreso por etapas con tiempos y cancelación cooperativa.
+
+    callback(etapa, fracción) se llama desde el hilo de trabajo; si el token
+    está cancelado, la siguiente actualización lanza Cancelled.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None,
+                 token: Optional[CancelToken] = None):
+        self.callback = callback
+        self.token = token
+        self.timings: Dict[str, float] = {}
+
+    def update(self, stage: str, fraction: float):
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+        if self.callback is not None:
+            self.callback(stage, fraction)
+
+    def reporter(self, stage: str) -> Callable[[float], None]:
+        """Función fracción -> None para las funciones de imagen de bajo nivel"""
+        return lambda fraction: self.update(stage, fraction)
+
+    @contextmanager
+    def stage(self, name: str):
+        self.update(name, 0.0)
+        start = time.perf_counter()
+        yield self.reporter(name)
+        self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+        self.update(name, 1.0)
+
+    def describe(self) -> str:
+        return self.format_timings(self.timings)
+
+    @staticmethod
+    def format_timings(timings: Dict[str, float]) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+
+
+class Task:
+    __slots__ = ('priority', 'seq', 'key', 'func', 'callback', 'token')
+
+    def __init__(self, priority, seq, key, func, callback):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.func = func
+        self.callback = callback
+        self.token = CancelToken()
+
+
+class Scheduler:
+    """Cola con prioridades sobre un número fijo de hilos.
+
+    - submit(func, callback, priority, key): func(token) corre en un hilo de
+      trabajo; callback(resultado) se entrega con dispatch (p. ej. en el hilo
+      de tkinter) y solo si la tarea no se canceló.
+    - Una tarea con la misma key que otra pendiente o en curso la sustituye:
+      la anterior se cancela y su resultado se descarta.
+    - limits acota los trabajos simultáneos de cada prioridad.
+    """
+
+    def __init__(self, dispatch: Optional[Callable[[Callable], None]] = None,
+                 limits: Optional[Dict[int, int]] = None):
+        self.dispatch = dispatch or (lambda fn: fn())
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._pending: List[Task] = []
+        self._active: List[Task] = []
+        self._running: Dict[int, int] = {priority: 0 for priority in self.limits}
+        self._by_key: Dict[Hashable, Task] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"LazyPaper-{i}")
+                         for i in range(sum(self.limits.values()))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, func: Callable[[CancelToken], object], callback: Optional[Callable] = None,
+               priority: int = RENDER, key: Optional[Hashable] = None) -> CancelToken:
+        task = Task(priority, next(self._seq), key, func, callback)
+        with self._cond:
+            if key is not None:
+                previous = self._by_key.get(key)
+                if previous is not None:
+                    self._drop(previous)
+                self._by_key[key] = task
+            self._pending.append(task)
+            self._cond.notify()
+        return task.token
+
+    def cancel(self, key: Optional[Hashable] = None, priority: Optional[int] = None) -> bool:
+        """Cancelar la tarea de key, las de una prioridad o (sin argumentos) todas.
+
+        Devuelve si había algo que cancelar.
+        """
+        with self._cond:
+            if key is not None:
+                task = self._by_key.get(key)
+                if task is not None:
+                    self._drop(task)
+                return task is not None
+            tasks = [task for task in self._pending + self._active
+                     if not task.token.cancelled and (priority is None or task.priority == priority)]
+            for task in tasks:
+                self._drop(task)
+            return bool(tasks)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            for task in list(self._pending):
+                self._drop(task)
+            self._cond.notify_all()
+
+    def _drop(self, task: Task):
+        # Con el lock tomado
+        task.token.cancel()
+        if task in self._pending:
+            self._pending.remove(task)
+        if task.key is not None and self._by_key.get(task.key) is task:
+            del self._by_key[task.key]
+
+    def _next_task(self) -> Optional[Task]:
+        # Con el lock tomado: la más prioritaria (y antigua) con hueco en su prioridad
+        best = None
+        for task in self._pending:
+            if self._running.get(task.priority, 0) >= self.limits.get(task.priority, 1):
+                continue
+            if best is None or (task.priority, task.seq) < (best.priority, best.seq):
+                best = task
+        if best is not None:
+            self._pending.remove(best)
+            self._active.append(best)
+            self._running[best.priority] = self._running.get(best.priority, 0) + 1
+        return best
+
+    def _work(self):
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    task = self._next_task()
+            try:
+                self._run(task)
+            finally:
+                with self._cond:
+                    self._running[task.priority] -= 1
+                    self._active.remove(task)
+                    if task.key is not None and self._by_key.get(task.key) is task:
+                        del self._by_key[task.key]
+                    self._cond.notify_all()
+
+    def _run(self, task: Task):
+        if task.token.cancelled:
+            return
+        try:
+            result = task.func(task.token)
+        except Cancelled:
+            return
+        except Exception as e:
+            print(f"Error en tarea en segundo plano: {e}")
+            result = None
+        if task.callback is None or task.token.cancelled:
+            return
+        token, callback = task.token, task.callback
+
+        def deliver():
+            # Puede haberse cancelado mientras esperaba al hilo de la UI
+            if not token.cancelled:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"Error en callback: {e}")
+
+        self.dispatch(deliver)
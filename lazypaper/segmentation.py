@@ -0,0 +1,206 @@
+# segmentation.py - Sesiones de rembg reutilizables
+import importlib.util
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# rembg es opcional y pesado (onnxruntime): solo se comprueba que exista,
+# el import real se hace la primera vez que se necesita una sesión
+REMBG_AVAILABLE = importlib.util.find_spec('rembg') is not None
+DEFAULT_MODEL = 'u2net'
+
+_rembg_remove = None
+_rembg_new_session = None
+_import_lock = threading.Lock()
+
+# Cache de sesiones: compartidas por proceso o una por hilo (workers de un pool)
+_shared_sessions: Dict[Tuple, object] = {}
+_shared_lock = threading.Lock()
+_thread_local = threading.local()
+
+# Tiempos de carga del modelo e inferencia por clave de sesión
+_stats: Dict[Tuple, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def load_rembg() -> bool:
+    """Importar rembg bajo demanda. Devuelve si está disponible"""
+    global REMBG_AVAILABLE, _rembg_remove, _rembg_new_session
+    if _rembg_remove is not None or not REMBG_AVAILABLE:
+        return REMBG_AVAILABLE
+    with _import_lock:
+        if _rembg_remove is None and REMBG_AVAILABLE:
+            try:
+                from rembg import remove, new_session
+                _rembg_new_session = new_session
+                _rembg_remove = remove
+            except Exception as e:
+                print(f"rembg no disponible: {e}")
+                REMBG_AVAILABLE = False
+    return REMBG_AVAILABLE
+
+def session_key(model_name: str = DEFAULT_MODEL, providers: Optional[Sequence[str]] = None) -> Tuple:
+    """Clave de cache: modelo + proveedores de ejecución de onnxruntime"""
+    return (model_name, tuple(providers) if providers else ())
+
+def get_session(model_name: str = DEFAULT_MODEL, providers: Optional[Sequence[str]] = None,
+                per_thread: bool = False):
+    """Obtener (o crear una sola vez) la sesión de segmentación.
+
+    Por defecto la sesión se comparte en todo el proceso; con per_thread=True
+    cada hilo de un pool recibe la suya. En pools de procesos cada worker
+    tiene naturalmente su propia cache.
+    """
+    if not load_rembg():
+        return None
+    key = session_key(model_name, providers)
+    if per_thread:
+        sessions = _thread_local.__dict__.setdefault('sessions', {})
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = _create_session(key)
+        return session
+
+    session = _shared_sessions.get(key)
+    if session is None:
+        with _shared_lock:
+            session = _shared_sessions.get(key)
+            if session is None:
+                session = _shared_sessions[key] = _create_session(key)
+    return session
+
+def _create_session(key: Tuple):
+    model_name, providers = key
+    start = time.perf_counter()
+    session = _rembg_new_session(model_name, providers=list(providers) if providers else None)
+    _record(key, 'load', time.perf_counter() - start)
+    return session
+
+def remove(data, model_name: str = DEFAULT_MODEL, providers: Optional[Sequence[str]] = None,
+           per_thread: bool = False, **kwargs):
+    """rembg.remove usando la sesión cacheada; mide solo el tiempo de inferencia"""
+    session = get_session(model_name, providers, per_thread)
+    if session is None:
+        raise RuntimeError("rembg no disponible")
+    start = time.perf_counter()
+    result = _rembg_remove(data, session=session, **kwargs)
+    _record(session_key(model_name, providers), 'inference', time.perf_counter() - start)
+    return result
+
+def predict_mask(image, model_name: str = DEFAULT_MODEL, providers: Optional[Sequence[str]] = None,
+                 per_thread: bool = False):
+    """Máscara alfa ('L') del sujeto, sin pasar por PNG.
+
+    La imagen (PIL o array NumPy) se entrega directamente a rembg y solo se
+    pide la máscara, así se evita codificar/decodificar PNG en cada llamada.
+    Con un array rembg devuelve otro array: se convierte igualmente a 'L'.
+    """
+    from PIL import Image
+    if getattr(image, 'mode', 'RGB') not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    mask = remove(image, model_name, providers, per_thread, only_mask=True)
+    if not isinstance(mask, Image.Image):
+        mask = Image.fromarray(mask)
+    if mask.mode != 'L':
+        mask = mask.convert('L')
+    return mask
+
+# ---------- Reescalado de la máscara ----------
+def upsample_mask(mask, size: Tuple[int, int], guide_small=None, guide_full=None,
+                  refine: Optional[str] = None, radius: int = 4, eps: float = 1e-3,
+                  progress: Optional[Callable[[float], None]] = None, quality: Optional[str] = None):
+    """Llevar una máscara calculada a baja resolución al tamaño completo.
+
+    Solo se reescala el canal alfa (filtro según quality, ver resampling.py).
+    Con refine='guided' se aplica un filtro guiado rápido: los coeficientes
+    lineales se calculan a baja resolución (guide_small) y se evalúan sobre la
+    luminancia de guide_full, así los bordes siguen los detalles del original
+    a resolución completa.
+    """
+    import resampling
+    if refine != 'guided' or guide_small is None or guide_full is None:
+        return resampling.resize(mask, size, resampling.MASK, quality or resampling.DEFAULT_QUALITY)
+    return _fast_guided_upsample(mask, guide_small, guide_full, radius, eps, progress)
+
+def _box_mean(arr, r: int):
+    """Media en ventana (2r+1)x(2r+1) con imagen integral (bordes replicados)"""
+    import numpy as np
+    k = 2 * r + 1
+    padded = np.pad(arr, r, mode='edge').astype(np.float64)
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float64)
+    integral[1:, 1:] = padded.cumsum(0).cumsum(1)
+    window = integral[k:, k:] - integral[:-k, k:] - integral[k:, :-k] + integral[:-k, :-k]
+    return (window / (k * k)).astype(np.float32)
+
+def _fast_guided_upsample(mask, guide_small, guide_full, radius: int, eps: float,
+                          progress: Optional[Callable[[float], None]] = None, strip: int = 1024):
+    import numpy as np
+    from PIL import Image
+    I = np.asarray(guide_small.convert('L'), dtype=np.float32) / 255.0
+    p = np.asarray(mask.resize(guide_small.size, Image.BILINEAR), dtype=np.float32) / 255.0
+    mean_I = _box_mean(I, radius)
+    mean_p = _box_mean(p, radius)
+    var_I = _box_mean(I * I, radius) - mean_I * mean_I
+    cov_Ip = _box_mean(I * p, radius) - mean_I * mean_p
+    a = cov_Ip / (var_I + eps)
+    b = mean_p - a * mean_I
+    A = Image.fromarray(_box_mean(a, radius), 'F')
+    B = Image.fromarray(_box_mean(b, radius), 'F')
+
+    # Evaluar q = A*I + B por franjas para acotar la memoria en imágenes grandes
+    full_w, full_h = guide_full.size
+    small_w, small_h = guide_small.size
+    gray_full = guide_full.convert('L')
+    result = Image.new('L', (full_w, full_h))
+    for y0 in range(0, full_h, strip):
+        y1 = min(full_h, y0 + strip)
+        box = (0, y0 * small_h / full_h, small_w, y1 * small_h / full_h)
+        a_strip = np.asarray(A.resize((full_w, y1 - y0), Image.BILINEAR, box=box))
+        b_strip = np.asarray(B.resize((full_w, y1 - y0), Image.BILINEAR, box=box))
+        g_strip = np.asarray(gray_full.crop((0, y0, full_w, y1)), dtype=np.float32) / 255.0
+        q = np.clip((a_strip * g_strip + b_strip) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+        result.paste(Image.fromarray(q, 'L'), (0, y0))
+        if progress is not None:
+            progress(y1 / full_h)
+    return result
+
+def clear_sessions():
+    """Liberar las sesiones cacheadas (p. ej. al cambiar de proveedor)"""
+    with _shared_lock:
+        _shared_sessions.clear()
+    _thread_local.__dict__.pop('sessions', None)
+
+
+# ---------- Estadísticas ----------
+def _record(key: Tuple, kind: str, elapsed: float):
+    with _stats_lock:
+        entry = _stats.setdefault(key, {'loads': 0, 'load_time': 0.0,
+                                        'inferences': 0, 'inference_time': 0.0,
+                                        'last_inference_time': 0.0})
+        if kind == 'load':
+            entry['loads'] += 1
+            entry['load_time'] += elapsed
+        else:
+            entry['inferences'] += 1
+            entry['inference_time'] += elapsed
+            entry['last_inference_time'] = elapsed
+
+def get_stats() -> Dict[Tuple, Dict[str, float]]:
+    """Copia de las estadísticas por sesión (carga del modelo e inferencia por separado)"""
+    with _stats_lock:
+        return {key: dict(entry) for key, entry in _stats.items()}
+
+def totals() -> Tuple[float, float]:
+    """Tiempo acumulado (carga de modelos, inferencia) en este proceso"""
+    with _stats_lock:
+        return (sum(e['load_time'] for e in _stats.values()),
+                sum(e['inference_time'] for e in _stats.values()))
+
+def format_stats() -> str:
+    lines = []
+    for (model_name, providers), entry in get_stats().items():
+        avg = entry['inference_time'] / entry['inferences'] if entry['inferences'] else 0.0
+        label = f"{model_name} [{', '.join(providers)}]" if providers else model_name
+        lines.append(f"{label}: carga {entry['load_time']:.2f}s ({entry['loads']}x), "
+                     f"inferencia media {avg:.2f}s ({entry['inferences']}x)")
+    return "\n".join(lines) if lines else "Sin sesiones de segmentación"